@@ -8,10 +8,15 @@ class AddresseeReader(object):
     img_processor: ImageProcessor object responsible for OCR.
     text_analyzer: TextAnalyzer object responsible for analyzing addressee
                    strings and populating MailFields object
+    change_detector: Optional FrameChangeDetector. If set, images that don't
+                     show a new envelope aren't processed and the fields from
+                     the last processed image are returned instead.
   """
-  def __init__(self, processor, analyzer):
+  def __init__(self, processor, analyzer, change_detector=None):
     self.__img_processor = processor
     self.__text_analyzer = analyzer
+    self.__change_detector = change_detector
+    self.__last_fields = None
 
   def get_mail_fields(self, image):
     """Analyzes image and populates associated MailFields object.
@@ -20,9 +25,23 @@ class AddresseeReader(object):
       image: Image to be analyzed.
 
     Returns:
-      MailFields object with addressee information populated.
+      MailFields object with addressee information populated. If a change
+      detector is set and image is unchanged, the MailFields object from the
+      last analyzed image (None if nothing has been analyzed yet).
     """
+    if (self.__change_detector is not None and
+        not self.__change_detector.is_new_frame(image)):
+      return self.__last_fields
+
     lines = self.__img_processor.get_text_lines(image)
     fields = self.__text_analyzer.parse_text_lines(lines)
-    
+    self.__last_fields = fields
+
     return fields
+
+  def get_frames_skipped(self):
+    """Returns number of images skipped by the change detector."""
+    if self.__change_detector is None:
+      return 0
+
+    return self.__change_detector.frames_skipped
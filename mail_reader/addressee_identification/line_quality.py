@@ -0,0 +1,81 @@
+"""Scores how much an OCR text line looks like real text.
+
+OCR of envelope edges, barcodes and smudges gives lines made of stars, bars
+and punctuation. score_line() classifies every character of a line with one
+precompiled translation table, so the check is cheap enough to run on every
+line of every frame, or on large volumes of saved OCR output.
+"""
+import collections
+
+# Default limits for a line to be considered real text
+MIN_LETTER_RATIO = 0.5
+MAX_STAR_RATIO = 0.1
+MAX_BAR_RATIO = 0.5
+
+LineQuality = collections.namedtuple(
+    'LineQuality', ['letter_ratio', 'star_ratio', 'bar_ratio', 'is_garbage'])
+LineQuality.__doc__ = """Character ratios of a line, as decimals (90% = 0.9).
+
+letter_ratio counts ASCII letters and spaces, bar_ratio counts characters
+that look like vertical bars (I, i, l, |) and star_ratio counts '*'. I, i
+and l count as both letters and bars.
+"""
+
+# Each byte is translated to the class it belongs to, so a single
+# bytes.translate() call classifies the whole line. Bytes that are both a
+# letter and a bar get their own class.
+_OTHER = b'o'
+_LETTER = b'a'
+_STAR = b's'
+_BAR = b'b'
+_LETTER_BAR = b'l'
+
+def _build_class_table():
+  table = bytearray(_OTHER * 256)
+  for char in b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ ':
+    table[char] = _LETTER[0]
+  for char in b'Iil':
+    table[char] = _LETTER_BAR[0]
+  table[ord('|')] = _BAR[0]
+  table[ord('*')] = _STAR[0]
+
+  return bytes(table)
+
+_CLASS_TABLE = _build_class_table()
+
+def score_line(line, min_letter_ratio=MIN_LETTER_RATIO,
+               max_star_ratio=MAX_STAR_RATIO, max_bar_ratio=MAX_BAR_RATIO):
+  """Returns LineQuality of an OCR text line.
+
+  Args:
+    line: Single OCR text line.
+    min_letter_ratio: Lines with this letter ratio or less are garbage.
+    max_star_ratio: Lines with more stars than this are garbage.
+    max_bar_ratio: Lines with more bars than this are garbage.
+
+  Returns:
+    LineQuality. Empty lines have all ratios 0 and are garbage.
+  """
+  total = len(line)
+  if total < 1:
+    return LineQuality(0, 0, 0, True)
+
+  # Non-ASCII characters become '?', keeping one byte per character
+  classes = line.encode('ascii', 'replace').translate(_CLASS_TABLE)
+  letter_bar_count = classes.count(_LETTER_BAR)
+  letter_ratio = (classes.count(_LETTER) + letter_bar_count) / total
+  star_ratio = classes.count(_STAR) / total
+  bar_ratio = (classes.count(_BAR) + letter_bar_count) / total
+  is_garbage = (star_ratio > max_star_ratio or bar_ratio > max_bar_ratio or
+                letter_ratio <= min_letter_ratio)
+
+  return LineQuality(letter_ratio, star_ratio, bar_ratio, is_garbage)
+
+def score_lines(lines, **kwargs):
+  """Returns list of LineQuality for each line, see score_line for kwargs."""
+  return [score_line(line, **kwargs) for line in lines]
+
+def filter_lines(lines, **kwargs):
+  """Returns the lines that aren't garbage, in order."""
+  return [line for line in lines
+          if not score_line(line, **kwargs).is_garbage]
@@ -0,0 +1,157 @@
+import json
+import re
+
+# Characters OCR commonly reads in place of each other. Every character of
+# the store's address matches any character in its group.
+OCR_CONFUSIONS = [
+    '0ODQ',
+    '1Il|i',
+    '2Z',
+    '5S$',
+    '6G',
+    '8B',
+]
+
+# Words that can come before the box number on the store's street line
+DEFAULT_BOX_TYPES = ('PO BOX', 'POBOX', 'BOX', 'PMB', 'SUITE', 'STE', 'UNIT',
+                     'APT', 'NO')
+
+# Characters allowed in a box number, and the digit each one was misread from.
+# Box numbers are matched ignoring case, so lowercase forms are mapped too.
+_BOX_CHARS = '0-9ODQIl|i'
+_BOX_DIGITS = str.maketrans('ODQodqIiLl|', '00000011111')
+
+def _fuzzy_char(char):
+  """Returns regex matching char or any character OCR confuses it with."""
+  for group in OCR_CONFUSIONS:
+    if char.upper() in group or char in group:
+      return '[' + re.escape(group) + ']'
+
+  return re.escape(char)
+
+def _fuzzy_pattern(text):
+  """Returns regex matching text with OCR confusions and any spacing.
+
+  Args:
+    text: Known text, ie: 'MAIN ST'.
+
+  Returns:
+    Regex string. Spaces in text match any amount of whitespace, including
+    none, since OCR often drops or adds spaces.
+  """
+  parts = []
+  for char in text.strip():
+    if char.isspace():
+      parts.append(r'\s*')
+    else:
+      parts.append(_fuzzy_char(char))
+
+  return ''.join(parts)
+
+def _any_of(texts):
+  """Returns regex group matching any of texts, longest first."""
+  texts = sorted(texts, key=len, reverse=True)
+  return '(?:' + '|'.join(_fuzzy_pattern(text) for text in texts) + ')'
+
+class StoreAddressProfile(object):
+  """Recognizes the store's own street and city lines without usaddress.
+
+  All mail for the store's boxes has the same street, city, state and zip, so
+  those lines can be recognized with a couple of regexes, compiled once,
+  instead of the usaddress CRF tagger. The only thing that changes between
+  envelopes is the box number, which is pulled out of the street line.
+
+  Patterns are fuzzy: characters OCR confuses (0/O, 1/I/l, 5/S, ...) are
+  interchangeable, spacing and punctuation between words is ignored and
+  matching is case insensitive.
+
+  Attributes:
+    street_number: Store's street number, ie: '1234'.
+    street_name: Store's street name without suffix, ie: 'MAIN'.
+    city: Store's city.
+    state: Store's state, as printed on mail (ie: 'CA').
+    zip_code: Store's 5 digit zip code.
+    __street_re: Compiled regex for the street line, with the box number in
+                 group 'box'.
+    __city_re: Compiled regex for the city line.
+  """
+
+  def __init__(self, street_number, street_name, city, state, zip_code,
+               street_suffixes=(), box_types=DEFAULT_BOX_TYPES):
+    """Inits profile and compiles its patterns.
+
+    Args:
+      street_number: Store's street number, ie: '1234'.
+      street_name: Store's street name without suffix, ie: 'MAIN'.
+      city: Store's city.
+      state: Store's state, as printed on mail (ie: 'CA').
+      zip_code: Store's 5 digit zip code.
+      street_suffixes: Ways the street suffix is written, ie: ('ST',
+                       'STREET'). The suffix is optional on the line.
+      box_types: Words that can come before the box number.
+    """
+    self.street_number = street_number
+    self.street_name = street_name
+    self.city = city
+    self.state = state
+    self.zip_code = zip_code
+
+    suffix = ''
+    if len(street_suffixes) > 0:
+      suffix = r'(?:[\s,.]*' + _any_of(street_suffixes) + ')?'
+    box = (r'(?:(?:' + _any_of(box_types) + r')?[\s.:#]*' +
+           '(?P<box>[' + _BOX_CHARS + ']*[0-9][' + _BOX_CHARS + r']*)' +
+           r'[A-Z]?)?')
+    self.__street_re = re.compile(
+        r'\s*' + _fuzzy_pattern(street_number) + r'\s*' +
+        _fuzzy_pattern(street_name) + suffix + r'[\s,.]*' + box + r'[\s.]*',
+        re.IGNORECASE)
+    self.__city_re = re.compile(
+        r'\s*' + _fuzzy_pattern(city) + r'[\s,.]*' + _fuzzy_pattern(state) +
+        r'[\s,.]*' + _fuzzy_pattern(zip_code) + r'(?:\s*-\s*\d{4})?[\s.]*',
+        re.IGNORECASE)
+
+  def tag_line(self, line):
+    """Returns usaddress style tags if line is one of the store's lines.
+
+    Args:
+      line: Single OCR text line.
+
+    Returns:
+      None if line isn't the store's street or city line. Otherwise dict of
+      usaddress tag to string, using the store's own spelling for the
+      address and the box number (if any) as 'OccupancyIdentifier', ie:
+      {'AddressNumber': '1234', 'StreetName': 'MAIN',
+       'OccupancyIdentifier': '102'}.
+    """
+    match = self.__street_re.fullmatch(line)
+    if match is not None:
+      tags = {'AddressNumber': self.street_number,
+              'StreetName': self.street_name}
+      if match.group('box') is not None:
+        tags['OccupancyIdentifier'] = match.group('box').translate(
+            _BOX_DIGITS)
+      return tags
+
+    if self.__city_re.fullmatch(line) is not None:
+      return {'PlaceName': self.city, 'StateName': self.state,
+              'ZipCode': self.zip_code}
+
+    return None
+
+def load_store_profile(path):
+  """Returns StoreAddressProfile from a JSON file.
+
+  The file holds a single object with the StoreAddressProfile arguments:
+
+    {"street_number": "1234", "street_name": "MAIN",
+     "street_suffixes": ["ST", "STREET"], "city": "SPRINGFIELD",
+     "state": "CA", "zip_code": "90210"}
+
+  Args:
+    path: Path to the JSON file.
+  """
+  with open(path) as f:
+    config = json.load(f)
+
+  return StoreAddressProfile(**config)
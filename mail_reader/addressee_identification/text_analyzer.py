@@ -1,58 +1,90 @@
+import mail_reader.addressee_identification.line_quality as line_quality
 import mail_reader.addressee_identification.mail_fields as mail_fields
+import mail_reader.metrics as metrics
 import usaddress
+import collections
 import re
-import string
 
-def _alnum_percent(line):
-  """Calculates % of alphanumeric characters in string.
+def _normalize_line(line):
+  """Returns line with runs of whitespace collapsed to single spaces.
 
-  Args:
-    line: String to calculate
-
-  Returns:
-    Percentage of alphanumeric characters, as a decimal (90% alnum = 0.9)
+  usaddress splits lines on whitespace, so lines that only differ in spacing
+  are parsed the same way.
   """
-  total = len(line)
-
-  test_set = set()
-  for letter in string.ascii_letters:
-    test_set.add(letter)
-  test_set.add(' ')
-
-  # Return a failure (no good characters) if there are no characters
-  if total < 1:
-    return 0
+  return ' '.join(line.split())
 
-  alnum_count = 0
-  star_count = 0
-  bar_count = 0
-  for letter in line:
-    # if letter.isalnum():
-    if letter in test_set:
-      alnum_count += 1
-    if letter == '*':
-      star_count += 1
-    if letter == 'I' or letter == 'i' or letter == 'l' or letter == '|':
-      bar_count += 1
+def _is_obvious_junk(line):
+  """Returns True if a normalized line can't contain any address fields.
 
-  # TODO(searow): properly implement this, but sticking this here for now.
+  Cheap check run before usaddress. Lines are junk if they have no digits
+  and no word with at least 2 letters, which is what OCR produces from 
+  smudges, barcodes and envelope edges (ie: '- . |', 'i l ,'). Lines with
+  any digit are kept since they may hold a box number (ie: '# 5').
 
-  if star_count / total > 0.1:
-    return 0
-
-  if bar_count / total > 0.5:
-    return 0
-
-  return alnum_count / total
+  Args:
+    line: Line normalized with _normalize_line.
+  """
+  for word in line.split(' '):
+    letter_count = 0
+    for letter in word:
+      if letter.isdigit():
+        return False
+      if letter.isalpha():
+        letter_count += 1
+        if letter_count >= 2:
+          return False
+
+  return True
 
 class TextAnalyzer(object):
   """Analyzes text segments for addressee identifiers. 
 
   Allows communication to other objects by populating a MailFields object. 
+
+  usaddress results are kept in a least recently used cache, since the same
+  envelope gives the same lines on consecutive frames and lines like the 
+  store's city, state and zip repeat on almost every piece of mail.
+
+  If a StoreAddressProfile is given, the store's own street and city lines
+  are recognized with its precompiled patterns before any other check, and
+  only the box number is taken from them.
+
+  Attributes:
+    store_lines: Number of lines recognized by the store profile.
+    cache_hits: Number of lines parsed from the cache.
+    cache_misses: Number of lines parsed with usaddress.
+    junk_lines: Number of lines skipped as obvious junk.
+    __cache_size: Maximum number of lines kept in __parse_cache.
+    __parse_cache: OrderedDict of normalized line to usaddress tags, least
+                   recently used first.
+    __store_profile: StoreAddressProfile, or None.
   """
 
-  def __init__(self):
-    pass
+  def __init__(self, cache_size=1024, store_profile=None):
+    """Inits analyzer.
+
+    Args:
+      cache_size: Maximum number of parsed lines to remember, 0 to always 
+                  parse with usaddress.
+      store_profile: StoreAddressProfile of the store the mail is addressed
+                     to, or None to parse every line with usaddress.
+    """
+    self.store_lines = 0
+    self.cache_hits = 0
+    self.cache_misses = 0
+    self.junk_lines = 0
+    self.__cache_size = cache_size
+    self.__parse_cache = collections.OrderedDict()
+    self.__store_profile = store_profile
+
+  def get_cache_stats(self):
+    """Returns dict of parse cache size, hit rate and line counts."""
+    lookups = self.cache_hits + self.cache_misses
+    hit_rate = self.cache_hits / lookups if lookups > 0 else 0
+
+    return {'size': len(self.__parse_cache), 'hits': self.cache_hits,
+            'misses': self.cache_misses, 'hit_rate': hit_rate,
+            'junk_lines': self.junk_lines, 'store_lines': self.store_lines}
 
   def parse_text_lines(self, text_lines):
     """Analyzes text lines, in order read from OCR processing.
@@ -69,24 +101,81 @@ class TextAnalyzer(object):
       None
     """
 
-    self.__fields = mail_fields.MailFields()
-
-    alphanum_threshold = 0.5
-
-    # Only evaluate lines that are predominantly alphanumeric
-    for line in text_lines:
-      if _alnum_percent(line) > alphanum_threshold:  
-        try:
-          parsed = usaddress.tag(line)[0]
-        except usaddress.RepeatedLabelError as e:
-          # If usaddress gets confused, just throw away the answer as if
-          # we got nothing for now.
-          # TODO(searow): fix this to handle multiple tags and labels.
-          parsed = {}
-        for tag in parsed:
-          self._add_to_fields(tag, parsed[tag])
+    with metrics.timed('text.parse_text_lines'):
+      self.__fields = mail_fields.MailFields()
+
+      for line in text_lines:
+        # Store lines are checked first, since street lines with long box
+        # numbers can fail the alphanumeric check
+        parsed = self._tag_store_line(line)
+        # Only evaluate lines that are predominantly alphanumeric
+        if parsed is None and not line_quality.score_line(line).is_garbage:
+          parsed = self._tag_line(line)
+        if parsed is not None:
+          for tag in parsed:
+            self._add_to_fields(tag, parsed[tag])
     return self.__fields
 
+  def _tag_store_line(self, line):
+    """Returns tags for line if it's the store's street or city line.
+
+    Args:
+      line: Single OCR text line.
+
+    Returns:
+      Dict of usaddress tag to string, or None if there's no store profile or
+      line isn't one of the store's lines.
+    """
+    if self.__store_profile is None:
+      return None
+
+    parsed = self.__store_profile.tag_line(line)
+    if parsed is not None:
+      self.store_lines += 1
+      metrics.increment('text.store_lines')
+
+    return parsed
+
+  def _tag_line(self, line):
+    """Returns usaddress tags for line, using the cache when possible.
+
+    Args:
+      line: Single OCR text line.
+
+    Returns:
+      Dict of usaddress tag to string. Must not be modified, since the same
+      dict is returned for every line that normalizes the same way.
+    """
+    line = _normalize_line(line)
+    if _is_obvious_junk(line):
+      self.junk_lines += 1
+      metrics.increment('text.junk_lines')
+      return {}
+
+    parsed = self.__parse_cache.get(line)
+    if parsed is not None:
+      self.__parse_cache.move_to_end(line)
+      self.cache_hits += 1
+      metrics.increment('text.parse_cache_hits')
+      return parsed
+
+    self.cache_misses += 1
+    metrics.increment('text.parse_cache_misses')
+    try:
+      parsed = usaddress.tag(line)[0]
+    except usaddress.RepeatedLabelError as e:
+      # If usaddress gets confused, just throw away the answer as if
+      # we got nothing for now.
+      # TODO(searow): fix this to handle multiple tags and labels.
+      parsed = {}
+
+    if self.__cache_size > 0:
+      self.__parse_cache[line] = parsed
+      if len(self.__parse_cache) > self.__cache_size:
+        self.__parse_cache.popitem(last=False)
+
+    return parsed
+
   def _add_to_fields(self, tag, data):
     """Adds the parsed items to the MailFields object.
 
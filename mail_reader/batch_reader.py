@@ -0,0 +1,297 @@
+"""Reads envelopes offline from a directory of images or a recorded video.
+
+Each envelope is read and matched the same way as the live reader, across a
+pool of worker processes, and the results are written to a CSV or JSON lines
+file with the best box, its score and names, and per-stage timings.
+
+Usage:
+  python -m mail_reader.batch_reader INPUT --database DATABASE.xlsx \
+      --output results.csv [--workers N] [--every N]
+
+INPUT is a directory of images or a video file. For video, only frames where
+a new envelope has been put down and is holding still are read.
+"""
+import argparse
+import collections
+import concurrent.futures
+import csv
+import json
+import os
+import sys
+import time
+import cv2
+import mail_reader.addressee_identification.text_analyzer as text_analyzer
+import mail_reader.data_access.box_matching as box_matching
+import mail_reader.data_access.database_creator as database_creator
+import mail_reader.vision.processing.frame_change as frame_change
+import mail_reader.vision.processing.image_process as image_process
+import mail_reader.vision.processing.ocr_processor as ocr_process
+
+IMAGE_EXTENSIONS = ('.bmp', '.jpeg', '.jpg', '.png', '.tif', '.tiff')
+DEFAULT_IGNORED_NAMES = ('Or', 'Current', 'Resident')
+RESULT_COLUMNS = ['source', 'frame', 'box_number', 'score', 'box_names',
+                  'top_boxes', 'read_names', 'text_lines', 'preprocess_ms',
+                  'ocr_ms', 'analysis_ms', 'match_ms', 'total_ms', 'error']
+# Number of best boxes listed in each result's top_boxes
+TOP_BOXES = 3
+
+def _iter_directory(path):
+  """Yields (source, frame, None) for each image in directory path, by name.
+
+  Images are loaded by the workers, so only their paths are passed around.
+  """
+  for name in sorted(os.listdir(path)):
+    if name.lower().endswith(IMAGE_EXTENSIONS):
+      yield os.path.join(path, name), 0, None
+
+def _iter_video(path, every=1, change_detector=None):
+  """Yields (source, frame number, frame) for frames of video path to read.
+
+  Args:
+    path: Video file path.
+    every: Only every Nth frame is considered.
+    change_detector: Optional FrameChangeDetector, only frames it accepts
+                     are yielded.
+  """
+  cap = cv2.VideoCapture(path)
+  frame_number = 0
+  try:
+    while True:
+      ret, frame = cap.read()
+      if not ret:
+        return
+      if frame_number % every == 0 and (
+          change_detector is None or change_detector.is_new_frame(frame)):
+        yield path, frame_number, frame
+      frame_number += 1
+  finally:
+    cap.release()
+
+def _format_csv_row(result):
+  """Returns copy of result with list values joined by '|' for CSV output."""
+  row = dict(result)
+  for key, value in row.items():
+    if isinstance(value, list):
+      row[key] = '|'.join(str(item) for item in value)
+
+  return row
+
+class ResultWriter(object):
+  """Writes read results to a CSV or JSON lines file.
+
+  Attributes:
+    file_format: 'csv' or 'jsonl'.
+  """
+  def __init__(self, output_file, file_format):
+    """Inits writer.
+
+    Args:
+      output_file: Open text file to write to.
+      file_format: 'csv' or 'jsonl'.
+    """
+    self.file_format = file_format
+    self.__file = output_file
+    self.__csv_writer = None
+    if file_format == 'csv':
+      self.__csv_writer = csv.DictWriter(output_file, RESULT_COLUMNS)
+      self.__csv_writer.writeheader()
+
+  def write(self, result):
+    """Writes a single result dict from BatchReader.read."""
+    if self.__csv_writer is not None:
+      self.__csv_writer.writerow(_format_csv_row(result))
+    else:
+      self.__file.write(json.dumps(result) + '\n')
+
+class BatchReader(object):
+  """Reads and matches single envelope images, timing each stage.
+
+  Runs the same steps as AddresseeReader followed by BoxMatcher, but calls
+  preprocessing and OCR separately so each can be timed.
+
+  Attributes:
+    __processor: ImageProcessor used to find the line images.
+    __ocr_processor: OcrProcessor used to read the line images.
+    __analyzer: TextAnalyzer to parse OCR text lines.
+    __matcher: BoxMatcher with its database connection set.
+    __ignored_names: Names removed from the addressee line before matching.
+  """
+  def __init__(self, processor, ocr_processor, analyzer, matcher,
+               ignored_names=DEFAULT_IGNORED_NAMES):
+    self.__processor = processor
+    self.__ocr_processor = ocr_processor
+    self.__analyzer = analyzer
+    self.__matcher = matcher
+    self.__ignored_names = set(ignored_names)
+
+  def read(self, source, frame_number, image=None):
+    """Reads one envelope and returns its result.
+
+    Args:
+      source: Image or video path the envelope came from.
+      frame_number: Frame number within a video, 0 for images.
+      image: Image to read. Loaded from source if None.
+
+    Returns:
+      Dict with a value for each RESULT_COLUMNS key. box_number, score and
+      box_names are for the best match, and are None if nothing matched.
+      top_boxes lists up to TOP_BOXES best box numbers, best first.
+      error is None unless the image couldn't be read.
+    """
+    result = dict.fromkeys(RESULT_COLUMNS)
+    result['source'] = source
+    result['frame'] = frame_number
+    start = time.perf_counter()
+    if image is None:
+      image = cv2.imread(source)
+    if image is None:
+      result['error'] = 'Could not read image'
+      return result
+
+    line_images = self.__processor.get_line_images(image)
+    preprocessed = time.perf_counter()
+    text_lines = self.__ocr_processor.get_text_lines(line_images)
+    ocr_done = time.perf_counter()
+    fields = self.__analyzer.parse_text_lines(text_lines)
+    names = fields.addressee_line['all_names']
+    fields.addressee_line['all_names'] = [
+        name for name in names if name not in self.__ignored_names]
+    analyzed = time.perf_counter()
+    matches = []
+    if fields.is_populated():
+      matches = self.__matcher.get_matches(fields, top_k=TOP_BOXES)
+    matched = time.perf_counter()
+
+    result['text_lines'] = list(text_lines)
+    result['read_names'] = list(fields.addressee_line['all_names'])
+    result['top_boxes'] = [int(match['box_number'])
+                           for match in matches[:TOP_BOXES]]
+    if len(matches) > 0:
+      result['box_number'] = int(matches[0]['box_number'])
+      result['score'] = float(matches[0]['score'])
+      # Database rows come back as (name,) tuples
+      result['box_names'] = [row[0] for row in matches[0]['all_names']]
+    result['preprocess_ms'] = (preprocessed - start) * 1000
+    result['ocr_ms'] = (ocr_done - preprocessed) * 1000
+    result['analysis_ms'] = (analyzed - ocr_done) * 1000
+    result['match_ms'] = (matched - analyzed) * 1000
+    result['total_ms'] = (matched - start) * 1000
+
+    return result
+
+# BatchReader for the current worker process, created by _init_worker
+_worker_reader = None
+
+def _create_ocr_processor():
+  """Returns warm libtesseract processor if available, else Tesseract CLI."""
+  if ocr_process.LibTesseractProcessor.is_available():
+    return ocr_process.LibTesseractProcessor()
+
+  return ocr_process.TesseractProcessor()
+
+def _init_worker(database_path, roi_scale):
+  """Creates the worker process's BatchReader, run once per worker.
+
+  The database is loaded from the compiled cache created by the parent
+  process, so each worker only pays for a sqlite backup.
+  """
+  global _worker_reader
+  creator = database_creator.BapDatabaseCreator()
+  matcher = box_matching.BoxMatcher()
+  matcher.set_database_connection(
+      creator.load_or_create_database(database_path))
+  ocr_processor = _create_ocr_processor()
+  processor = image_process.ImageProcessor(ocr_processor)
+  processor.roi_scale = roi_scale
+  _worker_reader = BatchReader(processor, ocr_processor,
+                               text_analyzer.TextAnalyzer(), matcher)
+
+def _read_in_worker(task):
+  """Reads (source, frame number, image) task with the worker's reader."""
+  try:
+    return _worker_reader.read(*task)
+  except Exception as e:
+    result = dict.fromkeys(RESULT_COLUMNS)
+    result['source'] = task[0]
+    result['frame'] = task[1]
+    result['error'] = repr(e)
+    return result
+
+def run_batch(tasks, writer, workers, database_path, roi_scale=1):
+  """Reads every task across a process pool, writing results in order.
+
+  Only a few tasks per worker are in flight at a time, so video frames
+  aren't all held in memory at once.
+
+  Args:
+    tasks: Iterable of (source, frame number, image or None) tuples.
+    writer: ResultWriter to write results to.
+    workers: Number of worker processes.
+    database_path: Customer spreadsheet, with a compiled cache next to it.
+    roi_scale: ImageProcessor.roi_scale used by the workers.
+
+  Returns:
+    Number of envelopes read.
+  """
+  max_in_flight = workers * 4
+  count = 0
+  with concurrent.futures.ProcessPoolExecutor(
+      max_workers=workers, initializer=_init_worker,
+      initargs=(database_path, roi_scale)) as executor:
+    in_flight = collections.deque()
+    for task in tasks:
+      in_flight.append(executor.submit(_read_in_worker, task))
+      if len(in_flight) >= max_in_flight:
+        writer.write(in_flight.popleft().result())
+        count += 1
+    while in_flight:
+      writer.write(in_flight.popleft().result())
+      count += 1
+
+  return count
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('input', help='Directory of images or a video file.')
+  parser.add_argument('--database', required=True,
+                      help='Customer spreadsheet to match against.')
+  parser.add_argument('--output', required=True,
+                      help='Results file, .csv or .jsonl.')
+  parser.add_argument('--format', choices=['csv', 'jsonl'],
+                      help='Results format, from --output extension if unset.')
+  parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                      help='Number of worker processes.')
+  parser.add_argument('--every', type=int, default=1,
+                      help='Only consider every Nth video frame.')
+  parser.add_argument('--roi-scale', type=int, default=1,
+                      help='ImageProcessor.roi_scale used to find the '
+                           'address block, ie: 4 to find it on a downscaled '
+                           'frame.')
+  args = parser.parse_args()
+
+  file_format = args.format
+  if file_format is None:
+    file_format = 'jsonl' if args.output.endswith('.jsonl') else 'csv'
+
+  # Compile the database cache once here so workers only load it
+  database_creator.BapDatabaseCreator().load_or_create_database(args.database)
+
+  if os.path.isdir(args.input):
+    tasks = _iter_directory(args.input)
+  else:
+    tasks = _iter_video(args.input, args.every,
+                        frame_change.FrameChangeDetector())
+
+  start = time.perf_counter()
+  with open(args.output, 'w', newline='') as output_file:
+    writer = ResultWriter(output_file, file_format)
+    count = run_batch(tasks, writer, args.workers, args.database,
+                      args.roi_scale)
+  elapsed = time.perf_counter() - start
+
+  print('Read {} envelopes in {:.1f} s ({:.2f} envelopes/s, {} workers)'.format(
+      count, elapsed, count / elapsed if elapsed > 0 else 0, args.workers),
+      file=sys.stderr)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,39 @@
+"""Benchmarks DatabaseCreator ingestion speed in rows per second.
+
+Compares bulk ingestion against row by row inserts on synthetic customer
+spreadsheets.
+
+Usage:
+  python -m mail_reader.benchmarks.database_ingestion_benchmark [--rows 100000]
+"""
+import argparse
+import time
+import mail_reader.benchmarks.synthetic_data as synthetic_data
+import mail_reader.data_access.database_creator as database_creator
+
+def time_ingestion(df, bulk_ingestion):
+  """Returns seconds taken to create a database from df."""
+  creator = database_creator.DatabaseCreator()
+  creator.bulk_ingestion = bulk_ingestion
+  start = time.perf_counter()
+  creator.create_database_from_dataframe(df)
+
+  return time.perf_counter() - start
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--rows', type=int, nargs='+', default=[100000],
+                      help='Number of rows in each synthetic spreadsheet.')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  for rows in args.rows:
+    df = synthetic_data.generate_customer_dataframe(rows, seed=args.seed)
+    print('Spreadsheet rows: ' + str(rows))
+    for description, bulk in [('row by row', False), ('bulk', True)]:
+      seconds = time_ingestion(df, bulk)
+      print('  {:<12s} {:8.2f} s {:12.0f} rows/s'.format(
+          description, seconds, rows / seconds))
+
+if __name__ == '__main__':
+  main()
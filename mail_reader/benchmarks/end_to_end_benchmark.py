@@ -0,0 +1,138 @@
+"""Benchmarks the whole reader on a synthetic mail corpus.
+
+Generates a synthetic customer spreadsheet and envelope images addressed to
+random active customers (rotated, blurred and noisy), reads each envelope
+with preprocessing, OCR, text analysis and matching, and reports per-stage
+latency, throughput and top-1/top-3 box accuracy. The same seed always
+generates the same corpus, so runs can be compared to find regressions.
+
+--ocr truth skips OCR and returns each envelope's printed lines instead, to
+measure text analysis and matching accuracy without Tesseract.
+--store-profile recognizes the synthetic store's street and city lines with
+a StoreAddressProfile instead of usaddress.
+
+Usage:
+  python -m mail_reader.benchmarks.end_to_end_benchmark [--rows 1000] \
+      [--envelopes 100] [--ocr tesseract|stitched|libtesseract|truth] \
+      [--store-profile]
+"""
+import argparse
+import random
+import time
+import traceback
+import numpy as np
+import mail_reader.addressee_identification.text_analyzer as text_analyzer
+import mail_reader.batch_reader as batch_reader
+import mail_reader.benchmarks.synthetic_data as synthetic_data
+import mail_reader.data_access.box_matching as box_matching
+import mail_reader.data_access.database_creator as database_creator
+import mail_reader.vision.processing.image_process as image_process
+import mail_reader.vision.processing.ocr_processor as ocr_processor
+
+STAGES = ['preprocess_ms', 'ocr_ms', 'analysis_ms', 'match_ms', 'total_ms']
+
+class GroundTruthOcrProcessor(ocr_processor.OcrProcessor):
+  """Returns the lines printed on the current envelope instead of OCR.
+
+  Attributes:
+    lines: Lines printed on the envelope being read.
+  """
+  def __init__(self):
+    super().__init__()
+    self.lines = []
+
+  def get_text(self, image):
+    """Returns every line on the envelope as one newline separated string."""
+    return '\n'.join(self.lines)
+
+  def get_text_lines(self, images):
+    """Returns the lines on the envelope, ignoring the line images."""
+    return list(self.lines)
+
+def generate_corpus(df, num_envelopes, seed):
+  """Yields (lines, box, image) for num_envelopes synthetic envelopes."""
+  rng = random.Random(seed)
+  for _ in range(num_envelopes):
+    lines, box = synthetic_data.generate_envelope_lines(df, rng)
+    yield lines, box, synthetic_data.render_envelope(lines, rng)
+
+def create_ocr_processor(name):
+  """Returns OcrProcessor for --ocr name."""
+  if name == 'truth':
+    return GroundTruthOcrProcessor()
+  if name == 'stitched':
+    return ocr_processor.TesseractStitchedProcessor()
+  if name == 'libtesseract':
+    return ocr_processor.LibTesseractProcessor()
+
+  return ocr_processor.TesseractProcessor()
+
+def summarize(results, truths, elapsed):
+  """Prints latency, throughput and accuracy for the benchmark run."""
+  read = [r for r in results if r['error'] is None]
+  print('Envelopes: {}   errors: {}'.format(len(results),
+                                             len(results) - len(read)))
+  print('Throughput: {:.2f} envelopes/s'.format(len(results) / elapsed))
+  if len(read) > 0:
+    print('  {:<14s} {:>8s} {:>8s} {:>8s}'.format('stage', 'mean', 'p50',
+                                                'p95'))
+    for stage in STAGES:
+      ms = np.array([r[stage] for r in read])
+      print('  {:<14s} {:8.2f} {:8.2f} {:8.2f}'.format(
+          stage, ms.mean(), np.percentile(ms, 50), np.percentile(ms, 95)))
+
+  top_1 = sum(r['box_number'] == box for r, box in zip(results, truths))
+  top_3 = sum(r['top_boxes'] is not None and box in r['top_boxes']
+              for r, box in zip(results, truths))
+  print('Top-1 accuracy: {:.1%}'.format(top_1 / len(results)))
+  print('Top-3 accuracy: {:.1%}'.format(top_3 / len(results)))
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--rows', type=int, default=1000,
+                      help='Number of rows in the synthetic spreadsheet.')
+  parser.add_argument('--envelopes', type=int, default=100,
+                      help='Number of synthetic envelopes to read.')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--ocr', default='tesseract',
+                      choices=['tesseract', 'stitched', 'libtesseract',
+                               'truth'])
+  parser.add_argument('--roi-scale', type=int, default=4,
+                      help='ImageProcessor.roi_scale to use.')
+  parser.add_argument('--store-profile', action='store_true',
+                      help='Give TextAnalyzer the store address profile.')
+  args = parser.parse_args()
+
+  df = synthetic_data.generate_customer_dataframe(args.rows, seed=args.seed)
+  creator = database_creator.DatabaseCreator()
+  matcher = box_matching.BoxMatcher()
+  matcher.set_database_connection(creator.create_database_from_dataframe(df))
+  ocr = create_ocr_processor(args.ocr)
+  processor = image_process.ImageProcessor(ocr)
+  processor.roi_scale = args.roi_scale
+  store_profile = None
+  if args.store_profile:
+    store_profile = synthetic_data.create_store_profile()
+  analyzer = text_analyzer.TextAnalyzer(store_profile=store_profile)
+  reader = batch_reader.BatchReader(processor, ocr, analyzer, matcher)
+
+  # Render the corpus first so only reading is timed
+  corpus = list(generate_corpus(df, args.envelopes, args.seed))
+  results = []
+  start = time.perf_counter()
+  for idx, (lines, box, image) in enumerate(corpus):
+    if isinstance(ocr, GroundTruthOcrProcessor):
+      ocr.lines = lines
+    try:
+      results.append(reader.read('synthetic', idx, image))
+    except Exception as e:
+      traceback.print_exc()
+      result = dict.fromkeys(batch_reader.RESULT_COLUMNS)
+      result['error'] = repr(e)
+      results.append(result)
+  elapsed = time.perf_counter() - start
+
+  summarize(results, [box for _, box, _ in corpus], elapsed)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,94 @@
+"""Benchmarks matching mail against several stores.
+
+Creates synthetic stores, each with its own zip code, and compares matching
+envelopes against every store with routing each envelope to its store by
+zip code. Reports the memory held by the loaded stores and the mean
+matching latency per envelope.
+
+Usage:
+  python -m mail_reader.benchmarks.multi_store_benchmark [--stores 5]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+import mail_reader.addressee_identification.mail_fields as mail_fields
+import mail_reader.benchmarks.name_scoring_benchmark as name_scoring_benchmark
+import mail_reader.benchmarks.synthetic_data as synthetic_data
+import mail_reader.data_access.multi_store as multi_store
+import mail_reader.data_access.name_scoring as name_scoring
+
+def make_database(dfs):
+  """Returns MultiStoreDatabase with store 'store<i>' for each dataframe."""
+  database = multi_store.MultiStoreDatabase()
+  for idx, df in enumerate(dfs):
+    database.add_store('store' + str(idx), df=df,
+                       zip_code='{:05d}'.format(10000 + idx))
+
+  return database
+
+def make_fields(dfs, num_envelopes, rng):
+  """Returns list of MailFields with noisy names and the store's zip code."""
+  all_fields = []
+  for idx, df in enumerate(dfs):
+    for names in name_scoring_benchmark._make_envelopes(df, num_envelopes,
+                                                        rng):
+      fields = mail_fields.MailFields()
+      fields.addressee_line['all_names'] = names
+      fields.city_line['zip_code'] = ['{:05d}'.format(10000 + idx)]
+      all_fields.append(fields)
+
+  return all_fields
+
+def run_benchmark(dfs, all_fields, routed):
+  """Returns (KB held by loaded stores, ms per envelope).
+
+  Args:
+    dfs: Dataframe of each store's customers.
+    all_fields: MailFields to match.
+    routed: True to match each envelope against its zip code's store only,
+            False to match every envelope against every store.
+  """
+  database = make_database(dfs)
+  matcher = multi_store.MultiStoreMatcher(database,
+                                          name_scoring.BatchNameScorer())
+  store_ids = None if routed else database.get_store_ids()
+
+  tracemalloc.start()
+  matcher.get_matches(all_fields[0], top_k=3, store_ids=store_ids)
+  kb = tracemalloc.get_traced_memory()[0] / 1024
+  tracemalloc.stop()
+
+  start = time.perf_counter()
+  for fields in all_fields:
+    matcher.get_matches(fields, top_k=3, store_ids=store_ids)
+  ms = (time.perf_counter() - start) / len(all_fields) * 1000
+
+  return kb, ms
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--stores', type=int, default=5,
+                      help='Number of synthetic stores.')
+  parser.add_argument('--size', type=int, default=10000,
+                      help='Number of customer rows in each store.')
+  parser.add_argument('--envelopes', type=int, default=10,
+                      help='Number of envelopes to match per store.')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  dfs = [synthetic_data.generate_customer_dataframe(args.size,
+                                                    seed=args.seed + idx)
+         for idx in range(args.stores)]
+  rng = random.Random(args.seed)
+  # Only the first store gets mail, as when a single location is scanning
+  all_fields = make_fields(dfs[:1], args.envelopes, rng)
+
+  print('Stores: {}   rows per store: {}'.format(args.stores, args.size))
+  for description, routed in [('all stores', False), ('routed by zip', True)]:
+    kb, ms = run_benchmark(dfs, all_fields, routed)
+    print('  {:<16s} memory {:9.0f} KB  match {:8.2f} ms/envelope'.format(
+        description, kb, ms))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,94 @@
+"""Benchmarks candidate lookup in the BoxMatcher name indexes.
+
+Builds NGramNameIndex and EditDistanceNameIndex over the active name tokens
+of synthetic stores, then looks up names with OCR typos and reports memory,
+build time, mean lookup latency per name and how often the true name is in
+the candidates.
+
+Usage:
+  python -m mail_reader.benchmarks.name_index_benchmark [--sizes 10000 100000]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+import mail_reader.benchmarks.synthetic_data as synthetic_data
+import mail_reader.data_access.database_creator as database_creator
+import mail_reader.data_access.name_index as name_index
+
+def get_active_names(df):
+  """Returns list of (name, box) for every active name token in df."""
+  names = []
+  for name, suite, active in zip(df['NAME'], df['SUITE'], df['ACTIVE']):
+    if not active:
+      continue
+    for part in database_creator._split_names(name.upper()):
+      names.append((part, int(suite)))
+
+  return names
+
+def make_queries(names, num_queries, rng, max_typos=2):
+  """Returns (typo name, true name) for random names with 1 - max_typos typos.
+
+  Names too short to keep a letter after the typos are skipped.
+  """
+  queries = []
+  while len(queries) < num_queries:
+    name = rng.choice(names)[0]
+    if len(name) <= max_typos:
+      continue
+    letters = list(name)
+    for idx in rng.sample(range(len(letters)), rng.randint(1, max_typos)):
+      letters[idx] = rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ0158')
+    queries.append((''.join(letters), name))
+
+  return queries
+
+def run_benchmark(index_class, names, queries):
+  """Returns (build seconds, KB held, ms per lookup, recall) for one index."""
+  tracemalloc.start()
+  start = time.perf_counter()
+  index = index_class()
+  for name, box in names:
+    index.add_name(name, box)
+  build_seconds = time.perf_counter() - start
+  kb = tracemalloc.get_traced_memory()[0] / 1024
+  tracemalloc.stop()
+
+  found = 0
+  seconds = 0
+  for query, truth in queries:
+    start = time.perf_counter()
+    candidates = index.get_candidates(query)
+    seconds += time.perf_counter() - start
+    if any(name == truth for name, _ in candidates):
+      found += 1
+  ms = seconds / len(queries) * 1000
+
+  return build_seconds, kb, ms, found / len(queries)
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                      help='Number of customer rows in each synthetic store.')
+  parser.add_argument('--queries', type=int, default=1000,
+                      help='Number of names with typos to look up.')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  for size in args.sizes:
+    df = synthetic_data.generate_customer_dataframe(size, seed=args.seed)
+    names = get_active_names(df)
+    queries = make_queries(names, args.queries, random.Random(args.seed))
+    print('Customer rows: {}   unique names: {}'.format(
+        size, len(set(name for name, _ in names))))
+    for index_class in [name_index.NGramNameIndex,
+                        name_index.EditDistanceNameIndex]:
+      build_seconds, kb, ms, recall = run_benchmark(index_class, names,
+                                                    queries)
+      print('  {:<22s} build {:6.2f} s  memory {:9.0f} KB  '
+            'lookup {:7.3f} ms/name  recall {:.1%}'.format(
+                index_class.__name__, build_seconds, kb, ms, recall))
+
+if __name__ == '__main__':
+  main()
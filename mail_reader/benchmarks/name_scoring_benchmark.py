@@ -0,0 +1,133 @@
+"""Benchmarks per-envelope name matching latency for different store sizes.
+
+Compares the difflib NameScorer against the vectorized BatchNameScorer in
+both QuickNameAccess and BoxMatcher, BoxMatcher with and without its
+in-memory BoxEntityCache, and the n-gram against the edit distance name
+index.
+
+Usage:
+  python -m mail_reader.benchmarks.name_scoring_benchmark [--sizes 1000 10000]
+"""
+import argparse
+import random
+import time
+import mail_reader.addressee_identification.mail_fields as mail_fields
+import mail_reader.benchmarks.synthetic_data as synthetic_data
+import mail_reader.data_access.box_matching as box_matching
+import mail_reader.data_access.database_creator as database_creator
+import mail_reader.data_access.name_index as name_index
+import mail_reader.data_access.name_scoring as name_scoring
+import mail_reader.data_access.quick_name_accessor as quick_name_accessor
+
+def _add_ocr_noise(name, rng, error_rate=0.1):
+  """Returns name with random character substitutions, keeping first letter.
+
+  The first letter is kept so that QuickNameAccess letter buckets still exist.
+  """
+  letters = list(name)
+  for idx in range(1, len(letters)):
+    if rng.random() < error_rate:
+      letters[idx] = rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ0158')
+
+  return ''.join(letters)
+
+def _make_envelopes(df, num_envelopes, rng):
+  """Returns list of noisy name lists taken from random active customers."""
+  active = df[df['ACTIVE'] == 1]
+  envelopes = []
+  for _ in range(num_envelopes):
+    row = active.iloc[rng.randrange(len(active))]
+    names = [name for name in database_creator._split_names(row['NAME'])
+             if len(name) > 1]
+    envelopes.append([_add_ocr_noise(name, rng) for name in names])
+
+  return envelopes
+
+def _build_quick_access(df, scorer):
+  """Returns QuickNameAccess populated with every active customer name."""
+  access = quick_name_accessor.QuickNameAccess(scorer)
+  for name, suite, active in zip(df['NAME'], df['SUITE'], df['ACTIVE']):
+    if not active:
+      continue
+    for part in database_creator._split_names(name.upper()):
+      access.add_entry(part[0], quick_name_accessor.QuickAccessEntry(part,
+                                                                     suite))
+
+  return access
+
+def _time_per_envelope(match_function, envelopes):
+  """Returns mean milliseconds to run match_function on each envelope."""
+  start = time.perf_counter()
+  for names in envelopes:
+    match_function(names)
+
+  return (time.perf_counter() - start) / len(envelopes) * 1000
+
+def run_benchmark(size, num_envelopes, seed):
+  """Runs all matcher/scorer combinations for a single store size.
+
+  Returns:
+    List of (description, milliseconds per envelope).
+  """
+  rng = random.Random(seed)
+  df = synthetic_data.generate_customer_dataframe(size, seed=seed)
+  envelopes = _make_envelopes(df, num_envelopes, rng)
+  creator = database_creator.DatabaseCreator()
+  db_conn = creator.create_database_from_dataframe(df)
+
+  results = []
+  for scorer_name, scorer_class in [('NameScorer', name_scoring.NameScorer),
+                                    ('BatchNameScorer',
+                                     name_scoring.BatchNameScorer)]:
+    access = _build_quick_access(df, scorer_class())
+    ms = _time_per_envelope(access.find_matches_by_names, envelopes)
+    results.append(('QuickNameAccess + ' + scorer_name, ms))
+
+  def box_matcher_function(matcher):
+    def match(names):
+      fields = mail_fields.MailFields()
+      fields.addressee_line['all_names'] = names
+      return matcher.get_matches(fields)
+    return match
+
+  for scorer_name, scorer in [('difflib', None),
+                              ('BatchNameScorer',
+                               name_scoring.BatchNameScorer())]:
+    matcher = box_matching.BoxMatcher(scorer)
+    matcher.set_database_connection(db_conn)
+    ms = _time_per_envelope(box_matcher_function(matcher), envelopes)
+    results.append(('BoxMatcher + ' + scorer_name, ms))
+
+  # Same matcher reading box names with a sqlite query per box
+  matcher = box_matching.BoxMatcher(name_scoring.BatchNameScorer())
+  matcher.use_entity_cache = False
+  matcher.set_database_connection(db_conn)
+  ms = _time_per_envelope(box_matcher_function(matcher), envelopes)
+  results.append(('BoxMatcher + BatchNameScorer, sqlite', ms))
+
+  matcher = box_matching.BoxMatcher(
+      name_scoring.BatchNameScorer(),
+      index_class=name_index.EditDistanceNameIndex)
+  matcher.set_database_connection(db_conn)
+  ms = _time_per_envelope(box_matcher_function(matcher), envelopes)
+  results.append(('BoxMatcher + BatchNameScorer, edit dist', ms))
+
+  return results
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--sizes', type=int, nargs='+',
+                      default=[1000, 10000, 100000],
+                      help='Number of customer rows in each synthetic store.')
+  parser.add_argument('--envelopes', type=int, default=20,
+                      help='Number of envelopes to match per store size.')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  for size in args.sizes:
+    print('Customer rows: ' + str(size))
+    for description, ms in run_benchmark(size, args.envelopes, args.seed):
+      print('  {:<40s} {:10.2f} ms/envelope'.format(description, ms))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,53 @@
+"""Benchmarks OCR modes on envelope images.
+
+Compares one Tesseract call per line (TesseractProcessor) against a single
+call for all lines of an envelope (TesseractStitchedProcessor), using the
+same preprocessed line images for both. Warm libtesseract engines
+(LibTesseractProcessor) are included when libtesseract is installed.
+
+Usage:
+  python -m mail_reader.benchmarks.ocr_benchmark [image paths...]
+"""
+import argparse
+import time
+import cv2
+import mail_reader.vision.processing.image_process as image_process
+import mail_reader.vision.processing.ocr_processor as ocr_processor
+
+DEFAULT_IMAGES = [
+    './mail_reader/tests/vision/image_processing/test_image_0.jpg',
+    './mail_reader/tests/vision/image_processing/test_image_1.jpg',
+]
+
+def time_ocr(processor, line_images, repeats):
+  """Returns (mean milliseconds per envelope, text lines) for processor."""
+  start = time.perf_counter()
+  for _ in range(repeats):
+    text_lines = processor.get_text_lines(line_images)
+
+  return (time.perf_counter() - start) / repeats * 1000, text_lines
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('images', nargs='*', default=DEFAULT_IMAGES)
+  parser.add_argument('--repeats', type=int, default=5,
+                      help='Number of times to OCR each envelope.')
+  args = parser.parse_args()
+
+  modes = [('per line', ocr_processor.TesseractProcessor()),
+           ('stitched', ocr_processor.TesseractStitchedProcessor())]
+  if ocr_processor.LibTesseractProcessor.is_available():
+    modes.append(('libtess', ocr_processor.LibTesseractProcessor()))
+  preprocessor = image_process.ImageProcessor(modes[0][1])
+
+  for path in args.images:
+    line_images = preprocessor.get_line_images(cv2.imread(path))
+    print(path + ' (' + str(len(line_images)) + ' lines)')
+    for description, processor in modes:
+      ms, text_lines = time_ocr(processor, line_images, args.repeats)
+      print('  {:<10s} {:8.1f} ms/envelope'.format(description, ms))
+      for line in text_lines:
+        print('    ' + repr(line))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,258 @@
+"""Benchmarks per-stage preprocessing time and memory allocated per frame.
+
+Runs the same steps as ImageProcessor._preprocess on 1280x720 frames, once
+allocating new images for every operation and once reusing preallocated
+buffers, and reports milliseconds and peak kilobytes allocated for each
+stage. Allocations are measured with tracemalloc, which sees every numpy
+array OpenCV returns.
+
+Rotation and ROI detection sharing one edge map is compared against 
+finding them separately on the unrotated and rotated frame. Also compares 
+full ImageProcessor.get_line_images time at each roi_scale, 
+with the number of lines found and their sizes to check that downscaled 
+region of interest detection finds the same lines. Finally, contour 
+sorting, filtering, ordering and scoring are timed for cluttered frames with
+hundreds of contours, using per contour OpenCV calls and _ContourTable.
+
+Usage:
+  python -m mail_reader.benchmarks.preprocess_benchmark [image paths...]
+"""
+import argparse
+import collections
+import random
+import time
+import tracemalloc
+import cv2
+import numpy as np
+import mail_reader.benchmarks.synthetic_data as synthetic_data
+import mail_reader.vision.processing.image_process as image_process
+
+FRAME_SIZE = (1280, 720)
+
+def make_frame(seed=0):
+  """Returns a synthetic 1280x720 BGR frame of a slightly rotated envelope."""
+  rng = random.Random(seed)
+  lines = ['JOHN Q SAMPLE', synthetic_data.STORE_STREET_LINE + '102',
+           synthetic_data.STORE_CITY_LINE]
+
+  return synthetic_data.render_envelope(lines, rng, FRAME_SIZE)
+
+class StageTimer(object):
+  """Accumulates milliseconds and bytes allocated for named stages."""
+  def __init__(self):
+    self.ms = collections.OrderedDict()
+    self.kb = collections.OrderedDict()
+
+  def run(self, name, function, *args):
+    """Returns function(*args), recording its time and peak allocation."""
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    self.ms[name] = self.ms.get(name, 0) + elapsed * 1000
+    self.kb[name] = self.kb.get(name, 0) + (peak - current) / 1024
+
+    return result
+
+def preprocess_stages(image, processor, buffers, timer):
+  """Runs the ImageProcessor._preprocess steps on image, timing each one."""
+  def gray():
+    dst = None if buffers is None else buffers.get('gray', image.shape[:2])
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY, dst=dst)
+
+  def crop(gray_img, angle, roi_contour):
+    bounds = image_process._get_crop_bounds(roi_contour, gray_img.shape)
+    return image_process._rotate_and_crop(gray_img, angle, bounds)
+
+  def lines(cropped_img):
+    processor.line_contour_cfg.morph_close_size = (
+        int(cropped_img.shape[1]/2), 2)
+    contours = image_process._identify_contours(cropped_img,
+                                                processor.line_contour_cfg)
+    contours = image_process._reorder_contours_by_position(contours)
+    return image_process._remove_small_contours(contours)
+
+  def threshold(cropped_img, contours):
+    img_set = []
+    for contour in contours:
+      line_img = image_process._crop_image_to_contour(cropped_img, contour)
+      _, thresh_img = cv2.threshold(
+          line_img, thresh=0, maxval=255,
+          type=cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+      img_set.append(thresh_img)
+    return img_set
+
+  gray_img = timer.run('grayscale', gray)
+  angle, roi_contour = timer.run(
+      'rot + roi', image_process._find_rotation_and_roi, gray_img,
+      processor.rotation_cfg, processor.main_contour_cfg, buffers)
+  cropped_img = timer.run('crop', crop, gray_img, angle, roi_contour)
+  contours = timer.run('lines', lines, cropped_img)
+  return timer.run('threshold', threshold, cropped_img, contours)
+
+def separate_rotation_and_roi(gray_img, processor):
+  """Returns ROI found with separate edge maps for rotation and ROI.
+
+  This is how _preprocess used to work: find rotation, rotate the whole 
+  frame, threshold it (unused), then find edges and contours again on the 
+  rotated frame.
+  """
+  rotated_img, angle = image_process._fix_image_rotation(
+      gray_img, processor.rotation_cfg)
+  _, thresh_img = cv2.threshold(rotated_img, thresh=0, maxval=255,
+                                type=cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+  contours = image_process._identify_contours(rotated_img,
+                                              processor.main_contour_cfg)
+  img_center = (rotated_img.shape[0]/2, rotated_img.shape[1]/2)
+  best_contour = image_process._find_best_contour(contours, img_center)
+
+  return image_process._crop_image_to_contour(rotated_img, best_contour)
+
+def shared_rotation_and_roi(gray_img, processor):
+  """Returns ROI found from one edge map with rotated contour points."""
+  angle, roi_contour = image_process._find_rotation_and_roi(
+      gray_img, processor.rotation_cfg, processor.main_contour_cfg)
+  bounds = image_process._get_crop_bounds(roi_contour, gray_img.shape)
+
+  return image_process._rotate_and_crop(gray_img, angle, bounds)
+
+def time_rotation_and_roi(function, gray_images, processor, frames):
+  """Returns (mean ms per frame, ROI shape of gray_images[0])."""
+  roi_shape = function(gray_images[0], processor).shape
+  start = time.perf_counter()
+  for idx in range(frames):
+    function(gray_images[idx % len(gray_images)], processor)
+
+  return (time.perf_counter() - start) / frames * 1000, roi_shape
+
+def make_clutter_contours(num_contours, seed=0):
+  """Returns list of small random convex contours spread over a 720p frame."""
+  rng = np.random.RandomState(seed)
+  width, height = FRAME_SIZE
+  contours = []
+  for _ in range(num_contours):
+    corner = rng.randint(0, (width - 60, height - 60))
+    points = corner + rng.randint(0, rng.randint(4, 60), (8, 2))
+    contours.append(cv2.convexHull(points.astype(np.int32)))
+
+  return contours
+
+def per_contour_filter_and_order(contours, center):
+  """Sorts, filters, orders and scores contours with per contour calls.
+
+  Same steps as the table version, the way image_process did them before
+  _ContourTable.
+  """
+  contours = sorted(contours, key=cv2.contourArea, reverse=True)
+  max_contour_area = cv2.contourArea(contours[0])
+  max_dist = np.sqrt((center[1])**2 + (center[0])**2)
+  scores = []
+  for c in contours[:5]:
+    moments = cv2.moments(c)
+    if moments['m00'] == 0:
+      moments['m00'] = 1
+    cent_row = int(moments['m10']/moments['m00'])
+    cent_col = int(moments['m01']/moments['m00'])
+    dist = np.sqrt((cent_row - center[0])**2 + (cent_col - center[1])**2)
+    scores.append((1 - dist/max_dist) * cv2.contourArea(c)/max_contour_area)
+  best = contours[np.argmax(scores)]
+
+  def center_height(contour):
+    box = cv2.boxPoints(cv2.minAreaRect(contour))
+    return np.mean(box[:, 1])
+  contours = sorted(contours, key=center_height)
+  remove_idx = []
+  for idx, contour in enumerate(contours):
+    heights = sorted(contour[:, :, 0])
+    widths = sorted(contour[:, :, 1])
+    if heights[-1] - heights[0] < 15 or widths[-1] - widths[0] < 15:
+      remove_idx.append(idx)
+  contours = [c for idx, c in enumerate(contours) if idx not in remove_idx]
+
+  return best, contours
+
+def table_filter_and_order(contours, center):
+  """Sorts, filters, orders and scores contours with a _ContourTable."""
+  table = image_process._ContourTable(contours).sorted_by_area()
+  best = image_process._find_best_contour(table, center)
+  table = image_process._reorder_contours_by_position(table)
+
+  return best, image_process._remove_small_contours(table)
+
+def time_line_images(images, roi_scale, frames):
+  """Returns (mean ms per frame, line image shapes of images[0])."""
+  processor = image_process.ImageProcessor(None)
+  processor.roi_scale = roi_scale
+  line_shapes = [im.shape for im in processor.get_line_images(images[0])]
+  start = time.perf_counter()
+  for idx in range(frames):
+    processor.get_line_images(images[idx % len(images)])
+
+  return (time.perf_counter() - start) / frames * 1000, line_shapes
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('images', nargs='*',
+                      help='Frames to use, resized to 1280x720. Synthetic '
+                           'frames are used if none are given.')
+  parser.add_argument('--frames', type=int, default=50,
+                      help='Number of frames to process in each mode.')
+  parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4, 8],
+                      help='ImageProcessor.roi_scale values to compare.')
+  parser.add_argument('--clutter', type=int, nargs='+', default=[50, 500],
+                      help='Numbers of contours in cluttered frames.')
+  args = parser.parse_args()
+
+  if args.images:
+    images = [cv2.resize(cv2.imread(path), FRAME_SIZE) for path in args.images]
+  else:
+    images = [make_frame(seed) for seed in range(4)]
+
+  processor = image_process.ImageProcessor(None)
+  tracemalloc.start()
+  for description, buffers in [('allocating', None),
+                               ('reused buffers', image_process._BufferPool())]:
+    # Warm up once so buffers and cached kernels already exist
+    preprocess_stages(images[0], processor, buffers, StageTimer())
+    timer = StageTimer()
+    for idx in range(args.frames):
+      preprocess_stages(images[idx % len(images)], processor, buffers, timer)
+
+    print(description + ' (per frame)')
+    for name in timer.ms:
+      print('  {:<10s} {:8.2f} ms {:10.0f} KB peak allocated'.format(
+          name, timer.ms[name] / args.frames, timer.kb[name] / args.frames))
+    print('  {:<10s} {:8.2f} ms'.format(
+        'total', sum(timer.ms.values()) / args.frames))
+  tracemalloc.stop()
+
+  print('rotation and roi (per frame)')
+  gray_images = [cv2.cvtColor(im, cv2.COLOR_RGB2GRAY) for im in images]
+  for description, function in [('separate', separate_rotation_and_roi),
+                                ('shared', shared_rotation_and_roi)]:
+    ms, roi_shape = time_rotation_and_roi(function, gray_images, processor,
+                                          args.frames)
+    print('  {:<10s} {:8.2f} ms   roi: {}'.format(description, ms, roi_shape))
+
+  print('get_line_images by roi_scale (per frame)')
+  for scale in args.scales:
+    ms, line_shapes = time_line_images(images, scale, args.frames)
+    print('  {:<10d} {:8.2f} ms   lines: {}'.format(scale, ms, line_shapes))
+
+  print('contour filtering and ordering (per frame)')
+  center = (FRAME_SIZE[1]/2, FRAME_SIZE[0]/2)
+  for num_contours in args.clutter:
+    contours = make_clutter_contours(num_contours)
+    for description, function in [('per contour', per_contour_filter_and_order),
+                                   ('table', table_filter_and_order)]:
+      start = time.perf_counter()
+      for _ in range(args.frames):
+        _, kept = function(contours, center)
+      ms = (time.perf_counter() - start) / args.frames * 1000
+      print('  {:<5d} {:<12s} {:8.2f} ms   kept: {}'.format(
+          num_contours, description, ms, len(kept)))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,73 @@
+"""Benchmarks QuickNameAccess memory footprint and lookup latency.
+
+Builds a QuickNameAccess with one entry per customer name part of a
+synthetic store, and reports the memory it holds, the time to build it and
+the mean time to match each envelope's names.
+
+Usage:
+  python -m mail_reader.benchmarks.quick_access_benchmark [--entries 100000]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+import mail_reader.benchmarks.name_scoring_benchmark as name_scoring_benchmark
+import mail_reader.benchmarks.synthetic_data as synthetic_data
+import mail_reader.data_access.database_creator as database_creator
+import mail_reader.data_access.name_scoring as name_scoring
+import mail_reader.data_access.quick_name_accessor as quick_name_accessor
+
+def get_entries(df, num_entries):
+  """Returns first num_entries (name, box) pairs of active names in df."""
+  entries = []
+  for name, suite, active in zip(df['NAME'], df['SUITE'], df['ACTIVE']):
+    if not active:
+      continue
+    for part in database_creator._split_names(name.upper()):
+      entries.append((part, int(suite)))
+      if len(entries) == num_entries:
+        return entries
+
+  return entries
+
+def build_access(entries, scorer):
+  """Returns (QuickNameAccess, seconds to build, KB allocated by it)."""
+  tracemalloc.start()
+  start = time.perf_counter()
+  access = quick_name_accessor.QuickNameAccess(scorer)
+  for name, box in entries:
+    access.add_entry(name[0], quick_name_accessor.QuickAccessEntry(name, box))
+  seconds = time.perf_counter() - start
+  kb = tracemalloc.get_traced_memory()[0] / 1024
+  tracemalloc.stop()
+
+  return access, seconds, kb
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--entries', type=int, nargs='+', default=[100000],
+                      help='Number of name entries in each store.')
+  parser.add_argument('--envelopes', type=int, default=20,
+                      help='Number of envelopes to match per store.')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  for num_entries in args.entries:
+    # Names have ~2.5 parts on average, so this is always enough rows
+    df = synthetic_data.generate_customer_dataframe(num_entries,
+                                                    seed=args.seed)
+    entries = get_entries(df, num_entries)
+    envelopes = name_scoring_benchmark._make_envelopes(
+        df, args.envelopes, random.Random(args.seed))
+    print('Entries: ' + str(len(entries)))
+    for scorer_name, scorer_class in [('NameScorer', name_scoring.NameScorer),
+                                      ('BatchNameScorer',
+                                       name_scoring.BatchNameScorer)]:
+      access, seconds, kb = build_access(entries, scorer_class())
+      ms = name_scoring_benchmark._time_per_envelope(
+          access.find_matches_by_names, envelopes)
+      print('  {:<16s} build {:6.2f} s  memory {:8.0f} KB  '
+            'lookup {:8.2f} ms/envelope'.format(scorer_name, seconds, kb, ms))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,149 @@
+import random
+import cv2
+import numpy as np
+import pandas
+import mail_reader.addressee_identification.store_address as store_address
+
+# Syllables are combined to make surnames so large stores still get mostly
+# unique, pronounceable names instead of a handful of repeated ones.
+_SYLLABLES = ['AL', 'AN', 'AR', 'BA', 'BER', 'CAR', 'CHE', 'DA', 'DEL', 'EN',
+              'ER', 'FAL', 'FI', 'GAR', 'GO', 'HAR', 'HEN', 'IN', 'JO', 'KA',
+              'KIN', 'LA', 'LEE', 'LO', 'MA', 'MC', 'MER', 'MOR', 'NA', 'NI',
+              'OL', 'ON', 'PA', 'PER', 'QUI', 'RA', 'RI', 'ROS', 'SA', 'SON',
+              'STE', 'TA', 'TER', 'TON', 'UL', 'VA', 'VER', 'WA', 'WIL', 'ZA']
+_FIRST_NAMES = ['JAMES', 'MARY', 'JOHN', 'PATRICIA', 'ROBERT', 'JENNIFER',
+                'MICHAEL', 'LINDA', 'WILLIAM', 'ELIZABETH', 'DAVID', 'SUSAN',
+                'RICHARD', 'JESSICA', 'JOSEPH', 'SARAH', 'THOMAS', 'KAREN',
+                'FOX', 'FALCO', 'PEPPY', 'SLIPPY', 'KRYSTAL', 'WOLF']
+_COMPANY_WORDS = ['CONSULTING', 'DESIGN', 'GROUP', 'HOLDINGS', 'PARTNERS',
+                  'SERVICES', 'STUDIO', 'SUPPLY', 'SYSTEMS', 'TRADING']
+_COMPANY_SUFFIXES = ['LLC', 'INC', 'CORP', 'CO']
+# The store's own address, every envelope is sent to a box at this address
+STORE_STREET_LINE = '1234 MAIN ST STE '
+STORE_CITY_LINE = 'SPRINGFIELD CA 90210'
+STORE_PROFILE_CONFIG = {'street_number': '1234', 'street_name': 'MAIN',
+                        'street_suffixes': ['ST', 'STREET'],
+                        'city': 'SPRINGFIELD', 'state': 'CA',
+                        'zip_code': '90210'}
+
+def generate_surname(rng):
+  """Returns random surname made of 2 or 3 syllables (ie: 'MCDELSON')."""
+  count = rng.randint(2, 3)
+  return ''.join(rng.choice(_SYLLABLES) for _ in range(count))
+
+def generate_customer_name(rng):
+  """Returns random customer name, either a person or a company.
+
+  Args:
+    rng: random.Random object used for all random choices.
+
+  Returns:
+    Name formatted like the store spreadsheet ('MCDELSON, JAMES' or
+    'TERWAKIN DESIGN, LLC').
+  """
+  if rng.random() < 0.2:
+    return (generate_surname(rng) + ' ' + rng.choice(_COMPANY_WORDS) + ', ' +
+            rng.choice(_COMPANY_SUFFIXES))
+
+  return generate_surname(rng) + ', ' + rng.choice(_FIRST_NAMES)
+
+def generate_customer_dataframe(num_rows, seed=0, names_per_box=2,
+                                active_fraction=0.9):
+  """Returns synthetic customer data in the store spreadsheet layout.
+
+  Args:
+    num_rows: Number of customer rows to generate.
+    seed: Random seed so the same data is generated on every run.
+    names_per_box: Average number of customer rows sharing a box.
+    active_fraction: Fraction of rows that are active customers.
+
+  Returns:
+    Pandas dataframe with columns NAME, SUITE and ACTIVE.
+  """
+  rng = random.Random(seed)
+  num_boxes = max(1, num_rows // names_per_box)
+  names = []
+  suites = []
+  actives = []
+  for _ in range(num_rows):
+    names.append(generate_customer_name(rng))
+    suites.append(rng.randint(1, num_boxes))
+    actives.append(int(rng.random() < active_fraction))
+
+  return pandas.DataFrame({'NAME': names, 'SUITE': suites, 'ACTIVE': actives})
+
+def create_store_profile():
+  """Returns StoreAddressProfile for the synthetic store's address."""
+  return store_address.StoreAddressProfile(**STORE_PROFILE_CONFIG)
+
+def generate_envelope_lines(df, rng):
+  """Returns addressee lines for a random active customer in df.
+
+  Args:
+    df: Customer dataframe from generate_customer_dataframe.
+    rng: random.Random object used for all random choices.
+
+  Returns:
+    lines: List of addressee line strings, name first, the way they're 
+           printed on an envelope ('JAMES MCDELSON').
+    box: Box number the envelope is addressed to.
+  """
+  active = df[df['ACTIVE'] == 1]
+  row = active.iloc[rng.randrange(len(active))]
+  name = row['NAME']
+  # 'MCDELSON, JAMES' is printed as 'JAMES MCDELSON', companies as is
+  parts = name.split(', ')
+  if len(parts) == 2 and parts[1] not in _COMPANY_SUFFIXES:
+    name = parts[1] + ' ' + parts[0]
+  box = int(row['SUITE'])
+  lines = [name, STORE_STREET_LINE + str(box), STORE_CITY_LINE]
+
+  return lines, box
+
+def render_envelope(lines, rng, frame_size=(1280, 720), max_rotation=8,
+                    noise_std=4, max_blur=2):
+  """Returns synthetic camera frame of an envelope with lines printed on it.
+
+  The envelope is placed near the center of a gray background with the 
+  addressee block in its middle, then the frame is rotated, blurred and 
+  given sensor noise.
+
+  Args:
+    lines: Addressee lines to print, top to bottom.
+    rng: random.Random object used for all random choices.
+    frame_size: (width, height) of the frame.
+    max_rotation: Maximum rotation in degrees, either direction.
+    noise_std: Standard deviation of gaussian pixel noise.
+    max_blur: Maximum gaussian blur radius in pixels, 0 for no blur.
+
+  Returns:
+    BGR uint8 image of shape (height, width, 3).
+  """
+  width, height = frame_size
+  frame = np.full((height, width, 3), rng.randint(60, 120), dtype=np.uint8)
+  left = width // 5 + rng.randint(-40, 40)
+  top = height // 5 + rng.randint(-30, 30)
+  paper = rng.randint(215, 250)
+  cv2.rectangle(frame, (left, top), (width - left, height - top),
+                (paper, paper, paper), -1)
+
+  font = cv2.FONT_HERSHEY_SIMPLEX
+  scale = rng.uniform(0.8, 1.1)
+  line_height = int(40 * scale)
+  text_left = width // 2 - int(160 * scale)
+  text_top = height // 2 - line_height * (len(lines) - 2) // 2
+  for idx, line in enumerate(lines):
+    cv2.putText(frame, line, (text_left, text_top + idx * line_height), font,
+                scale, (20, 20, 20), 2, cv2.LINE_AA)
+
+  angle = rng.uniform(-max_rotation, max_rotation)
+  M = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1)
+  frame = cv2.warpAffine(frame, M, (width, height),
+                         borderMode=cv2.BORDER_REPLICATE)
+  blur = rng.randint(0, max_blur)
+  if blur > 0:
+    frame = cv2.GaussianBlur(frame, (2 * blur + 1, 2 * blur + 1), 0)
+  np_rng = np.random.RandomState(rng.randrange(2**32))
+  noise = np_rng.normal(0, noise_std, frame.shape)
+
+  return np.clip(frame + noise, 0, 255).astype(np.uint8)
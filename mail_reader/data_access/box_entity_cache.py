@@ -0,0 +1,131 @@
+class BoxEntityCache(object):
+  """In-memory copy of the active entities in each box.
+
+  BoxMatcher needs the original names of every box it returns and the
+  unique entity names of every box tied for first place. Reading them from
+  here instead of sqlite turns thousands of small joined queries per
+  envelope into dict lookups. Everything is loaded with two queries when the
+  cache is built.
+
+  Boxes are invalidated when their entities change (see DatabaseUpdater) and
+  reloaded from the database the next time they're read.
+
+  Attributes:
+    __db_conn: Database connection the cache was built from.
+    __original_names: Dict of box -> tuple of (original_name,) of each active
+                      entity, in entity_id order.
+    __entity_names: Dict of box -> tuple of (unique_entity_name, entity_id)
+                    of each active entity, in entity_id order.
+    __stale_boxes: Set of boxes to reload before they're read again.
+  """
+  def __init__(self):
+    self.__db_conn = None
+    self.__original_names = {}
+    self.__entity_names = {}
+    self.__stale_boxes = set()
+
+  def build_from_database(self, db_conn):
+    """Loads active entities of every box from a DatabaseCreator database.
+
+    Args:
+      db_conn: sqlite3 database connection created by DatabaseCreator.
+
+    Returns:
+      None.
+    """
+    self.__db_conn = db_conn
+    self.__stale_boxes = set()
+
+    original_names = {}
+    for (box, name) in self.__query_original_names():
+      original_names.setdefault(box, []).append((name,))
+    entity_names = {}
+    for (box, name, entity_id) in self.__query_entity_names():
+      entity_names.setdefault(box, []).append((name, entity_id))
+
+    self.__original_names = {box: tuple(names)
+                             for box, names in original_names.items()}
+    self.__entity_names = {box: tuple(names)
+                           for box, names in entity_names.items()}
+
+  def get_original_names(self, box):
+    """Returns list of (original_name,) of each active entity in box.
+
+    Same rows as querying entity_statuses for the box, ie:
+    [('MCCLOUD, FOX',), ('LOMBARDI, FALCO',)].
+    """
+    self.__refresh(box)
+    return list(self.__original_names.get(box, ()))
+
+  def get_entity_names(self, box):
+    """Returns (unique_entity_name, entity_id) of each active entity in box.
+
+    Returns:
+      Tuple of pairs, ie: (('FOX', 0), ('MCCLOUD', 0), ('FALCO', 1)).
+    """
+    self.__refresh(box)
+    return self.__entity_names.get(box, ())
+
+  def invalidate_box(self, box):
+    """Marks box to be reloaded from the database the next time it's read."""
+    self.__stale_boxes.add(box)
+
+  def add_name(self, name, box):
+    """Invalidates box when a name is added to it, see DatabaseUpdater."""
+    self.invalidate_box(box)
+
+  def remove_name(self, name, box):
+    """Invalidates box when a name is removed from it."""
+    self.invalidate_box(box)
+
+  def __refresh(self, box):
+    """Reloads box from the database if it has been invalidated."""
+    if box not in self.__stale_boxes:
+      return
+
+    original_names = tuple((name,) for (_, name) in
+                           self.__query_original_names(box))
+    entity_names = tuple((name, entity_id) for (_, name, entity_id) in
+                         self.__query_entity_names(box))
+    for cache, names in [(self.__original_names, original_names),
+                         (self.__entity_names, entity_names)]:
+      if len(names) > 0:
+        cache[box] = names
+      else:
+        cache.pop(box, None)
+    self.__stale_boxes.discard(box)
+
+  def __query_original_names(self, box=None):
+    """Returns (box, original_name) of active entities, in box or all."""
+    query = '''
+        SELECT b.box_id, e.original_name
+          FROM box_entities as b
+               INNER JOIN entity_statuses as e
+                       ON b.entity_id=e.entity_id
+         WHERE e.current=1
+    '''
+    return self.__query(query, box, 'e.entity_id')
+
+  def __query_entity_names(self, box=None):
+    """Returns (box, unique_entity_name, entity_id) of active entities."""
+    query = '''
+        SELECT b.box_id, n.unique_entity_name, n.entity_id
+          FROM unique_entity_names as n
+               INNER JOIN box_entities as b
+                       ON n.entity_id=b.entity_id
+               INNER JOIN entity_statuses as s
+                       ON s.entity_id=b.entity_id
+         WHERE s.current=1
+    '''
+    return self.__query(query, box, 'n.entity_id, n.unique_entity_name')
+
+  def __query(self, query, box, order):
+    """Runs query, limited to box unless it's None, and returns all rows."""
+    params = ()
+    if box is not None:
+      query += ' AND b.box_id=?'
+      params = (box,)
+    c = self.__db_conn.cursor()
+    c.execute(query + ' ORDER BY b.box_id, ' + order + ';', params)
+
+    return c.fetchall()
@@ -1,5 +1,9 @@
 import difflib
+import heapq
 from operator import itemgetter
+import mail_reader.data_access.box_entity_cache as box_entity_cache
+import mail_reader.data_access.name_index as name_index
+import mail_reader.metrics as metrics
 
 def _prune_common_words(names):
   """Removes common words from list of names.
@@ -20,7 +24,58 @@ def _prune_common_words(names):
   pruned = [name for name in names if name.upper() not in common_words]
   return pruned
 
-def _get_box_scores(name_to_match, name_list, box_multiplier):
+def _get_box_multipliers(probable_box):
+  """Returns set of boxes in probable_box as ints, like database box ids.
+
+  MailFields keeps box numbers read from the envelope as strings (ie: '102'),
+  so they have to be converted before being compared to database boxes.
+  Items that aren't integers are skipped.
+
+  Args:
+    probable_box: List of box numbers from MailFields.probable_box.
+
+  Returns:
+    Set of int box numbers.
+  """
+  boxes = set()
+  for box in probable_box:
+    try:
+      boxes.add(int(str(box).strip()))
+    except ValueError:
+      continue
+
+  return boxes
+
+def _get_name_scores(name_to_match, name_list, scorer):
+  """Returns similarity score of each name in name_list, in list order.
+
+  Args:
+    name_to_match: Name that we are trying to match (ie: 'FOX').
+    name_list: Names that we want to score and their associated box numbers.
+    scorer: NameScorer object to score with, or None to use difflib directly.
+
+  Returns:
+    List of scores, one per item in name_list.
+  """
+  if scorer is None:
+    # Create differ object here so we don't have to keep setting the first seq
+    differ = difflib.SequenceMatcher()
+    differ.set_seq1(name_to_match)
+    scores = []
+    for [name, box] in name_list:
+      differ.set_seq2(name)
+      scores.append(differ.ratio())
+    return scores
+
+  scorer.set_name_to_match(name_to_match)
+  scorer.set_match_list([name for [name, box] in name_list])
+  scores = [0] * len(name_list)
+  for score, idx in scorer.get_scores():
+    scores[idx] = score
+
+  return scores
+
+def _get_box_scores(name_to_match, name_list, box_multiplier, scorer=None):
   """Calculates box score dict for each name in name_list and returns scores.
 
   Calculates score for each name. Only the highest score for each box is saved
@@ -30,22 +85,21 @@ def _get_box_scores(name_to_match, name_list, box_multiplier):
     name_to_match: Name that we are trying to match (ie: 'FOX').
     name_list: Names that we want to score and their associated box numbers
                (ie [['FALCO', 555], ['FOX', 111], ['FRIEND', 2], ...]).
-    box_multiplier: List of boxes that should have a multiplied score.
+    box_multiplier: Boxes that should have a multiplied score, with the
+                    same type as the boxes in name_list.
+    scorer: Optional NameScorer object (ie: name_scoring.BatchNameScorer) to
+            score the names with. Uses difflib ratios if None.
 
   Returns:
     Dictionary of scores, keys = box number as int, values = best score.
   """
-  # Create differ object here so we don't have to keep setting the first seq
-  differ = difflib.SequenceMatcher()
-  differ.set_seq1(name_to_match)
+  name_scores = _get_name_scores(name_to_match, name_list, scorer)
 
   multiplier = 2  # Score multiplier if matches box_multiplier
   box_scores = {}
-  for [name, box] in name_list:
+  for [name, box], score in zip(name_list, name_scores):
     # Evaluate similarity and only add if unique. If not unique, only the 
     # highest score is saved so update the score if new one is higher.
-    differ.set_seq2(name)
-    score = differ.ratio()
     if box in box_multiplier:
       score *= multiplier
     if box in box_scores:
@@ -56,12 +110,14 @@ def _get_box_scores(name_to_match, name_list, box_multiplier):
 
   return box_scores
 
-def _combine_boxes_scores(box_scores):
+def _combine_boxes_scores(box_scores, top_k=None):
   """Returns overall box score list sorted in decreasing score order.
 
   Args:
     box_scores: List of dictionaries of box scores, which is a list of the 
                 results from _get_box_scores.
+    top_k: Only return the top_k best boxes, plus any more boxes tied with the
+           best score, or None to return every box.
 
   Returns:
     Overall box score list in decreasing score order [(box, score), 
@@ -77,7 +133,17 @@ def _combine_boxes_scores(box_scores):
 
   # Convert to list so we can sort by final score
   as_list = [[k, v] for (k, v) in temp_scores.items()]
-  final_scores = sorted(as_list, key=itemgetter(1), reverse=True) 
+  if top_k is None or len(as_list) <= top_k:
+    return sorted(as_list, key=itemgetter(1), reverse=True)
+
+  # Partial selection keeps this O(n log k). nlargest orders ties the same
+  # way as sorted, so the result is a prefix of the fully sorted list.
+  final_scores = heapq.nlargest(top_k, as_list, key=itemgetter(1))
+  # Every box tied with the best score is needed for conflict resolution,
+  # which can move any of them into the top_k
+  if len(final_scores) > 0 and final_scores[-1][1] >= final_scores[0][1]:
+    top_score = final_scores[0][1]
+    final_scores = [item for item in as_list if item[1] >= top_score]
 
   return final_scores
 
@@ -89,33 +155,85 @@ class BoxMatcher(object):
 
   Attributes:
     __db_conn: Database connection from which to get box data.
+    __name_index: Name index (NGramNameIndex by default) of active names built
+                  from __db_conn, used to shortlist candidate names for each
+                  name being matched.
+    __index_class: Class of __name_index.
+    __entity_cache: BoxEntityCache of the names in each box, built from
+                    __db_conn.
+    __scorer: NameScorer object used to score names, or None for difflib.
     __fields: MailFields object passed in by get_matches.
+    low_score_threshold: Best match score per name below which a match is
+                         counted as low confidence in metrics.
+    use_entity_cache: Read box names from __entity_cache instead of querying
+                      __db_conn for every box.
   """
-  def __init__(self):
-    pass
+  low_score_threshold = 0.75
+  use_entity_cache = True
 
-  def get_matches(self, mail_fields):
+  def __init__(self, scorer=None, index_class=None):
+    """Inits matcher.
+
+    Args:
+      scorer: Optional NameScorer object used to score candidate names, such
+              as name_scoring.BatchNameScorer. Defaults to difflib ratios.
+      index_class: Optional name index class with no required arguments,
+                   such as name_index.EditDistanceNameIndex. Defaults to
+                   name_index.NGramNameIndex.
+    """
+    self.__scorer = scorer
+    if index_class is None:
+      index_class = name_index.NGramNameIndex
+    self.__index_class = index_class
+
+  def get_matches(self, mail_fields, top_k=None, min_score=None):
     """Returns best matches of MailFields to database.
 
+    Names are only looked up for the boxes returned, so limiting the results
+    with top_k keeps the cost per envelope from growing with the number of
+    boxes that scored anything.
+
     Args:
       mail_fields: MailFields object to match database data to.
+      top_k: Maximum number of matches to return, or None for every box that
+             scored.
+      min_score: Only return matches with at least this score, or None.
 
     Returns:
-      List of box numbers with associated match score:
-        [[box, score], [box, score], ...]
+      List of match dicts in decreasing score order:
+        [{'box_number': box, 'score': score, 'all_names': [(name,), ...]},
+         ...]
     """
-    box_multipliers = mail_fields.probable_box
+    with metrics.timed('matcher.get_matches'):
+      final_matches = self.__get_matches(mail_fields, top_k, min_score)
+
+    num_names = len(_prune_common_words(
+        mail_fields.addressee_line['all_names']))
+    if len(final_matches) == 0:
+      metrics.increment('matcher.no_matches')
+    elif final_matches[0]['score'] < self.low_score_threshold * num_names:
+      metrics.increment('matcher.below_threshold')
+
+    return final_matches
+
+  def __get_matches(self, mail_fields, top_k, min_score):
+    """Returns best matches of MailFields to database, see get_matches."""
+    box_multipliers = _get_box_multipliers(mail_fields.probable_box)
     all_names = mail_fields.addressee_line['all_names']
     all_names = _prune_common_words(all_names)
     scores = []
     for name in all_names:
-      possible_names = self.__get_active_names_for_letter(name[0].upper())
+      possible_names = self.__name_index.get_candidates(name.upper())
       name_score = _get_box_scores(name.upper(), possible_names, 
-                                   box_multipliers)
+                                   box_multipliers, self.__scorer)
       scores.append(name_score)
 
-    combined_score = _combine_boxes_scores(scores)
+    combined_score = _combine_boxes_scores(scores, top_k)
     final_score = self.__resolve_conflicts(combined_score, all_names)
+    if min_score is not None:
+      final_score = [item for item in final_score if item[1] >= min_score]
+    if top_k is not None:
+      final_score = final_score[:top_k]
 
     final_matches = []
     for [box, score] in final_score:
@@ -128,6 +246,9 @@ class BoxMatcher(object):
     return final_matches
 
   def _get_active_names_in_box(self, box_number):
+    if self.use_entity_cache:
+      return self.__entity_cache.get_original_names(box_number)
+
     c = self.__db_conn.cursor()
     c.execute('''
         SELECT e.original_name
@@ -156,7 +277,7 @@ class BoxMatcher(object):
     # each score until we don't have the top score anymore. 
     top_score = scores[0][1]
     idx = 0
-    while scores[idx][1] >= top_score:
+    while idx < len(scores) and scores[idx][1] >= top_score:
       # For each box with a score that we need to reevaluate, grab the entity
       # names in that box. Those (entity_names) are individually scored again
       # against each of the original names that were being checked (names). For
@@ -168,10 +289,10 @@ class BoxMatcher(object):
       entity_names = self.__get_entity_names_for_box(box)
       entity_scores = []
       for name in names:
-        entity_scores.append(_get_box_scores(name, entity_names, []))
+        entity_scores.append(_get_box_scores(name, entity_names, [],
+                                             self.__scorer))
         # best = sorted(entity_scores.items(), key=itemgetter(1), reverse=True)[0]
-      combined_entity_scores = _combine_boxes_scores(entity_scores)
-      best = sorted(combined_entity_scores, key=itemgetter(1), reverse=True)[0]
+      best = _combine_boxes_scores(entity_scores, top_k=1)[0]
       scores[idx][1] += best[1]
       idx += 1
 
@@ -180,6 +301,9 @@ class BoxMatcher(object):
   def set_database_connection(self, db_conn):
     """Sets sqlite3 database connection to use for box matching.
 
+    Also builds the name index and entity cache from the active names in the
+    database, so this should be called again if the database is regenerated.
+
     Args:
       db_conn: Database connect to use.
 
@@ -187,36 +311,47 @@ class BoxMatcher(object):
       None.
     """
     self.__db_conn = db_conn
+    self.__name_index = self.__index_class()
+    self.__name_index.build_from_database(db_conn)
+    self.__entity_cache = box_entity_cache.BoxEntityCache()
+    self.__entity_cache.build_from_database(db_conn)
 
-  def __get_active_names_for_letter(self, letter):
-    """Queries database for matches beginning with letter.
+  def add_name(self, name, box):
+    """Adds an active name to the name index, see DatabaseUpdater.
+
+    Args:
+      name: Name string as stored in unique_entity_names.
+      box: Box number the name is now active in.
+
+    Returns:
+      None.
+    """
+    self.__name_index.add_name(name, box)
+    self.__entity_cache.invalidate_box(box)
 
-    First letter of string is given. Queries database for names starting with
-    that string and returns the names along with their boxes. Only returns 
-    names if they are active.
+  def remove_name(self, name, box):
+    """Removes a no longer active name from the name index.
 
     Args:
-      letter: First letter of name to search.
+      name: Name string as stored in unique_entity_names.
+      box: Box number the name is no longer active in.
 
     Returns:
-      Nested list of names and associated boxes [['NAME1', 20], ['NAME2', 30]]
+      None.
     """
-    # TODO(searow): need to add a way to access and assess both active and
-    #               inactive people eventually.
-    c = self.__db_conn.cursor()
-    c.execute('''
-        SELECT DISTINCT n.unique_entity_name, b.box_id
-                   FROM unique_entity_names as n
-                        INNER JOIN box_entities as b
-                                ON n.entity_id=b.entity_id
-                        INNER JOIN entity_statuses as s
-                                ON s.entity_id=b.entity_id
-                     WHERE n.unique_entity_name 
-                           LIKE ?
-                       AND s.current=1;
-    ''', (letter+'%',))
+    self.__name_index.remove_name(name, box)
+    self.__entity_cache.invalidate_box(box)
 
-    return c.fetchall()
+  def invalidate_box(self, box):
+    """Reloads names in box before it's next matched, see DatabaseUpdater.
+
+    Args:
+      box: Box number whose entities changed.
+
+    Returns:
+      None.
+    """
+    self.__entity_cache.invalidate_box(box)
 
   def __get_entity_names_for_box(self, box_number):
     """Queries db for all entities and their names in box_number.
@@ -226,6 +361,9 @@ class BoxMatcher(object):
     Returns:
       Nested list of names and associated boxes [['NAME1', 20], ['NAME2', 30]].
     """
+    if self.use_entity_cache:
+      return self.__entity_cache.get_entity_names(box_number)
+
     c = self.__db_conn.cursor()
     c.execute('''
         SELECT n.unique_entity_name, n.entity_id 
@@ -1,7 +1,13 @@
+import hashlib
+import os
 import sqlite3
 import pandas
 import re
 
+# Increment whenever the table layout or population logic changes so that
+# compiled databases created by older code are rebuilt instead of reused.
+DATABASE_VERSION = 1
+
 def _split_names(raw_name):
   """Splits name string into list of strings based on delimiter.
 
@@ -22,13 +28,59 @@ def _split_names(raw_name):
 
   return names
 
+def _hash_file(path):
+  """Returns sha256 hex digest of the file contents at path."""
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+      digest.update(chunk)
+
+  return digest.hexdigest()
+
+def _read_database_info(db_conn):
+  """Returns database_info table of a compiled database as a dictionary.
+
+  Returns an empty dictionary if the table doesn't exist or the file isn't a
+  readable sqlite database.
+  """
+  try:
+    c = db_conn.cursor()
+    c.execute('SELECT key, value FROM database_info;')
+    return dict(c.fetchall())
+  except sqlite3.DatabaseError:
+    return {}
+
+def _split_names_column(raw_names):
+  """Vectorized _split_names for a whole column of names at once.
+
+  Args:
+    raw_names: Pandas series of raw name strings.
+
+  Returns:
+    Pandas series of split, upper case names with one name per item. The
+    index of each item is the index of the raw name it came from. Empty names
+    are removed.
+  """
+  names = (raw_names.str.upper()
+                    .str.replace('.', '', regex=False)
+                    .str.split(r'[, ]', regex=True)
+                    .explode())
+  names = names[names.notna() & (names != '')]
+
+  return names
+
 class DatabaseCreator(object):
   """Creates an in-memory sqlite3 database using input data.
 
   Attributes:
+    bulk_ingestion: If True, tables are populated with vectorized dataframe
+                    operations and executemany in a single transaction. If
+                    False, the dataframe is inserted one row at a time.
     __db_conn: Sqlite database connection that will be eventually returned.
     _df: Pandas dataframe for file with data to put into database.
   """
+  bulk_ingestion = True
+
   def __init__(self):
     pass
 
@@ -41,20 +93,105 @@ class DatabaseCreator(object):
     Returns:
       In-memory sqlite database.
     """
-    # Save excel data into memory
-    self._df = pandas.read_excel(path)
+    return self.create_database_from_dataframe(pandas.read_excel(path))
+
+  def load_or_create_database(self, path, compiled_path=None):
+    """Returns database for excel file, reusing a compiled copy if possible.
+
+    The first time a file is loaded, the database is created as usual and then
+    saved to compiled_path along with the file's hash, the DATABASE_VERSION
+    and the creator class. Later calls only copy the compiled database into 
+    memory, and rebuild it if any of those have changed.
+
+    Args:
+      path: File path pointing to .xlsx file to read.
+      compiled_path: File path of compiled database. Defaults to path with
+                     '.sqlite' appended.
+
+    Returns:
+      In-memory sqlite database.
+    """
+    if compiled_path is None:
+      compiled_path = path + '.sqlite'
+
+    expected_info = {
+        'version': str(DATABASE_VERSION),
+        'creator': type(self).__name__,
+        'source_sha256': _hash_file(path),
+    }
+
+    if os.path.exists(compiled_path):
+      disk_conn = sqlite3.connect(compiled_path)
+      try:
+        if _read_database_info(disk_conn) == expected_info:
+          db_conn = sqlite3.connect(':memory:', check_same_thread=False)
+          disk_conn.backup(db_conn)
+          return db_conn
+      finally:
+        disk_conn.close()
+
+    db_conn = self.create_database_from_excel(path)
+    self.__save_compiled_database(db_conn, compiled_path, expected_info)
+
+    return db_conn
+
+  def __save_compiled_database(self, db_conn, compiled_path, info):
+    """Saves database and its database_info table to compiled_path.
+
+    Database is written to a temporary file first and then moved into place, 
+    so an interrupted save never leaves a compiled database that looks valid.
+    """
+    temp_path = compiled_path + '.tmp'
+    if os.path.exists(temp_path):
+      os.remove(temp_path)
+
+    disk_conn = sqlite3.connect(temp_path)
+    try:
+      db_conn.backup(disk_conn)
+      c = disk_conn.cursor()
+      c.execute("""
+          CREATE TABLE database_info (
+              key    TEXT,
+              value  TEXT,
+              PRIMARY KEY (key)
+          );
+      """)
+      c.executemany('INSERT INTO database_info (key, value) VALUES (?, ?);',
+                    sorted(info.items()))
+      disk_conn.commit()
+    finally:
+      disk_conn.close()
+
+    os.replace(temp_path, compiled_path)
+
+  def create_database_from_dataframe(self, df):
+    """Creates database from a dataframe already in memory.
+
+    Args:
+      df: Pandas dataframe with the same layout as the excel file.
+
+    Returns:
+      In-memory sqlite database.
+    """
+    # Copy so the column reformat doesn't modify the caller's dataframe
+    self._df = df.copy()
     self._column_reformat()
-    # Create SQL database in memory and populate
-    self.__db_conn = sqlite3.connect(':memory:')
+    # Create SQL database in memory and populate. The connection can be
+    # handed to another thread (ie: ReaderPipeline matcher stage), but must 
+    # only be used by one thread at a time.
+    self.__db_conn = sqlite3.connect(':memory:', check_same_thread=False)
     self.__create_tables()
-    self.__populate_file_entries()
+    if self.bulk_ingestion:
+      self.__bulk_populate_file_entries()
+    else:
+      self.__populate_file_entries()
 
     return self.__db_conn
 
   def _column_reformat(self):
     """Method to override so dataframe instance variable can be modified.
 
-    Method is called after pandas.read_excel() is called so we can perform
+    Method is called after the dataframe is loaded so we can perform
     maintenance on the dataframe in case the column headers need modification.
     Base class is not implemented since it uses the default column names.
     """
@@ -151,6 +288,50 @@ class DatabaseCreator(object):
 
     self.__db_conn.commit()
 
+  def __bulk_populate_file_entries(self):
+    """Populates database with data in excel file, using bulk inserts.
+
+    Produces the same tables as __populate_file_entries, with entity ids set
+    to the row positions in the dataframe.
+    """
+    entity_ids = list(range(len(self._df)))
+
+    # A box is active if any of its entities are active. Boxes are kept in
+    # order of first appearance to match __determine_active_boxes.
+    box_activities = (self._df['ACTIVE'].astype(bool)
+                                        .groupby(self._df['SUITE'], sort=False)
+                                        .any())
+
+    # Split names keep the row position as their index. Duplicate names within
+    # an entity are dropped here instead of relying on IntegrityError.
+    names = _split_names_column(self._df['NAME'].reset_index(drop=True))
+    unique_names = pandas.DataFrame({
+        'entity_id': names.index,
+        'name': names.values
+    }).drop_duplicates()
+
+    c = self.__db_conn.cursor()
+    c.executemany('''
+        INSERT INTO box_activities (box_id, active)
+        VALUES (?, ?);
+    ''', zip(box_activities.index.tolist(), box_activities.tolist()))
+    c.executemany('''
+        INSERT INTO entity_statuses (entity_id, current, original_name)
+        VALUES (?, ?, ?);
+    ''', zip(entity_ids, self._df['ACTIVE'].tolist(),
+             self._df['NAME'].tolist()))
+    c.executemany('''
+        INSERT INTO unique_entity_names (entity_id, unique_entity_name)
+        VALUES (?, ?);
+    ''', zip(unique_names['entity_id'].tolist(),
+             unique_names['name'].tolist()))
+    c.executemany('''
+        INSERT INTO box_entities (box_id, entity_id)
+        VALUES (?, ?);
+    ''', zip(self._df['SUITE'].tolist(), entity_ids))
+
+    self.__db_conn.commit()
+
   def __determine_active_boxes(self):
     """Checks dataframe to determine if boxes are active."""
     # Check all of the boxes. Set default box status to inactive and look for
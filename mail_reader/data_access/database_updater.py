@@ -0,0 +1,301 @@
+import contextlib
+import numbers
+import pandas
+import mail_reader.data_access.database_creator as database_creator
+
+_DIFF_ACTIONS = ['ADD', 'ACTIVATE', 'DEACTIVATE', 'CLOSE']
+
+def _parse_diff_row(row):
+  """Returns (action, name, box, active) of a row of changes, see apply_diff.
+
+  Raises:
+    UpdateError: The action is unknown, the name is empty or the suite isn't
+                 an integer.
+  """
+  action = str(row.get('ACTION')).upper()
+  if action not in _DIFF_ACTIONS:
+    raise UpdateError('Unknown update action ' + action, action)
+
+  suite = row.get('SUITE')
+  if isinstance(suite, str):
+    suite = suite.strip()
+    box = int(suite) if suite.isdigit() else None
+  elif isinstance(suite, numbers.Integral) and not isinstance(suite, bool):
+    box = int(suite)
+  elif isinstance(suite, float) and suite.is_integer():
+    # Suite columns with empty cells are read as floats
+    box = int(suite)
+  else:
+    box = None
+  if box is None:
+    raise UpdateError('Invalid suite ' + str(suite) + ' for ' + action,
+                      action)
+
+  name = row.get('NAME')
+  if action == 'CLOSE':
+    name = None
+  elif not isinstance(name, str) or len(name.strip()) == 0:
+    raise UpdateError('Missing name for ' + action + ' in suite ' + str(box),
+                      action)
+
+  if action == 'ADD':
+    active = row.get('ACTIVE', True)
+    active = True if pandas.isna(active) else bool(active)
+  else:
+    active = action == 'ACTIVATE'
+
+  return action, name, box, active
+
+class DatabaseUpdater(object):
+  """Applies incremental customer changes to a DatabaseCreator database.
+
+  Changes are made in place on the sqlite tables, and any registered listeners
+  (ie: BoxMatcher, NGramNameIndex) are told which active (name, box) pairs
+  appeared or disappeared so their in-memory indexes stay in sync without a
+  full reload. Changes are only made to the database passed in, so a compiled
+  database on disk still reflects the original spreadsheet.
+
+  Attributes:
+    __db_conn: Database connection to update.
+    __listeners: Objects with add_name(name, box) and remove_name(name, box)
+                 methods to be notified of changes, and optionally an
+                 invalidate_box(box) method.
+  """
+  def __init__(self, db_conn):
+    self.__db_conn = db_conn
+    self.__listeners = []
+
+  def add_listener(self, listener):
+    """Registers object to be notified when active names change.
+
+    Listeners with an invalidate_box(box) method are also told about every
+    box that was changed, even if its active names stayed the same (ie: an
+    entity with the same names was added), so caches of whole entities can
+    be refreshed.
+
+    Args:
+      listener: Object with add_name(name, box) and remove_name(name, box)
+                methods.
+
+    Returns:
+      None.
+    """
+    self.__listeners.append(listener)
+
+  def add_entity(self, name, box, active=True):
+    """Adds a new entity (box holder name) to a box.
+
+    Args:
+      name: Original name string as it would appear in the spreadsheet.
+      box: Box number to add the entity to.
+      active: Whether the entity is a current customer.
+
+    Returns:
+      entity_id of the new entity.
+    """
+    with self.__track_boxes([box]):
+      entity_id = self.__insert_entity(name, box, active)
+    self.__db_conn.commit()
+
+    return entity_id
+
+  def set_entity_status(self, name, box, active):
+    """Activates or deactivates entities in a box by their original name.
+
+    Args:
+      name: Original name of the entity (case insensitive).
+      box: Box number the entity is registered to.
+      active: New status for the entity.
+
+    Returns:
+      Number of entities updated.
+    """
+    with self.__track_boxes([box]):
+      count = self.__update_status(name, box, active)
+    self.__db_conn.commit()
+
+    return count
+
+  def close_box(self, box):
+    """Deactivates every entity in a box.
+
+    Args:
+      box: Box number to close.
+
+    Returns:
+      Number of entities updated.
+    """
+    with self.__track_boxes([box]):
+      count = self.__update_status(None, box, False)
+    self.__db_conn.commit()
+
+    return count
+
+  def apply_diff(self, df):
+    """Applies a dataframe of changes in a single transaction.
+
+    Each row has an ACTION column of ADD, ACTIVATE, DEACTIVATE or CLOSE and the
+    NAME and SUITE it applies to (NAME is ignored for CLOSE). An ACTIVE column
+    can be given for ADD rows, otherwise new entities are active. Every row
+    needs an integer SUITE, and every row but CLOSE a non-empty NAME.
+
+    Args:
+      df: Pandas dataframe of changes, applied in row order.
+
+    Returns:
+      None.
+
+    Raises:
+      UpdateError: A row is invalid, nothing is changed.
+    """
+    rows = [_parse_diff_row(row) for row in df.to_dict('records')]
+    with self.__track_boxes([box for (_, _, box, _) in rows]):
+      for (action, name, box, active) in rows:
+        if action == 'ADD':
+          self.__insert_entity(name, box, active)
+        elif action == 'CLOSE':
+          self.__update_status(None, box, False)
+        else:
+          self.__update_status(name, box, active)
+    self.__db_conn.commit()
+
+  def apply_diff_file(self, path):
+    """Applies changes from a csv file, see apply_diff for the format.
+
+    Args:
+      path: File path of .csv file with ACTION, NAME and SUITE columns.
+
+    Returns:
+      None.
+    """
+    df = pandas.read_csv(path)
+    df.rename(columns=lambda x: x.upper(), inplace=True)
+    self.apply_diff(df)
+
+  def __insert_entity(self, name, box, active):
+    """Inserts entity into every table without committing."""
+    c = self.__db_conn.cursor()
+    c.execute('SELECT COALESCE(MAX(entity_id) + 1, 0) FROM entity_statuses;')
+    entity_id = c.fetchone()[0]
+
+    c.execute('''
+        INSERT INTO entity_statuses (entity_id, current, original_name)
+        VALUES (?, ?, ?);
+    ''', (entity_id, active, name))
+    names = []
+    for split_name in database_creator._split_names(name.upper()):
+      if split_name not in names:
+        names.append(split_name)
+    c.executemany('''
+        INSERT INTO unique_entity_names (entity_id, unique_entity_name)
+        VALUES (?, ?);
+    ''', [(entity_id, split_name) for split_name in names])
+    c.execute('''
+        INSERT INTO box_entities (box_id, entity_id)
+        VALUES (?, ?);
+    ''', (box, entity_id))
+    c.execute('''
+        INSERT OR IGNORE INTO box_activities (box_id, active)
+        VALUES (?, 0);
+    ''', (box,))
+    self.__update_box_activity(box)
+
+    return entity_id
+
+  def __update_status(self, name, box, active):
+    """Sets current status of entities in box without committing.
+
+    Args:
+      name: Original name to match (case insensitive), or None for every
+            entity in the box.
+      box: Box number of the entities.
+      active: New status.
+
+    Returns:
+      Number of entities updated.
+    """
+    c = self.__db_conn.cursor()
+    query = '''
+        UPDATE entity_statuses
+           SET current=?
+         WHERE entity_id IN (SELECT entity_id
+                               FROM box_entities
+                              WHERE box_id=?)
+    '''
+    params = (active, box)
+    if name is not None:
+      query += ' AND UPPER(original_name)=?'
+      params += (name.upper(),)
+    c.execute(query + ';', params)
+    self.__update_box_activity(box)
+
+    return c.rowcount
+
+  def __update_box_activity(self, box):
+    """Recalculates box_activities for box from its entities."""
+    c = self.__db_conn.cursor()
+    c.execute('''
+        UPDATE box_activities
+           SET active=EXISTS (SELECT 1
+                                FROM box_entities as b
+                                     INNER JOIN entity_statuses as s
+                                             ON b.entity_id=s.entity_id
+                               WHERE b.box_id=?
+                                 AND s.current=1)
+         WHERE box_id=?;
+    ''', (box, box))
+
+  def __get_active_names(self, boxes):
+    """Returns set of active (name, box) pairs for the given boxes."""
+    c = self.__db_conn.cursor()
+    pairs = set()
+    for box in set(boxes):
+      c.execute('''
+          SELECT DISTINCT n.unique_entity_name, b.box_id
+                     FROM unique_entity_names as n
+                          INNER JOIN box_entities as b
+                                  ON n.entity_id=b.entity_id
+                          INNER JOIN entity_statuses as s
+                                  ON s.entity_id=b.entity_id
+                    WHERE s.current=1
+                      AND b.box_id=?;
+      ''', (box,))
+      pairs.update(c.fetchall())
+
+    return pairs
+
+  @contextlib.contextmanager
+  def __track_boxes(self, boxes):
+    """Notifies listeners of changes to active names in boxes.
+
+    Active names in boxes are captured on entry and compared on exit, and the
+    listeners are notified of the difference. If the changes raise, the
+    transaction is rolled back and nothing is notified.
+    """
+    before = self.__get_active_names(boxes)
+    try:
+      yield
+    except BaseException:
+      self.__db_conn.rollback()
+      raise
+    after = self.__get_active_names(boxes)
+
+    for (name, box) in sorted(before - after):
+      for listener in self.__listeners:
+        listener.remove_name(name, box)
+    for (name, box) in sorted(after - before):
+      for listener in self.__listeners:
+        listener.add_name(name, box)
+    for listener in self.__listeners:
+      if hasattr(listener, 'invalidate_box'):
+        for box in sorted(set(boxes)):
+          listener.invalidate_box(box)
+
+class Error(Exception):
+  pass
+
+class UpdateError(Error):
+  """Occurs when an update can't be applied to the database."""
+  def __init__(self, message, action):
+    self.message = message
+    self.action = action
@@ -0,0 +1,216 @@
+"""Customer data and box matching for several mailbox store locations.
+
+Each store's customer spreadsheet is loaded into its own in-memory database
+(shard), with its own name index and entity cache, the first time the store
+is matched against. Only the stores mail could be addressed to are matched,
+so memory and matching cost grow with the stores in use instead of with
+every customer of every location.
+
+  database = multi_store.MultiStoreDatabase()
+  database.add_store('downtown', path='./downtown.xlsx', zip_code='90210')
+  database.add_store('airport', path='./airport.xlsx', zip_code='90045')
+  matcher = multi_store.MultiStoreMatcher(database)
+  matches = matcher.get_matches(fields, top_k=3)
+
+Box numbers are only unique within a store, so every match also has the
+'store_id' it was found in.
+"""
+import heapq
+import itertools
+import threading
+import mail_reader.data_access.box_matching as box_matching
+import mail_reader.data_access.database_creator as database_creator
+
+class MultiStoreDatabase(object):
+  """Lazily loaded customer databases, one per store.
+
+  Attributes:
+    __stores: Dict of store_id -> dict with the 'loader' function that
+              creates the store's database and the store's 'zip_code'.
+    __connections: Dict of store_id -> sqlite3 connection of loaded stores.
+    __lock: Lock held while loading or unloading stores.
+  """
+  def __init__(self):
+    self.__stores = {}
+    self.__connections = {}
+    self.__lock = threading.Lock()
+
+  def add_store(self, store_id, path=None, df=None, creator=None,
+                zip_code=None):
+    """Registers a store. Its data isn't read until it's first used.
+
+    Args:
+      store_id: Unique id of the store (ie: 'downtown').
+      path: Excel file of the store's customers, loaded with
+            DatabaseCreator.load_or_create_database.
+      df: Dataframe of the store's customers, instead of path.
+      creator: DatabaseCreator used to create the database. Defaults to
+               DatabaseCreator().
+      zip_code: Store's 5 digit zip code, used to route mail to the store.
+
+    Returns:
+      None.
+    """
+    if store_id in self.__stores:
+      raise StoreError('Store ' + str(store_id) + ' already exists', store_id)
+    if (path is None) == (df is None):
+      raise StoreError('Exactly one of path or df is needed', store_id)
+    if creator is None:
+      creator = database_creator.DatabaseCreator()
+
+    if path is not None:
+      loader = lambda: creator.load_or_create_database(path)
+    else:
+      loader = lambda: creator.create_database_from_dataframe(df)
+    self.__stores[store_id] = {'loader': loader, 'zip_code': zip_code}
+
+  def get_store_ids(self):
+    """Returns list of store ids in the order they were added."""
+    return list(self.__stores)
+
+  def get_store_ids_by_zip(self, zip_code):
+    """Returns list of store ids with zip_code."""
+    return [store_id for store_id, store in self.__stores.items()
+            if store['zip_code'] is not None and store['zip_code'] == zip_code]
+
+  def get_connection(self, store_id):
+    """Returns the store's database connection, loading it if needed.
+
+    Args:
+      store_id: Id of a store added with add_store.
+
+    Returns:
+      In-memory sqlite3 database created by DatabaseCreator.
+    """
+    if store_id not in self.__stores:
+      raise StoreError('Store ' + str(store_id) + ' doesn\'t exist', store_id)
+
+    with self.__lock:
+      if store_id not in self.__connections:
+        self.__connections[store_id] = self.__stores[store_id]['loader']()
+      return self.__connections[store_id]
+
+  def is_loaded(self, store_id):
+    """Returns True if the store's database is in memory."""
+    return store_id in self.__connections
+
+  def unload_store(self, store_id):
+    """Closes the store's database. It's loaded again when next used."""
+    with self.__lock:
+      db_conn = self.__connections.pop(store_id, None)
+    if db_conn is not None:
+      db_conn.close()
+
+class MultiStoreMatcher(object):
+  """Matches MailFields against the customers of one or several stores.
+
+  Each store gets its own BoxMatcher, created when the store is first
+  matched, so name indexes are partitioned by store. Has the same
+  get_matches interface as BoxMatcher, so it can be used by ReaderPipeline
+  and BatchReader.
+
+  Mail is routed by the zip codes read from the envelope: if any of them
+  belong to stores, only those stores are matched, otherwise every store is.
+
+  To keep a store in sync with a DatabaseUpdater, register the store's
+  matcher as a listener:
+
+    updater = database_updater.DatabaseUpdater(
+        database.get_connection(store_id))
+    updater.add_listener(matcher.get_matcher(store_id))
+
+  Attributes:
+    __database: MultiStoreDatabase holding each store's data.
+    __scorer: NameScorer passed to every store's BoxMatcher.
+    __index_class: Name index class passed to every store's BoxMatcher.
+    __matchers: Dict of store_id -> BoxMatcher of loaded stores.
+    __lock: Lock held while creating or removing BoxMatchers.
+  """
+  def __init__(self, database, scorer=None, index_class=None):
+    """Inits matcher.
+
+    Args:
+      database: MultiStoreDatabase with the stores to match against.
+      scorer: Optional NameScorer, see BoxMatcher.
+      index_class: Optional name index class, see BoxMatcher.
+    """
+    self.__database = database
+    self.__scorer = scorer
+    self.__index_class = index_class
+    self.__matchers = {}
+    self.__lock = threading.Lock()
+
+  def get_matcher(self, store_id):
+    """Returns the store's BoxMatcher, loading the store if needed."""
+    with self.__lock:
+      if store_id not in self.__matchers:
+        matcher = box_matching.BoxMatcher(self.__scorer, self.__index_class)
+        matcher.set_database_connection(
+            self.__database.get_connection(store_id))
+        self.__matchers[store_id] = matcher
+      return self.__matchers[store_id]
+
+  def unload_store(self, store_id):
+    """Frees the store's BoxMatcher and database until it's used again."""
+    with self.__lock:
+      self.__matchers.pop(store_id, None)
+    self.__database.unload_store(store_id)
+
+  def get_store_ids_for_fields(self, mail_fields):
+    """Returns ids of the stores mail_fields could be addressed to.
+
+    Stores whose zip code was read on the envelope, or every store if none
+    of the zip codes read belong to a store.
+    """
+    store_ids = []
+    for zip_code in mail_fields.city_line['zip_code']:
+      for store_id in self.__database.get_store_ids_by_zip(zip_code):
+        if store_id not in store_ids:
+          store_ids.append(store_id)
+
+    if len(store_ids) == 0:
+      return self.__database.get_store_ids()
+    return store_ids
+
+  def get_matches(self, mail_fields, top_k=None, min_score=None,
+                  store_ids=None):
+    """Returns best matches of MailFields across stores.
+
+    Args:
+      mail_fields: MailFields object to match database data to.
+      top_k: Maximum number of matches to return, or None for every box that
+             scored in every store.
+      min_score: Only return matches with at least this score, or None.
+      store_ids: Ids of the stores to match against. Defaults to the stores
+                 chosen by get_store_ids_for_fields.
+
+    Returns:
+      List of match dicts in decreasing score order, see
+      BoxMatcher.get_matches, each with the 'store_id' of its box. Matches
+      with equal scores keep the order of store_ids.
+    """
+    if store_ids is None:
+      store_ids = self.get_store_ids_for_fields(mail_fields)
+
+    store_matches = []
+    for store_id in store_ids:
+      matches = self.get_matcher(store_id).get_matches(mail_fields, top_k,
+                                                       min_score)
+      for match in matches:
+        match['store_id'] = store_id
+      store_matches.append(matches)
+
+    # Each store's matches are already sorted, so merge instead of sorting
+    merged = heapq.merge(*store_matches, key=lambda match: match['score'],
+                         reverse=True)
+
+    return list(itertools.islice(merged, top_k))
+
+class Error(Exception):
+  pass
+
+class StoreError(Error):
+  """Occurs when a store can't be added or doesn't exist."""
+  def __init__(self, message, store_id):
+    self.message = message
+    self.store_id = store_id
@@ -0,0 +1,432 @@
+import heapq
+
+def _get_ngrams(name, n):
+  """Returns the set of character n-grams in name.
+
+  The name is padded with '$' on both ends so that the start and end of a
+  name produce their own n-grams (ie: 'FOX' -> '$FO', 'FOX', 'OX$'). Names
+  too short to produce a full n-gram are returned as a single padded item.
+
+  Args:
+    name: String to split into n-grams.
+    n: Length of each n-gram.
+
+  Returns:
+    Set of n-gram strings.
+  """
+  padded = '$' + name + '$'
+  if len(padded) <= n:
+    return set([padded])
+
+  return set(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+def _get_active_names(db_conn):
+  """Returns list of (name, box) of active names in a DatabaseCreator db."""
+  # TODO(searow): need to add a way to access and assess both active and
+  #               inactive people eventually.
+  c = db_conn.cursor()
+  c.execute('''
+      SELECT DISTINCT n.unique_entity_name, b.box_id
+                 FROM unique_entity_names as n
+                      INNER JOIN box_entities as b
+                              ON n.entity_id=b.entity_id
+                      INNER JOIN entity_statuses as s
+                              ON s.entity_id=b.entity_id
+                WHERE s.current=1;
+  ''')
+
+  return c.fetchall()
+
+def _get_deletes(name, max_distance):
+  """Returns set of strings made by deleting up to max_distance characters.
+
+  Args:
+    name: String to delete characters from.
+    max_distance: Maximum number of characters to delete.
+
+  Returns:
+    Set of strings, including name itself (ie: 'FOX', 1 -> 'FOX', 'OX', 'FX',
+    'FO').
+  """
+  deletes = set([name])
+  current = [name]
+  for _ in range(max_distance):
+    next_deletes = []
+    for item in current:
+      for i in range(len(item)):
+        deleted = item[:i] + item[i + 1:]
+        if deleted not in deletes:
+          deletes.add(deleted)
+          next_deletes.append(deleted)
+    current = next_deletes
+
+  return deletes
+
+def _edit_distance(name_a, name_b, max_distance):
+  """Returns Levenshtein distance, or max_distance + 1 if it's larger.
+
+  Only cells within max_distance of the diagonal can lead to a distance of
+  max_distance or less, so each row only fills that band, and stops as soon
+  as every cell in a row is over max_distance.
+  """
+  len_b = len(name_b)
+  if abs(len(name_a) - len_b) > max_distance:
+    return max_distance + 1
+
+  too_far = max_distance + 1
+  previous = list(range(len_b + 1))
+  for i, letter_a in enumerate(name_a, 1):
+    low = max(1, i - max_distance)
+    high = min(len_b, i + max_distance)
+    current = [too_far] * (len_b + 1)
+    current[0] = i if i <= max_distance else too_far
+    best = current[0]
+    for j in range(low, high + 1):
+      cost = previous[j - 1] + (letter_a != name_b[j - 1])
+      if previous[j] + 1 < cost:
+        cost = previous[j] + 1
+      if current[j - 1] + 1 < cost:
+        cost = current[j - 1] + 1
+      current[j] = cost
+      if cost < best:
+        best = cost
+    if best > max_distance:
+      return too_far
+    previous = current
+
+  return min(previous[len_b], too_far)
+
+class NGramNameIndex(object):
+  """Character n-gram inverted index over active customer names.
+
+  Used by BoxMatcher to generate a shortlist of candidate names for an OCR'd
+  name so that only the shortlist has to go through the expensive similarity
+  scoring. Candidates are ranked by n-gram overlap, so a wrong first letter
+  from the OCR only costs a couple of n-grams instead of the whole match.
+
+  A single OCR error can leave a short name (ie: 'F0X' or 'L1') without any
+  n-gram in common with the real name, so short names are also indexed by
+  bigrams, and short queries are matched on both.
+
+  Attributes:
+    __n: Length of n-grams used in the index.
+    __max_candidates: Maximum number of unique names returned per query.
+    __short_length: Queries of this length or less are also matched on
+                    bigrams.
+    __postings: Dictionary of n-gram -> set of names containing that n-gram.
+    __short_postings: Dictionary of bigram -> set of short names (up to one
+                      letter longer than short_length) containing it.
+    __name_boxes: Dictionary of name -> set of boxes the name is active in.
+    __name_sizes: Dictionary of name -> number of n-grams in the name.
+  """
+  def __init__(self, n=3, max_candidates=50, short_length=3):
+    """Inits an empty index.
+
+    Args:
+      n: Length of n-grams to index on.
+      max_candidates: Maximum number of unique names to return per query.
+      short_length: Queries of this length or less are also matched on
+                    bigrams of names up to one letter longer.
+    """
+    self.__n = n
+    self.__max_candidates = max_candidates
+    self.__short_length = short_length
+    self.__postings = {}
+    self.__short_postings = {}
+    self.__name_boxes = {}
+    self.__name_sizes = {}
+
+  def build_from_database(self, db_conn):
+    """Populates the index with active names from a DatabaseCreator database.
+
+    Args:
+      db_conn: sqlite3 database connection created by DatabaseCreator.
+
+    Returns:
+      None.
+    """
+    for (name, box) in _get_active_names(db_conn):
+      self.add_name(name, box)
+
+  def add_name(self, name, box):
+    """Adds a single name and its box to the index.
+
+    Args:
+      name: Name string as stored in unique_entity_names (ie: 'FOX').
+      box: Box number the name is registered to.
+
+    Returns:
+      None.
+    """
+    if name not in self.__name_boxes:
+      ngrams = _get_ngrams(name, self.__n)
+      for ngram in ngrams:
+        if ngram not in self.__postings:
+          self.__postings[ngram] = set()
+        self.__postings[ngram].add(name)
+      if self.__is_short(name, 1):
+        for bigram in _get_ngrams(name, 2):
+          if bigram not in self.__short_postings:
+            self.__short_postings[bigram] = set()
+          self.__short_postings[bigram].add(name)
+      self.__name_boxes[name] = set()
+      self.__name_sizes[name] = len(ngrams)
+
+    self.__name_boxes[name].add(box)
+
+  def remove_name(self, name, box):
+    """Removes a name from a box, dropping the name once it has no boxes.
+
+    Args:
+      name: Name string to remove.
+      box: Box number the name should no longer be matched to.
+
+    Returns:
+      None.
+    """
+    if name not in self.__name_boxes:
+      return
+
+    self.__name_boxes[name].discard(box)
+    if len(self.__name_boxes[name]) > 0:
+      return
+
+    for ngram in _get_ngrams(name, self.__n):
+      self.__postings[ngram].discard(name)
+      if len(self.__postings[ngram]) == 0:
+        del self.__postings[ngram]
+    if self.__is_short(name, 1):
+      for bigram in _get_ngrams(name, 2):
+        self.__short_postings[bigram].discard(name)
+        if len(self.__short_postings[bigram]) == 0:
+          del self.__short_postings[bigram]
+    del self.__name_boxes[name]
+    del self.__name_sizes[name]
+
+  def get_candidates(self, name):
+    """Returns shortlist of indexed names that are similar to name.
+
+    Names are ranked by the Dice coefficient of their n-gram sets and only the
+    best max_candidates names are kept. Short queries are also compared to
+    short names by bigrams, and each name keeps its better coefficient. Each
+    name is returned once per box it is registered to.
+
+    Args:
+      name: Name to find candidates for (ie: 'SM1TH').
+
+    Returns:
+      Nested list of names and associated boxes [['NAME1', 20], ['NAME2', 30]]
+    """
+    scores = self.__get_dice_scores(
+        _get_ngrams(name, self.__n), self.__postings,
+        lambda candidate: self.__name_sizes[candidate])
+    if self.__is_short(name, 0):
+      short_scores = self.__get_dice_scores(
+          _get_ngrams(name, 2), self.__short_postings,
+          lambda candidate: len(_get_ngrams(candidate, 2)))
+      for candidate, score in short_scores.items():
+        if score > scores.get(candidate, 0):
+          scores[candidate] = score
+
+    # Ties are broken by name so the shortlist doesn't depend on set ordering
+    best = heapq.nlargest(self.__max_candidates, scores.items(),
+                          key=lambda item: (item[1], item[0]))
+
+    candidates = []
+    for (candidate, _) in best:
+      for box in sorted(self.__name_boxes[candidate]):
+        candidates.append([candidate, box])
+
+    return candidates
+
+  def __is_short(self, name, extra_letters):
+    """Returns True if name has at most short_length + extra_letters."""
+    return len(name) <= self.__short_length + extra_letters
+
+  def __get_dice_scores(self, query, postings, get_size):
+    """Returns dict of name -> Dice coefficient with the query n-grams.
+
+    Args:
+      query: Set of n-grams of the query name.
+      postings: Dictionary of n-gram -> set of names to search.
+      get_size: Function returning the number of n-grams of an indexed name.
+
+    Returns:
+      Dict with every name sharing at least one n-gram with query.
+    """
+    # Count shared n-grams for every name that shares at least one
+    shared = {}
+    for ngram in query:
+      for candidate in postings.get(ngram, ()):
+        shared[candidate] = shared.get(candidate, 0) + 1
+
+    query_size = len(query)
+    return {candidate: 2 * count / (query_size + get_size(candidate))
+            for candidate, count in shared.items()}
+
+  def __len__(self):
+    """Returns number of unique names in the index."""
+    return len(self.__name_boxes)
+
+class EditDistanceNameIndex(object):
+  """Symmetric delete index answering "all names within edit distance d".
+
+  Every name is stored under each string made by deleting up to
+  max_distance of its characters. Two names within edit distance d of each
+  other always share one of those strings, so a query only has to look up
+  its own deletes instead of scoring every name. The few names found are
+  then checked with the real Levenshtein distance. Lookups cost the same
+  for any number of names, so OCR typos like 'SM1TH' or 'MCCL0UD' are found
+  in well under a millisecond in large stores.
+
+  Has the same interface as NGramNameIndex, so either can generate
+  candidates for BoxMatcher or QuickNameAccess. Unlike NGramNameIndex, names
+  further than max_distance from the query are never returned.
+
+  Attributes:
+    __max_distance: Largest edit distance a candidate can be from the query.
+    __max_candidates: Maximum number of unique names returned per query.
+    __deletes: Dictionary of delete string -> name it comes from, or set of
+               names if more than one. Most delete strings only come from one
+               name, and a plain string uses much less memory than a set.
+    __name_boxes: Dictionary of name -> set of boxes the name is active in.
+    __sorted_boxes: Dictionary of name -> sorted tuple of its boxes, filled in
+                    as names are returned. Common first names are active in
+                    thousands of boxes, so they're only sorted once.
+  """
+  def __init__(self, max_distance=2, max_candidates=50):
+    """Inits an empty index.
+
+    Args:
+      max_distance: Largest edit distance a candidate can be from the query.
+                    Memory use grows quickly with it, 1 or 2 is enough for
+                    OCR errors.
+      max_candidates: Maximum number of unique names to return per query.
+    """
+    self.__max_distance = max_distance
+    self.__max_candidates = max_candidates
+    self.__deletes = {}
+    self.__name_boxes = {}
+    self.__sorted_boxes = {}
+
+  def build_from_database(self, db_conn):
+    """Populates the index with active names from a DatabaseCreator database.
+
+    Args:
+      db_conn: sqlite3 database connection created by DatabaseCreator.
+
+    Returns:
+      None.
+    """
+    for (name, box) in _get_active_names(db_conn):
+      self.add_name(name, box)
+
+  def add_name(self, name, box):
+    """Adds a single name and its box to the index.
+
+    Args:
+      name: Name string as stored in unique_entity_names (ie: 'FOX').
+      box: Box number the name is registered to.
+
+    Returns:
+      None.
+    """
+    if name not in self.__name_boxes:
+      for deleted in _get_deletes(name, self.__max_distance):
+        names = self.__deletes.get(deleted)
+        if names is None:
+          self.__deletes[deleted] = name
+        elif isinstance(names, str):
+          self.__deletes[deleted] = set([names, name])
+        else:
+          names.add(name)
+      self.__name_boxes[name] = set()
+
+    self.__name_boxes[name].add(box)
+    self.__sorted_boxes.pop(name, None)
+
+  def remove_name(self, name, box):
+    """Removes a name from a box, dropping the name once it has no boxes.
+
+    Args:
+      name: Name string to remove.
+      box: Box number the name should no longer be matched to.
+
+    Returns:
+      None.
+    """
+    if name not in self.__name_boxes:
+      return
+
+    self.__name_boxes[name].discard(box)
+    self.__sorted_boxes.pop(name, None)
+    if len(self.__name_boxes[name]) > 0:
+      return
+
+    for deleted in _get_deletes(name, self.__max_distance):
+      names = self.__deletes[deleted]
+      if isinstance(names, str):
+        del self.__deletes[deleted]
+        continue
+      names.discard(name)
+      if len(names) == 1:
+        self.__deletes[deleted] = names.pop()
+    del self.__name_boxes[name]
+
+  def get_names_within(self, name, max_distance=None):
+    """Returns indexed names within edit distance of name, closest first.
+
+    Args:
+      name: Name to look up (ie: 'SM1TH').
+      max_distance: Largest edit distance to return, at most the index's
+                    max_distance. Defaults to the index's max_distance.
+
+    Returns:
+      List of (distance, name) sorted by distance, then name.
+    """
+    if max_distance is None or max_distance > self.__max_distance:
+      max_distance = self.__max_distance
+
+    found = set()
+    for deleted in _get_deletes(name, max_distance):
+      names = self.__deletes.get(deleted)
+      if names is None:
+        continue
+      if isinstance(names, str):
+        found.add(names)
+      else:
+        found.update(names)
+
+    within = []
+    for candidate in found:
+      distance = _edit_distance(name, candidate, max_distance)
+      if distance <= max_distance:
+        within.append((distance, candidate))
+
+    return sorted(within)
+
+  def get_candidates(self, name):
+    """Returns shortlist of indexed names within edit distance of name.
+
+    Only the closest max_candidates names are kept. Each name is returned
+    once per box it is registered to.
+
+    Args:
+      name: Name to find candidates for (ie: 'SM1TH').
+
+    Returns:
+      Nested list of names and associated boxes [['NAME1', 20], ['NAME2', 30]]
+    """
+    candidates = []
+    for (_, candidate) in self.get_names_within(name)[:self.__max_candidates]:
+      boxes = self.__sorted_boxes.get(candidate)
+      if boxes is None:
+        boxes = tuple(sorted(self.__name_boxes[candidate]))
+        self.__sorted_boxes[candidate] = boxes
+      candidates.extend([candidate, box] for box in boxes)
+
+    return candidates
+
+  def __len__(self):
+    """Returns number of unique names in the index."""
+    return len(self.__name_boxes)
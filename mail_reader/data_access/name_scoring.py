@@ -1,4 +1,5 @@
 import difflib
+import numpy as np
 
 class NameScorer(object):
   def __init__(self):
@@ -60,3 +61,151 @@ class NameScorer(object):
     scores = sorted(scores, key=lambda lst: lst[0], reverse=True)
 
     return scores
+
+def _encode_names(names):
+  '''Packs list of names into fixed width array of character codes.
+
+  Args:
+    names: List of name strings ['FOX', 'FALCO'].
+
+  Returns:
+    codes: 2D uint32 array, one row per name, zero padded to longest name.
+    lengths: 1D array of the length of each name.
+  '''
+  packed = np.array(names, dtype=str)
+  if len(names) == 0:
+    return np.zeros((0, 1), dtype=np.uint32), np.zeros(0, dtype=np.int32)
+
+  codes = packed.view(np.uint32).reshape(len(names), -1)
+  lengths = np.char.str_len(packed).astype(np.int32)
+
+  return codes, lengths
+
+def _edit_distances(name, codes, lengths):
+  '''Calculates Levenshtein distance from name to every packed name at once.
+
+  Runs the usual dynamic programming recurrence one row (character of name) at
+  a time, with every candidate handled in parallel as a separate row of a
+  numpy array. Insertions within a row are resolved with a running minimum, 
+  so there are no Python loops over candidates or candidate characters.
+
+  Args:
+    name: Name string being matched.
+    codes: Packed names from _encode_names.
+    lengths: Lengths of packed names from _encode_names.
+
+  Returns:
+    1D array of edit distances, one per packed name.
+  '''
+  num_names, width = codes.shape
+  steps = np.arange(width + 1, dtype=np.int32)
+  row = np.broadcast_to(steps, (num_names, width + 1))
+
+  for idx, letter in enumerate(name):
+    # Best of substitution/match (diagonal) and deletion (above) per column
+    mismatch = codes != ord(letter)
+    diag_or_up = np.minimum(row[:, :-1] + mismatch, row[:, 1:] + 1)
+    candidates = np.empty((num_names, width + 1), dtype=np.int32)
+    candidates[:, 0] = idx + 1
+    candidates[:, 1:] = diag_or_up
+    # Insertion (left): row[j] = min over k <= j of candidates[k] + (j - k)
+    row = np.minimum.accumulate(candidates - steps, axis=1) + steps
+
+  return row[np.arange(num_names), lengths]
+
+class BatchNameScorer(NameScorer):
+  '''NameScorer that scores a name against the whole match list at once.
+
+  The match list is packed into a fixed width array when it is set, and
+  scores are normalized edit distance similarities (1 - distance / longest
+  length) computed with vectorized numpy operations. Scores are on the same
+  0 to 1 scale as NameScorer but are not identical to difflib ratios.
+
+  Attributes:
+    name_to_match: Name string being matched.
+    match_list: List of strings of potential matches.
+    __codes: Packed match_list from _encode_names.
+    __lengths: Lengths of match_list names.
+  '''
+  def __init__(self):
+    super().__init__()
+    self.match_list = None
+
+  def set_match_list(self, match_list):
+    '''Sets potential match list and packs it for scoring
+
+    Repacking is skipped if the same list object is set again.
+
+    Args:
+      match_list: list of strings of potential matches
+
+    Returns:
+      None
+    '''
+    if match_list is self.match_list:
+      return
+
+    self.match_list = match_list
+    self.__codes, self.__lengths = _encode_names(match_list)
+
+  def get_score_array(self, name=None):
+    '''Returns similarity score of every match_list name in list order
+
+    Args:
+      name: name to score, defaults to name set by set_name_to_match
+
+    Returns:
+      1D numpy array of scores between 0 and 1
+    '''
+    if name is None:
+      name = self.name_to_match
+
+    distances = _edit_distances(name, self.__codes, self.__lengths)
+    longest = np.maximum(self.__lengths, len(name))
+    # Two empty strings are a perfect match, avoid dividing by zero
+    longest[longest == 0] = 1
+
+    return 1 - distances / longest
+
+  def get_scores(self):
+    '''Calculates score match values for each name
+
+    Returns:
+      List of scores and index [[score, index], [score, index]] in decreasing
+      score order (first is best match), same as NameScorer.get_scores.
+    '''
+    return self.get_top_scores(len(self.match_list))
+
+  def get_top_scores(self, k, name=None):
+    '''Returns only the k best scores
+
+    Args:
+      k: number of scores to return
+      name: name to score, defaults to name set by set_name_to_match
+
+    Returns:
+      List of scores and index [[score, index], [score, index]] in decreasing
+      score order, at most k items long
+    '''
+    scores = self.get_score_array(name)
+    k = min(k, len(scores))
+    if k < len(scores):
+      top = np.argpartition(-scores, k - 1)[:k]
+    else:
+      top = np.arange(len(scores))
+    # Stable sort so equal scores stay in match_list order like NameScorer
+    top = top[np.argsort(-scores[top], kind='stable')]
+
+    return [[float(scores[idx]), int(idx)] for idx in top]
+
+  def get_top_scores_for_names(self, names, k):
+    '''Returns the k best scores for each of several names
+
+    Args:
+      names: list of names to score against the match list
+      k: number of scores to return for each name
+
+    Returns:
+      List with one get_top_scores result per name, in names order
+    '''
+    return [self.get_top_scores(k, name) for name in names]
@@ -1,7 +1,44 @@
 import mail_reader.data_access.store_data_formatter as sdf
+import array
 import difflib
+import sys
 import mail_reader.data_access.name_scoring as name_scoring
 
+class _NameBucket(object):
+  '''Names starting with one letter, stored as parallel arrays
+
+  Attributes:
+    names: list of interned name strings, in the order they were added
+    box_ids: array of box ids parallel to names, see QuickNameAccess
+    __names_view: tuple copy of names handed to the scorer, or None if names
+                  changed since it was made
+  '''
+  __slots__ = ('names', 'box_ids', '__names_view')
+
+  def __init__(self):
+    self.names = []
+    self.box_ids = array.array('I')
+    self.__names_view = None
+
+  def add(self, name, box_id):
+    self.names.append(sys.intern(name))
+    self.box_ids.append(box_id)
+    self.__names_view = None
+
+  def get_names(self):
+    '''Returns tuple of names, the same object until the bucket changes
+
+    BatchNameScorer only repacks its match list when it's given a new object,
+    so returning the same tuple lets it skip repacking between lookups.
+    '''
+    if self.__names_view is None:
+      self.__names_view = tuple(self.names)
+
+    return self.__names_view
+
+  def __len__(self):
+    return len(self.names)
+
 class QuickNameAccess(object):
   '''Allows quick name lookups to get related box numbers
 
@@ -9,18 +46,44 @@ class QuickNameAccess(object):
   in the word. This splits the lookup space by ~26, but must have first letter
   of name from OCR be correct.
 
+  Each letter's names are kept in a _NameBucket of parallel name and box id
+  arrays instead of a list of QuickAccessEntry objects, so lookups don't
+  build any per-entry lists and large stores use much less memory. Box
+  numbers are mapped to small integer ids so any box number type can be
+  stored in the arrays.
+
+  If a name index (ie: name_index.EditDistanceNameIndex) is given, names are
+  scored against the candidates it returns instead of the whole letter
+  bucket, so the first letter doesn't have to be read correctly and large
+  stores don't score every name sharing a first letter.
+
   Attributes:
-    letter_access: dictionary of letters containing names starting with
-                   that letter
+    scorer: NameScorer object used to score names
+    __name_index: Name index every entry is also added to, or None
+    __buckets: dictionary of letter -> _NameBucket of names starting with
+               that letter
+    __box_ids: dictionary of box number -> box id
+    __boxes: list of box numbers, indexed by box id
   '''
 
-  def __init__(self):
-    '''Init with empty access dictionary'''
-    self.letter_access = {}
+  def __init__(self, scorer=None, name_index=None):
+    '''Init with empty access dictionary
+
+    Args:
+      scorer: NameScorer object to score names with, such as 
+              name_scoring.BatchNameScorer. Defaults to NameScorer.
+      name_index: Optional empty name index with add_name(name, box) and
+                  get_candidates(name) methods, used to pick the names to
+                  score.
+    '''
+    self.__name_index = name_index
+    self.__buckets = {}
+    self.__box_ids = {}
+    self.__boxes = []
 
-    # TODO(searow): consider switching the NameScorer to be passed in
-    #               at init so we can alter the name scoring methods
-    self.scorer = name_scoring.NameScorer()
+    if scorer is None:
+      scorer = name_scoring.NameScorer()
+    self.scorer = scorer
 
   def create_entries_with_formatter(self, data_formatter):
     while data_formatter.has_next_customer():
@@ -37,6 +100,9 @@ class QuickNameAccess(object):
   def find_matches_by_names(self, names):
     '''Given a set of names to identify boxholder, returns best box matches
 
+    Without a name index, names whose first letter has no entries don't
+    contribute to any box.
+
     Args:
       names: list of strings of name to identify boxholder
 
@@ -49,13 +115,20 @@ class QuickNameAccess(object):
 
     # Evaluate each name's contribution to box scores separately
     for name in names:
-      # Get the entries for the corresponding letter and pass to scorer
-      letter = name[0]
-      entries = self._get_entries_by_letter(letter)
-      entry_names = [e.name for e in entries]
+      if self.__name_index is not None:
+        candidates = self.__name_index.get_candidates(name)
+        match_list = [candidate for candidate, box in candidates]
+        box_ids = [self.__box_ids[box] for candidate, box in candidates]
+      else:
+        # Get the entries for the corresponding letter and pass to scorer
+        bucket = self.__buckets.get(name[0])
+        if bucket is None:
+          continue
+        match_list = bucket.get_names()
+        box_ids = bucket.box_ids
 
       self.scorer.set_name_to_match(name)
-      self.scorer.set_match_list(entry_names)
+      self.scorer.set_match_list(match_list)
       name_scores = self.scorer.get_scores()
 
       # Filter out any duplicate box scores. Each box should only contribute
@@ -63,63 +136,42 @@ class QuickNameAccess(object):
       # box 101 should only contribute once to the Smith name. This prevents
       # boxes with a BUNCH of names from unevenly contributing to a box score
       # simply because it has a lot of names
-      filtered_scores = self._filter_boxes_by_highest_score(entries, 
+      filtered_scores = self._filter_boxes_by_highest_score(box_ids,
                                                             name_scores)
 
-      # Add to the box scores to the overall list
-      for box_num, score in filtered_scores:
-
-        # Add the box number to the score dict if it doesn't exist
-        if box_num not in box_scores.keys():
-          box_scores[box_num] = 0
-
-        # Scoring mechanism: for each box, create a running total of match
-        # scores obtained for every name given, adding scores as a box is 
-        # hit multiple times
-        box_scores[box_num] += score
+      # Scoring mechanism: for each box, create a running total of match
+      # scores obtained for every name given, adding scores as a box is 
+      # hit multiple times
+      for box_id, score in filtered_scores.items():
+        box_num = self.__boxes[box_id]
+        box_scores[box_num] = box_scores.get(box_num, 0) + score
 
     sorted_boxes = self._reorder_box_scores(box_scores)
 
     return sorted_boxes
 
-  def _filter_boxes_by_highest_score(self, entries, name_scores):
+  def _filter_boxes_by_highest_score(self, box_ids, name_scores):
     '''Removes duplicates from name_scores based on box number
 
-    Goes through name_scores and looks for duplicate box numbers. If a 
-    duplicate exists, it removes all duplicates that have a lower score. This
-    ensures that a box can only contribute once to a box score for a 
-    given name. Call this after we get scores for a given name, but before
-    we add the scores to the overall scores list.
+    Keeps only the highest score of each box, so that a box can only
+    contribute once to a box score for a given name. Call this after we get
+    scores for a given name, but before we add the scores to the overall
+    scores list.
 
     Args:
-      entries: list of QuickAccessEntry objects, used to cross reference
-               the indices in name_scores with box numbers in entries
+      box_ids: array of box ids, used to cross reference the indices in
+               name_scores with boxes
       name_scores: result from NameScorer.get_scores
 
     Returns:
-      Filtered results as nested list [[box_num, score], [box_num, score]]
+      Dict of box id -> highest score, in the order each box first appears
+      in name_scores
     '''
-    filtered = []
-
-    # Evaluate every name score item, getting the resultant box number and 
-    # saving only the box numbers that have the highest scores for duplicated
-    # box numbers
+    filtered = {}
     for score, idx in name_scores:
-      box_num = entries[idx].box_num
-
-      # Check to see if the box number already exists in the filtered results
-      box_is_new = True
-      for filter_idx, [filter_box, filter_score] in enumerate(filtered):
-        if filter_box == box_num:
-          # If we get a match, we can break the loop. Only save the score if 
-          # it's higher than the already saved score
-          box_is_new = False
-          if score > filter_score:
-            filtered[filter_idx][1] = score
-
-      # No existing boxes -> just add to the filtered list
-      if box_is_new:
-        filtered.append([box_num, score])
+      box_id = box_ids[idx]
+      if box_id not in filtered or score > filtered[box_id]:
+        filtered[box_id] = score
 
     return filtered
 
@@ -143,6 +195,8 @@ class QuickNameAccess(object):
   def _get_entries_by_letter(self, letter):
     '''Returns list of names of all QuickAccessEntry for that letter
 
+    Entries are created on each call, so this isn't used for lookups.
+
     Args:
       letter: string of single letter that is being accessed (e.g.: 'F' for 
               the name Fox and 'M' for McCloud)
@@ -150,8 +204,9 @@ class QuickNameAccess(object):
     Returns:
       List of QuickAccessEntry objects registered to that letter
     '''
-    entries = self.letter_access[letter]
-    return entries
+    bucket = self.__buckets[letter]
+    return [QuickAccessEntry(name, self.__boxes[box_id])
+            for name, box_id in zip(bucket.names, bucket.box_ids)]
 
   def add_entry(self, letter, entry):
     '''Adds entry to the access object
@@ -164,13 +219,22 @@ class QuickNameAccess(object):
     # TODO(searow): add checks for letters being only 1 letter
 
     # We need to create the letter dict entry if it doesn't exist
-    if not letter in self.letter_access.keys():
-      self.letter_access[letter] = []
+    if letter not in self.__buckets:
+      self.__buckets[letter] = _NameBucket()
+
+    box_id = self.__box_ids.get(entry.box_num)
+    if box_id is None:
+      box_id = len(self.__boxes)
+      self.__box_ids[entry.box_num] = box_id
+      self.__boxes.append(entry.box_num)
 
-    self.letter_access[letter].append(entry)
+    self.__buckets[letter].add(entry.name, box_id)
+    if self.__name_index is not None:
+      self.__name_index.add_name(entry.name, entry.box_num)
 
 class QuickAccessEntry(object):
   '''Entries for the QuickNameAccess object'''
+  __slots__ = ('name', 'box_num')
 
   def __init__(self, name, box_num):
     '''Inits entry with a name associated with a box number
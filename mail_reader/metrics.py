@@ -0,0 +1,259 @@
+"""Latency histograms and counters for the reader, with pluggable sinks.
+
+Instrumented code records into the module level default_registry:
+
+  with metrics.timed('ocr.get_text'):
+    ...
+  metrics.increment('image.no_contours')
+
+and sinks added to the registry (log, JSON file, Prometheus text format
+served over HTTP) receive a snapshot of every metric when it is flushed.
+Latencies are recorded in milliseconds.
+"""
+import bisect
+import contextlib
+import http.server
+import json
+import logging
+import os
+import threading
+import time
+
+# Upper bounds in milliseconds of the latency histogram buckets
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+class Histogram(object):
+  """Counts observed values into buckets, like a Prometheus histogram.
+
+  Attributes:
+    buckets: Sorted bucket upper bounds. Values above the last bound are only
+             counted in the total.
+    bucket_counts: Number of values <= each bound and > the previous bound.
+    count: Total number of values observed.
+    sum: Sum of all values observed.
+  """
+  def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+    self.buckets = tuple(buckets)
+    self.bucket_counts = [0] * len(self.buckets)
+    self.count = 0
+    self.sum = 0.0
+
+  def observe(self, value):
+    """Adds value to the histogram."""
+    idx = bisect.bisect_left(self.buckets, value)
+    if idx < len(self.buckets):
+      self.bucket_counts[idx] += 1
+    self.count += 1
+    self.sum += value
+
+  def to_dict(self):
+    """Returns histogram as a dict, with cumulative bucket counts."""
+    cumulative = []
+    total = 0
+    for bucket_count in self.bucket_counts:
+      total += bucket_count
+      cumulative.append(total)
+
+    return {'buckets': list(self.buckets), 'cumulative_counts': cumulative,
+            'count': self.count, 'sum': self.sum}
+
+class MetricsRegistry(object):
+  """Thread safe collection of named counters and latency histograms.
+
+  Attributes:
+    __counters: Dict of name to count.
+    __histograms: Dict of name to Histogram.
+    __sinks: Sinks written to on flush().
+    __lock: Lock guarding all metric updates.
+  """
+  def __init__(self):
+    self.__counters = {}
+    self.__histograms = {}
+    self.__sinks = []
+    self.__lock = threading.Lock()
+
+  def increment(self, name, amount=1):
+    """Adds amount to counter name, creating it if needed."""
+    with self.__lock:
+      self.__counters[name] = self.__counters.get(name, 0) + amount
+
+  def observe(self, name, value):
+    """Adds value to histogram name, creating it if needed."""
+    with self.__lock:
+      if name not in self.__histograms:
+        self.__histograms[name] = Histogram()
+      self.__histograms[name].observe(value)
+
+  @contextlib.contextmanager
+  def timed(self, name):
+    """Context manager recording the milliseconds spent inside it in name.
+
+    Time is recorded even if an exception is raised.
+    """
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.observe(name, (time.perf_counter() - start) * 1000)
+
+  def snapshot(self):
+    """Returns dict of all metrics, safe to use while metrics keep changing.
+
+    Returns:
+      {'counters': {name: count}, 'histograms': {name: Histogram.to_dict()}}
+    """
+    with self.__lock:
+      return {
+          'counters': dict(self.__counters),
+          'histograms': {name: histogram.to_dict()
+                         for name, histogram in self.__histograms.items()},
+      }
+
+  def reset(self):
+    """Removes all metrics. Sinks are kept."""
+    with self.__lock:
+      self.__counters = {}
+      self.__histograms = {}
+
+  def add_sink(self, sink):
+    """Adds sink, an object with a write(snapshot) method."""
+    self.__sinks.append(sink)
+
+  def remove_sink(self, sink):
+    """Removes sink added with add_sink."""
+    self.__sinks.remove(sink)
+
+  def flush(self):
+    """Writes a snapshot of all metrics to every sink."""
+    snapshot = self.snapshot()
+    for sink in self.__sinks:
+      sink.write(snapshot)
+
+def format_prometheus(snapshot, prefix='mail_reader_'):
+  """Returns snapshot in the Prometheus text exposition format.
+
+  Metric names have '.' replaced by '_' and prefix added. Counters get a
+  _total suffix and histograms are in milliseconds with an _ms suffix.
+  """
+  def metric_name(name):
+    return prefix + name.replace('.', '_').replace('-', '_')
+
+  lines = []
+  for name, count in sorted(snapshot['counters'].items()):
+    name = metric_name(name) + '_total'
+    lines.append('# TYPE ' + name + ' counter')
+    lines.append('{} {}'.format(name, count))
+  for name, histogram in sorted(snapshot['histograms'].items()):
+    name = metric_name(name) + '_ms'
+    lines.append('# TYPE ' + name + ' histogram')
+    for bound, count in zip(histogram['buckets'],
+                            histogram['cumulative_counts']):
+      lines.append('{}_bucket{{le="{}"}} {}'.format(name, bound, count))
+    lines.append('{}_bucket{{le="+Inf"}} {}'.format(name, histogram['count']))
+    lines.append('{}_sum {}'.format(name, histogram['sum']))
+    lines.append('{}_count {}'.format(name, histogram['count']))
+
+  return '\n'.join(lines) + '\n'
+
+class LogSink(object):
+  """Logs a one line summary of each metric at INFO level."""
+  def __init__(self, logger=None):
+    self.__logger = logger if logger is not None else logging.getLogger(
+        __name__)
+
+  def write(self, snapshot):
+    for name, count in sorted(snapshot['counters'].items()):
+      self.__logger.info('%s: %d', name, count)
+    for name, histogram in sorted(snapshot['histograms'].items()):
+      mean = histogram['sum'] / histogram['count'] if histogram['count'] else 0
+      self.__logger.info('%s: count %d, mean %.2f ms', name,
+                         histogram['count'], mean)
+
+class JsonFileSink(object):
+  """Writes each snapshot to a JSON file, replacing the previous one.
+
+  The file is written to a temporary file first and then moved into place,
+  so readers never see a partially written file.
+  """
+  def __init__(self, path):
+    self.path = path
+
+  def write(self, snapshot):
+    tmp_path = self.path + '.tmp'
+    with open(tmp_path, 'w') as f:
+      json.dump(snapshot, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, self.path)
+
+class PrometheusSink(object):
+  """Serves the last snapshot in Prometheus text format over local HTTP.
+
+  Call start() to begin serving on http://host:port/metrics from a daemon
+  thread, and stop() to shut the server down.
+
+  Attributes:
+    host: Address to serve on, only local connections by default.
+    port: Port to serve on, 0 to pick any free port.
+  """
+  def __init__(self, host='127.0.0.1', port=9100):
+    self.host = host
+    self.port = port
+    self.__text = format_prometheus({'counters': {}, 'histograms': {}})
+    self.__server = None
+    self.__thread = None
+
+  def write(self, snapshot):
+    self.__text = format_prometheus(snapshot)
+
+  def start(self):
+    """Starts the HTTP server. port is updated to the port actually used."""
+    sink = self
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+      def do_GET(self):
+        if self.path != '/metrics':
+          self.send_error(404)
+          return
+        body = sink.get_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+      def log_message(self, format, *args):
+        # Don't print a line for every scrape
+        pass
+
+    self.__server = http.server.ThreadingHTTPServer((self.host, self.port),
+                                                    MetricsHandler)
+    self.port = self.__server.server_address[1]
+    self.__thread = threading.Thread(target=self.__server.serve_forever,
+                                     daemon=True)
+    self.__thread.start()
+
+  def get_text(self):
+    """Returns the last snapshot in Prometheus text format."""
+    return self.__text
+
+  def stop(self):
+    """Stops the HTTP server if it's running."""
+    if self.__server is not None:
+      self.__server.shutdown()
+      self.__server.server_close()
+      self.__thread.join()
+      self.__server = None
+
+# Registry used by all instrumented reader code
+default_registry = MetricsRegistry()
+
+def increment(name, amount=1):
+  """Adds amount to counter name in default_registry."""
+  default_registry.increment(name, amount)
+
+def observe(name, value):
+  """Adds value to histogram name in default_registry."""
+  default_registry.observe(name, value)
+
+def timed(name):
+  """Returns context manager timing its body into default_registry."""
+  return default_registry.timed(name)
@@ -0,0 +1,255 @@
+import queue
+import threading
+import time
+import traceback
+import mail_reader.metrics as metrics
+
+def _put_dropping_oldest(item_queue, item):
+  """Puts item on a bounded queue, dropping the oldest items to make room.
+
+  Args:
+    item_queue: queue.Queue with a maxsize.
+    item: Item to put on the queue.
+
+  Returns:
+    Number of items dropped to make room.
+  """
+  dropped = 0
+  while True:
+    try:
+      item_queue.put_nowait(item)
+      return dropped
+    except queue.Full:
+      try:
+        item_queue.get_nowait()
+        dropped += 1
+      except queue.Empty:
+        pass
+
+class PipelineResult(object):
+  """Result of reading a single captured frame.
+
+  Attributes:
+    frame_id: Sequence number of the frame from the capture stage.
+    capture_time: time.monotonic() when the frame was captured.
+    text_lines: OCR text lines read from the frame.
+    fields: MailFields object populated by the TextAnalyzer.
+    matches: Result of BoxMatcher.get_matches, empty if fields weren't
+             populated.
+  """
+  def __init__(self, frame_id, capture_time, text_lines, fields, matches):
+    self.frame_id = frame_id
+    self.capture_time = capture_time
+    self.text_lines = text_lines
+    self.fields = fields
+    self.matches = matches
+
+class ReaderPipeline(object):
+  """Runs capture, preprocessing, OCR and matching as concurrent stages.
+
+  Each stage runs in its own thread(s) and hands work to the next over a
+  bounded queue:
+
+    capture -> preprocessing workers -> OCR workers -> matcher
+
+  The capture thread reads frames at the camera's own rate. If preprocessing
+  can't keep up, the oldest waiting frames are dropped so work always starts
+  on the most recent frame, and later stages apply backpressure by blocking
+  instead of dropping. Throughput is therefore limited by the slowest stage
+  (normally OCR) rather than a fixed sleep.
+
+  If a change detector is given, the capture thread only passes on frames it
+  accepts, so while the same envelope sits under the camera the later stages
+  stay idle.
+
+  Attributes:
+    frames_captured: Number of frames read from the camera.
+    frames_dropped: Number of frames dropped before preprocessing.
+    frames_skipped: Number of frames rejected by the change detector.
+    matcher_lock: Lock held while the matcher stage uses the TextAnalyzer and
+                  BoxMatcher. Hold it to safely change the database (ie: with
+                  DatabaseUpdater) while the pipeline is running.
+    __camera: CustomWebcam to capture frames from.
+    __processor_factory: Callable returning a new ImageProcessor. Each
+                         preprocessing worker gets its own since
+                         ImageProcessor keeps per-image state.
+    __ocr_processor: OcrProcessor shared by the OCR workers.
+    __analyzer: TextAnalyzer used by the matcher stage.
+    __matcher: BoxMatcher used by the matcher stage.
+    __ignored_names: Names removed from the addressee line before matching.
+    __change_detector: FrameChangeDetector gating the capture stage, or None.
+  """
+  def __init__(self, camera, processor_factory, ocr_processor, analyzer,
+               matcher, preprocess_workers=1, ocr_workers=2, queue_size=2,
+               ignored_names=(), change_detector=None, top_k=None):
+    """Inits pipeline. Call start() to begin processing.
+
+    Args:
+      camera: Opened CustomWebcam to capture frames from.
+      processor_factory: Callable with no arguments that returns a new
+                         ImageProcessor.
+      ocr_processor: OcrProcessor used to read line images.
+      analyzer: TextAnalyzer to parse OCR text lines.
+      matcher: BoxMatcher with its database connection set.
+      preprocess_workers: Number of preprocessing threads.
+      ocr_workers: Number of OCR threads.
+      queue_size: Maximum number of items waiting between each stage.
+      ignored_names: Names to remove from the addressee line before matching
+                     (ie: ['Or', 'Current', 'Resident']).
+      change_detector: Optional FrameChangeDetector. Only frames it accepts
+                       are processed.
+      top_k: Maximum number of matches to keep per frame, or None for all.
+    """
+    self.__camera = camera
+    self.__processor_factory = processor_factory
+    self.__ocr_processor = ocr_processor
+    self.__analyzer = analyzer
+    self.__matcher = matcher
+    self.__preprocess_workers = preprocess_workers
+    self.__ocr_workers = ocr_workers
+    self.__ignored_names = set(ignored_names)
+    self.__change_detector = change_detector
+    self.__top_k = top_k
+
+    self.__frame_queue = queue.Queue(maxsize=queue_size)
+    self.__line_queue = queue.Queue(maxsize=queue_size)
+    self.__text_queue = queue.Queue(maxsize=queue_size)
+    self.__result_queue = queue.Queue(maxsize=queue_size)
+
+    self.__stop_event = threading.Event()
+    self.__threads = []
+    self.__latest_frame = None
+    self.__latest_frame_lock = threading.Lock()
+
+    self.frames_captured = 0
+    self.frames_dropped = 0
+    self.frames_skipped = 0
+    self.matcher_lock = threading.Lock()
+
+  def start(self):
+    """Starts all pipeline threads."""
+    self.__stop_event.clear()
+    targets = [self.__capture_stage]
+    targets += [self.__preprocess_stage] * self.__preprocess_workers
+    targets += [self.__ocr_stage] * self.__ocr_workers
+    targets += [self.__matcher_stage]
+    for target in targets:
+      thread = threading.Thread(target=target, daemon=True)
+      thread.start()
+      self.__threads.append(thread)
+
+  def stop(self):
+    """Stops all pipeline threads and waits for them to finish."""
+    self.__stop_event.set()
+    for thread in self.__threads:
+      thread.join()
+    self.__threads = []
+
+  def get_latest_frame(self):
+    """Returns most recently captured frame, or None if there isn't one.
+
+    Used for display so the preview keeps updating while OCR is running.
+    """
+    with self.__latest_frame_lock:
+      return self.__latest_frame
+
+  def get_results(self):
+    """Returns list of PipelineResult objects finished since the last call."""
+    results = []
+    while True:
+      try:
+        results.append(self.__result_queue.get_nowait())
+      except queue.Empty:
+        return results
+
+  def __get(self, item_queue):
+    """Returns next item from item_queue, or None if the pipeline stopped."""
+    while not self.__stop_event.is_set():
+      try:
+        return item_queue.get(timeout=0.1)
+      except queue.Empty:
+        pass
+
+    return None
+
+  def __put(self, item_queue, item):
+    """Puts item on item_queue, waiting for room unless the pipeline stops."""
+    while not self.__stop_event.is_set():
+      try:
+        item_queue.put(item, timeout=0.1)
+        return
+      except queue.Full:
+        pass
+
+  def __capture_stage(self):
+    frame_id = 0
+    while not self.__stop_event.is_set():
+      frame = self.__camera.get_frame()
+      if frame is None:
+        # Camera not ready, don't spin the CPU while waiting
+        time.sleep(0.01)
+        continue
+      capture_time = time.monotonic()
+      with self.__latest_frame_lock:
+        self.__latest_frame = frame
+      self.frames_captured += 1
+      metrics.increment('pipeline.frames_captured')
+      if (self.__change_detector is not None and
+          not self.__change_detector.is_new_frame(frame)):
+        self.frames_skipped += 1
+        continue
+      dropped = _put_dropping_oldest(self.__frame_queue,
+                                     (frame_id, capture_time, frame))
+      self.frames_dropped += dropped
+      if dropped > 0:
+        metrics.increment('pipeline.frames_dropped', dropped)
+      frame_id += 1
+
+  def __preprocess_stage(self):
+    processor = self.__processor_factory()
+    while True:
+      item = self.__get(self.__frame_queue)
+      if item is None:
+        return
+      (frame_id, capture_time, frame) = item
+      try:
+        line_images = processor.get_line_images(frame)
+      except Exception:
+        traceback.print_exc()
+        continue
+      self.__put(self.__line_queue, (frame_id, capture_time, line_images))
+
+  def __ocr_stage(self):
+    while True:
+      item = self.__get(self.__line_queue)
+      if item is None:
+        return
+      (frame_id, capture_time, line_images) = item
+      try:
+        text_lines = self.__ocr_processor.get_text_lines(line_images)
+      except Exception:
+        traceback.print_exc()
+        continue
+      self.__put(self.__text_queue, (frame_id, capture_time, text_lines))
+
+  def __matcher_stage(self):
+    while True:
+      item = self.__get(self.__text_queue)
+      if item is None:
+        return
+      (frame_id, capture_time, text_lines) = item
+      try:
+        with self.matcher_lock:
+          fields = self.__analyzer.parse_text_lines(text_lines)
+          names = fields.addressee_line['all_names']
+          fields.addressee_line['all_names'] = [
+              name for name in names if name not in self.__ignored_names]
+          matches = []
+          if fields.is_populated():
+            matches = self.__matcher.get_matches(fields, top_k=self.__top_k)
+      except Exception:
+        traceback.print_exc()
+        continue
+      result = PipelineResult(frame_id, capture_time, text_lines, fields,
+                              matches)
+      _put_dropping_oldest(self.__result_queue, result)
@@ -0,0 +1,49 @@
+import unittest
+import mail_reader.addressee_identification.line_quality as line_quality
+
+class TestLineQuality(unittest.TestCase):
+  def setUp(self):
+    pass
+
+  def test_ratios(self):
+    quality = line_quality.score_line('AB *|1')
+    self.assertAlmostEqual(3 / 6, quality.letter_ratio)
+    self.assertAlmostEqual(1 / 6, quality.star_ratio)
+    self.assertAlmostEqual(1 / 6, quality.bar_ratio)
+    self.assertTrue(quality.is_garbage)
+
+  def test_bar_letters_count_as_both(self):
+    quality = line_quality.score_line('Iil|')
+    self.assertEqual(0.75, quality.letter_ratio)
+    self.assertEqual(1.0, quality.bar_ratio)
+    self.assertTrue(quality.is_garbage)
+
+  def test_real_text(self):
+    quality = line_quality.score_line('FOX MCCLOUD')
+    self.assertEqual(1.0, quality.letter_ratio)
+    self.assertFalse(quality.is_garbage)
+    self.assertFalse(line_quality.score_line('1234 MAIN ST STE 102').is_garbage)
+
+  def test_empty_and_non_ascii(self):
+    self.assertEqual(line_quality.LineQuality(0, 0, 0, True),
+                     line_quality.score_line(''))
+    # Non-ASCII characters count towards the length but aren't letters
+    self.assertEqual(0.75, line_quality.score_line('JOSÉ').letter_ratio)
+
+  def test_thresholds(self):
+    line = 'FOX **'
+    self.assertTrue(line_quality.score_line(line).is_garbage)
+    self.assertFalse(line_quality.score_line(
+        line, max_star_ratio=0.5).is_garbage)
+
+  def test_filter_lines(self):
+    lines = ['@||| 1 ((@', 'OSCAR THE GROUCH', '', '****', 'TRASH CAN']
+    self.assertEqual(['OSCAR THE GROUCH', 'TRASH CAN'],
+                     line_quality.filter_lines(lines))
+    self.assertEqual(5, len(line_quality.score_lines(lines)))
+
+  def tearDown(self):
+    pass
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+import unittest
+import mail_reader.addressee_identification.store_address as store_address
+import mail_reader.addressee_identification.text_analyzer as text_analyzer
+
+class TestStoreAddressProfile(unittest.TestCase):
+  def setUp(self):
+    self.config = {'street_number': '1234', 'street_name': 'MAIN',
+                   'street_suffixes': ['ST', 'STREET'],
+                   'city': 'SPRINGFIELD', 'state': 'CA',
+                   'zip_code': '90210'}
+    self.profile = store_address.StoreAddressProfile(**self.config)
+
+  def test_street_line_box_variants(self):
+    lines = ['1234 MAIN ST STE 102', '1234 MAIN STREET SUITE 102',
+             '1234 MAIN ST #102', '1234 MAIN ST PMB 102',
+             '1234 MAIN ST. BOX 102', '1234 MAIN ST 102', '1234MAIN ST#102',
+             '1234 main st ste 102']
+    for line in lines:
+      tags = self.profile.tag_line(line)
+      self.assertIsNotNone(tags, 'Failed line: ' + line)
+      self.assertEqual('102', tags['OccupancyIdentifier'],
+                       'Failed line: ' + line)
+      self.assertEqual('1234', tags['AddressNumber'])
+      self.assertEqual('MAIN', tags['StreetName'])
+
+  def test_street_line_ocr_confusions(self):
+    tags = self.profile.tag_line('I234 MA1N 5T. STE. 1O2')
+    self.assertEqual('102', tags['OccupancyIdentifier'])
+    # Box numbers are matched ignoring case, so lowercase misreads count too
+    for line, box in [('1234 main st ste 1o2', '102'),
+                      ('1234 MAIN ST STE 1L2', '112'),
+                      ('1234 MAIN ST STE 1d2', '102'),
+                      ('1234 main st ste i0q', '100')]:
+      tags = self.profile.tag_line(line)
+      self.assertEqual(box, tags['OccupancyIdentifier'],
+                       'Failed line: ' + line)
+
+  def test_street_line_without_box(self):
+    tags = self.profile.tag_line('1234 MAIN ST')
+    self.assertEqual({'AddressNumber': '1234', 'StreetName': 'MAIN'}, tags)
+
+  def test_city_line(self):
+    expected = {'PlaceName': 'SPRINGFIELD', 'StateName': 'CA',
+                'ZipCode': '90210'}
+    for line in ['SPRINGFIELD, CA 90210', 'SPRINGFIELD CA 90210-1234',
+                 '5PRINGFIELD,CA 9O210']:
+      self.assertEqual(expected, self.profile.tag_line(line),
+                       'Failed line: ' + line)
+
+  def test_other_lines(self):
+    for line in ['FOX MCCLOUD', '1234 MAPLE ST STE 102', '12345 MAIN ST',
+                 'SPRINGFIELD, CA 90211', '444 GREAT FOX CABIN DR', '']:
+      self.assertIsNone(self.profile.tag_line(line), 'Failed line: ' + line)
+
+  def test_load_store_profile(self):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      path = os.path.join(tmp_dir, 'store_address.json')
+      with open(path, 'w') as f:
+        json.dump(self.config, f)
+      profile = store_address.load_store_profile(path)
+    self.assertEqual('SPRINGFIELD', profile.city)
+    self.assertEqual('7', profile.tag_line('1234 MAIN ST STE 7')[
+        'OccupancyIdentifier'])
+
+  def test_text_analyzer_uses_profile(self):
+    analyzer = text_analyzer.TextAnalyzer(store_profile=self.profile)
+    fields = analyzer.parse_text_lines(
+        ['FOX MCCLOUD', 'I234 MAIN ST #1O2', 'SPRINGFIELD, CA 90210'])
+    self.assertEqual(['FOX', 'MCCLOUD'], fields.addressee_line['all_names'])
+    self.assertEqual(['102'], fields.probable_box)
+    self.assertEqual(['1234'], fields.street_line['number'])
+    self.assertEqual(['MAIN'], fields.street_line['street_name'])
+    self.assertEqual(['SPRINGFIELD'], fields.city_line['city'])
+    self.assertEqual(['90210'], fields.city_line['zip_code'])
+    stats = analyzer.get_cache_stats()
+    self.assertEqual(2, stats['store_lines'])
+    # Only the name line was parsed with usaddress
+    self.assertEqual(1, stats['misses'])
+
+  def tearDown(self):
+    pass
+
+if __name__ == '__main__':
+  unittest.main()
@@ -169,6 +169,40 @@ class TestTextAnalyzer(unittest.TestCase):
     self.assertTrue('NEW YORK' in fields.city_line['state'])
     self.assertTrue('10010' in fields.city_line['zip_code'])
 
+  def test_parse_cache(self):
+    lines = ['FOX MCCLOUD', '444 GREAT FOX CABIN DR', 'CORNERIA, CA 90000']
+    first = self.analyzer.parse_text_lines(lines)
+    # Same lines with different spacing are read from the cache
+    second = self.analyzer.parse_text_lines(
+        ['FOX  MCCLOUD ', '444 GREAT FOX CABIN DR', 'CORNERIA,  CA 90000'])
+    self.assertEqual(first.addressee_line, second.addressee_line)
+    self.assertEqual(first.street_line, second.street_line)
+    self.assertEqual(first.city_line, second.city_line)
+    stats = self.analyzer.get_cache_stats()
+    self.assertEqual(3, stats['size'])
+    self.assertEqual(3, stats['hits'])
+    self.assertEqual(3, stats['misses'])
+    self.assertEqual(0.5, stats['hit_rate'])
+
+  def test_parse_cache_evicts_least_recently_used(self):
+    analyzer = text_analyzer.TextAnalyzer(cache_size=2)
+    analyzer.parse_text_lines(['FOX MCCLOUD', 'FALCO LOMBARDI'])
+    analyzer.parse_text_lines(['FOX MCCLOUD', 'SLIPPY TOAD'])
+    # FALCO LOMBARDI was least recently used so it was evicted
+    analyzer.parse_text_lines(['FOX MCCLOUD', 'FALCO LOMBARDI'])
+    stats = analyzer.get_cache_stats()
+    self.assertEqual(2, stats['size'])
+    self.assertEqual(2, stats['hits'])
+    self.assertEqual(4, stats['misses'])
+
+  def test_obvious_junk_skips_usaddress(self):
+    self.assertTrue(text_analyzer._is_obvious_junk('i l , . |'))
+    self.assertTrue(text_analyzer._is_obvious_junk(''))
+    self.assertFalse(text_analyzer._is_obvious_junk('# 5'))
+    self.assertFalse(text_analyzer._is_obvious_junk('FOX'))
+    fields = self.analyzer.parse_text_lines(['i l I i l a', 'FOX MCCLOUD'])
+    self.assertEqual(['FOX', 'MCCLOUD'], fields.addressee_line['all_names'])
+    self.assertEqual(1, self.analyzer.get_cache_stats()['junk_lines'])
 
   def tearDown(self):
     pass
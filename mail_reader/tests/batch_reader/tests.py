@@ -0,0 +1,87 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import mail_reader.addressee_identification.mail_fields as mail_fields
+import mail_reader.batch_reader as batch_reader
+
+class FakeProcessor(object):
+  def get_line_images(self, image):
+    return ['line_' + str(int(image[0, 0, 0]))]
+
+class FakeOcrProcessor(object):
+  def get_text_lines(self, images):
+    return [image.upper() for image in images]
+
+class FakeAnalyzer(object):
+  def parse_text_lines(self, text_lines):
+    fields = mail_fields.MailFields()
+    fields.addressee_line['all_names'] = ['Current'] + text_lines
+    return fields
+
+class FakeMatcher(object):
+  def get_matches(self, fields, top_k=None):
+    return [{'box_number': 102, 'score': np.float64(1.5),
+             'all_names': [('FOX MCCLOUD',), ('FALCO LOMBARDI',)]},
+            {'box_number': 7, 'score': 0.5, 'all_names': []}]
+
+class TestBatchReader(unittest.TestCase):
+  def setUp(self):
+    self.reader = batch_reader.BatchReader(
+        FakeProcessor(), FakeOcrProcessor(), FakeAnalyzer(), FakeMatcher())
+    self.image = np.full((10, 10, 3), 7, dtype=np.uint8)
+
+  def test_read(self):
+    result = self.reader.read('video.avi', 30, self.image)
+    self.assertEqual('video.avi', result['source'])
+    self.assertEqual(30, result['frame'])
+    self.assertEqual(102, result['box_number'])
+    self.assertEqual(1.5, result['score'])
+    self.assertEqual(['FOX MCCLOUD', 'FALCO LOMBARDI'], result['box_names'])
+    self.assertEqual([102, 7], result['top_boxes'])
+    # Ignored names are removed before matching
+    self.assertEqual(['LINE_7'], result['read_names'])
+    self.assertIsNone(result['error'])
+    for key in ['preprocess_ms', 'ocr_ms', 'analysis_ms', 'match_ms']:
+      self.assertTrue(0 <= result[key] <= result['total_ms'])
+
+  def test_read_missing_image(self):
+    result = self.reader.read('/does/not/exist.jpg', 0)
+    self.assertEqual('Could not read image', result['error'])
+    self.assertIsNone(result['box_number'])
+
+  def test_write_csv(self):
+    output = io.StringIO()
+    writer = batch_reader.ResultWriter(output, 'csv')
+    writer.write(self.reader.read('a.jpg', 0, self.image))
+    lines = output.getvalue().splitlines()
+    self.assertEqual(','.join(batch_reader.RESULT_COLUMNS), lines[0])
+    self.assertTrue(lines[1].startswith(
+        'a.jpg,0,102,1.5,FOX MCCLOUD|FALCO LOMBARDI,102|7,LINE_7,'))
+
+  def test_write_jsonl(self):
+    output = io.StringIO()
+    writer = batch_reader.ResultWriter(output, 'jsonl')
+    writer.write(self.reader.read('a.jpg', 0, self.image))
+    writer.write(self.reader.read('b.jpg', 0, self.image))
+    lines = output.getvalue().splitlines()
+    self.assertEqual(2, len(lines))
+    result = json.loads(lines[1])
+    self.assertEqual('b.jpg', result['source'])
+    self.assertEqual(['FOX MCCLOUD', 'FALCO LOMBARDI'], result['box_names'])
+
+  def test_iter_directory(self):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      for name in ['b.JPG', 'a.png', 'notes.txt']:
+        open(os.path.join(tmp_dir, name), 'w').close()
+      tasks = list(batch_reader._iter_directory(tmp_dir))
+    self.assertEqual([(os.path.join(tmp_dir, 'a.png'), 0, None),
+                      (os.path.join(tmp_dir, 'b.JPG'), 0, None)], tasks)
+
+  def tearDown(self):
+    pass
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import pandas
+import mail_reader.data_access.box_entity_cache as box_entity_cache
+import mail_reader.data_access.database_creator as database_creator
+import mail_reader.data_access.database_updater as database_updater
+
+class TestBoxEntityCache(unittest.TestCase):
+  def setUp(self):
+    df = pandas.DataFrame({
+        'NAME': ['FOX MCCLOUD', 'FALCO LOMBARDI', 'PEPPY HARE', 'SLIPPY TOAD'],
+        'SUITE': [111, 111, 5, 22],
+        'ACTIVE': [1, 1, 1, 0]
+    })
+    creator = database_creator.DatabaseCreator()
+    self.conn = creator.create_database_from_dataframe(df)
+    self.cache = box_entity_cache.BoxEntityCache()
+    self.cache.build_from_database(self.conn)
+
+  def test_original_names(self):
+    self.assertEqual([('FOX MCCLOUD',), ('FALCO LOMBARDI',)],
+                     self.cache.get_original_names(111))
+    # Inactive entities and unknown boxes have no names
+    self.assertEqual([], self.cache.get_original_names(22))
+    self.assertEqual([], self.cache.get_original_names(999))
+
+  def test_entity_names(self):
+    self.assertEqual((('FOX', 0), ('MCCLOUD', 0), ('FALCO', 1),
+                      ('LOMBARDI', 1)),
+                     self.cache.get_entity_names(111))
+    self.assertEqual((), self.cache.get_entity_names(22))
+
+  def test_invalidate_box(self):
+    updater = database_updater.DatabaseUpdater(self.conn)
+    updater.add_entity('KRYSTAL', 5)
+    updater.set_entity_status('SLIPPY TOAD', 22, True)
+    # Not refreshed until the boxes are invalidated
+    self.assertEqual([('PEPPY HARE',)], self.cache.get_original_names(5))
+    self.cache.invalidate_box(5)
+    self.cache.invalidate_box(22)
+    self.assertEqual([('PEPPY HARE',), ('KRYSTAL',)],
+                     self.cache.get_original_names(5))
+    self.assertEqual((('SLIPPY', 3), ('TOAD', 3)),
+                     self.cache.get_entity_names(22))
+
+  def test_updater_listener(self):
+    updater = database_updater.DatabaseUpdater(self.conn)
+    updater.add_listener(self.cache)
+    updater.close_box(111)
+    self.assertEqual([], self.cache.get_original_names(111))
+    self.assertEqual((), self.cache.get_entity_names(111))
+
+  def tearDown(self):
+    pass
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,4 +1,8 @@
+import os
+import shutil
+import tempfile
 import unittest
+import pandas
 import mail_reader.data_access.database_creator as database_creator
 
 class TestDatabaseCreator(unittest.TestCase):
@@ -22,5 +26,58 @@ class TestDatabaseCreator(unittest.TestCase):
               (3, 0, 'MAYOR MCCHEESE')]
     self.assertEqual(result, answer)
 
+  def test_bulk_ingestion_matches_row_by_row(self):
+    df = pandas.DataFrame({
+        'NAME': ['FOX MCCLOUD', 'SMITH, SMITH J.R.', 'GRIMACE', 'A.B. ,  CO'],
+        'SUITE': [111, 5, 22, 111],
+        'ACTIVE': [1, 0, 1, 0]
+    })
+    tables = ['box_activities', 'entity_statuses', 'unique_entity_names',
+              'box_entities']
+    results = []
+    for bulk_ingestion in [False, True]:
+      creator = database_creator.DatabaseCreator()
+      creator.bulk_ingestion = bulk_ingestion
+      c = creator.create_database_from_dataframe(df).cursor()
+      result = []
+      for table in tables:
+        c.execute('SELECT * FROM ' + table + ';')
+        result.append(c.fetchall())
+      results.append(result)
+
+    self.assertEqual(results[0], results[1])
+    self.assertEqual([(1, 'SMITH'), (1, 'JR')],
+                     [row for row in results[1][2] if row[0] == 1])
+
+  def test_load_or_create_compiled_database(self):
+    temp_dir = tempfile.mkdtemp()
+    try:
+      path = os.path.join(temp_dir, 'customers.xlsx')
+      df = pandas.DataFrame({'NAME': ['FOX MCCLOUD', 'FALCO'],
+                             'SUITE': [111, 5],
+                             'ACTIVE': [1, 0]})
+      df.to_excel(path, index=False)
+      creator = database_creator.DatabaseCreator()
+      db = creator.load_or_create_database(path)
+      self.assertTrue(os.path.exists(path + '.sqlite'))
+
+      # Second load comes from the compiled database, not the excel file
+      compiled_mtime = os.path.getmtime(path + '.sqlite')
+      db = creator.load_or_create_database(path)
+      self.assertEqual(compiled_mtime, os.path.getmtime(path + '.sqlite'))
+      c = db.cursor()
+      c.execute('SELECT * FROM box_entities;')
+      self.assertEqual([(111, 0), (5, 1)], c.fetchall())
+
+      # Changing the file rebuilds the compiled database
+      df['SUITE'] = [111, 22]
+      df.to_excel(path, index=False)
+      db = creator.load_or_create_database(path)
+      c = db.cursor()
+      c.execute('SELECT * FROM box_entities;')
+      self.assertEqual([(111, 0), (22, 1)], c.fetchall())
+    finally:
+      shutil.rmtree(temp_dir)
+
   def tearDown(self):
     pass
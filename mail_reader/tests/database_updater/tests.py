@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+import pandas
+import mail_reader.addressee_identification.mail_fields as mail_fields
+import mail_reader.data_access.box_matching as box_matching
+import mail_reader.data_access.database_creator as database_creator
+import mail_reader.data_access.database_updater as database_updater
+
+class TestDatabaseUpdater(unittest.TestCase):
+  def setUp(self):
+    df = pandas.DataFrame({
+        'NAME': ['RONALD MCDONALD', 'GRIMACE', 'THE HAMBURGLAR'],
+        'SUITE': [111, 5, 22],
+        'ACTIVE': [1, 1, 1]
+    })
+    creator = database_creator.DatabaseCreator()
+    self.conn = creator.create_database_from_dataframe(df)
+    self.matcher = box_matching.BoxMatcher()
+    self.matcher.set_database_connection(self.conn)
+    self.updater = database_updater.DatabaseUpdater(self.conn)
+    self.updater.add_listener(self.matcher)
+
+  def get_best_box(self, names):
+    fields = mail_fields.MailFields()
+    fields.addressee_line['all_names'] = names
+    matches = self.matcher.get_matches(fields)
+    if len(matches) == 0:
+      return None
+    return matches[0]['box_number']
+
+  def test_add_entity(self):
+    entity_id = self.updater.add_entity('MAYOR MCCHEESE', 333)
+    self.assertEqual(3, entity_id)
+    self.assertEqual(333, self.get_best_box(['MAYOR', 'MCCHEESE']))
+    c = self.conn.cursor()
+    c.execute('SELECT active FROM box_activities WHERE box_id=333;')
+    self.assertEqual([(1,)], c.fetchall())
+
+  def test_matched_names_follow_updates(self):
+    fields = mail_fields.MailFields()
+    fields.addressee_line['all_names'] = ['GRIMACE']
+    self.assertEqual([('GRIMACE',)],
+                     self.matcher.get_matches(fields)[0]['all_names'])
+    # Same unique names as the existing entity, so only invalidate_box tells
+    # the matcher that box 5 changed
+    self.updater.add_entity('Grimace', 5)
+    self.assertEqual([('GRIMACE',), ('Grimace',)],
+                     self.matcher.get_matches(fields)[0]['all_names'])
+
+  def test_deactivate_and_activate_entity(self):
+    count = self.updater.set_entity_status('Grimace', 5, False)
+    self.assertEqual(1, count)
+    self.assertEqual(None, self.get_best_box(['GRIMACE']))
+    c = self.conn.cursor()
+    c.execute('SELECT active FROM box_activities WHERE box_id=5;')
+    self.assertEqual([(0,)], c.fetchall())
+
+    self.updater.set_entity_status('GRIMACE', 5, True)
+    self.assertEqual(5, self.get_best_box(['GRIMACE']))
+
+  def test_apply_diff(self):
+    diff = pandas.DataFrame({
+        'ACTION': ['ADD', 'CLOSE', 'DEACTIVATE'],
+        'NAME': ['BIRDIE', None, 'THE HAMBURGLAR'],
+        'SUITE': [5, 111, 22]
+    })
+    self.updater.apply_diff(diff)
+    self.assertEqual(5, self.get_best_box(['BIRDIE']))
+    self.assertEqual(None, self.get_best_box(['RONALD', 'MCDONALD']))
+    self.assertEqual(None, self.get_best_box(['HAMBURGLAR']))
+
+  def test_bad_diff_is_rolled_back(self):
+    diff = pandas.DataFrame({
+        'ACTION': ['CLOSE', 'RENAME'],
+        'NAME': [None, 'GRIMACE'],
+        'SUITE': [111, 5]
+    })
+    with self.assertRaises(database_updater.UpdateError):
+      self.updater.apply_diff(diff)
+    self.assertEqual(111, self.get_best_box(['RONALD', 'MCDONALD']))
+
+  def test_invalid_diff_file_rows(self):
+    # Blank name, non-numeric suite and blank suite, as read by pandas
+    files = ['ACTION,NAME,SUITE\nCLOSE,,111\nADD,,5\n',
+             'ACTION,NAME,SUITE\nCLOSE,,111\nADD,BIRDIE,5A\n',
+             'ACTION,NAME,SUITE\nCLOSE,,111\nDEACTIVATE,GRIMACE,\n']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      path = os.path.join(tmp_dir, 'updates.csv')
+      for contents in files:
+        with open(path, 'w') as f:
+          f.write(contents)
+        with self.assertRaises(database_updater.UpdateError):
+          self.updater.apply_diff_file(path)
+        self.assertEqual(111, self.get_best_box(['RONALD', 'MCDONALD']))
+        self.assertEqual(5, self.get_best_box(['GRIMACE']))
+
+      # Valid files are still applied
+      with open(path, 'w') as f:
+        f.write('ACTION,NAME,SUITE\nADD,BIRDIE,5\nCLOSE,,111\n')
+      self.updater.apply_diff_file(path)
+      self.assertEqual(5, self.get_best_box(['BIRDIE']))
+      self.assertEqual(None, self.get_best_box(['RONALD', 'MCDONALD']))
+
+  def tearDown(self):
+    pass
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+import urllib.request
+import numpy as np
+import mail_reader.addressee_identification.text_analyzer as text_analyzer
+import mail_reader.metrics as metrics
+import mail_reader.vision.processing.frame_change as frame_change
+
+class ListSink(object):
+  def __init__(self):
+    self.snapshots = []
+
+  def write(self, snapshot):
+    self.snapshots.append(snapshot)
+
+class TestMetrics(unittest.TestCase):
+  def setUp(self):
+    self.registry = metrics.MetricsRegistry()
+
+  def test_histogram(self):
+    histogram = metrics.Histogram(buckets=(1, 10, 100))
+    for value in [0.5, 1, 5, 50, 500]:
+      histogram.observe(value)
+    result = histogram.to_dict()
+    self.assertEqual([2, 3, 4], result['cumulative_counts'])
+    self.assertEqual(5, result['count'])
+    self.assertEqual(556.5, result['sum'])
+
+  def test_counters_and_timing(self):
+    self.registry.increment('frames.seen')
+    self.registry.increment('frames.seen', 2)
+    with self.registry.timed('ocr.get_text'):
+      time.sleep(0.01)
+    with self.assertRaises(ValueError):
+      with self.registry.timed('ocr.get_text'):
+        raise ValueError
+
+    snapshot = self.registry.snapshot()
+    self.assertEqual({'frames.seen': 3}, snapshot['counters'])
+    histogram = snapshot['histograms']['ocr.get_text']
+    self.assertEqual(2, histogram['count'])
+    self.assertTrue(histogram['sum'] >= 10)
+
+  def test_flush_to_sinks(self):
+    sink = ListSink()
+    self.registry.add_sink(sink)
+    self.registry.increment('image.no_contours')
+    self.registry.flush()
+    self.registry.reset()
+    self.registry.flush()
+    self.assertEqual({'image.no_contours': 1}, sink.snapshots[0]['counters'])
+    self.assertEqual({}, sink.snapshots[1]['counters'])
+
+  def test_json_file_sink(self):
+    self.registry.observe('matcher.get_matches', 3.0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      path = os.path.join(tmp_dir, 'metrics.json')
+      self.registry.add_sink(metrics.JsonFileSink(path))
+      self.registry.flush()
+      with open(path) as f:
+        result = json.load(f)
+      self.assertEqual([path], [os.path.join(tmp_dir, name)
+                                for name in os.listdir(tmp_dir)])
+    self.assertEqual(1, result['histograms']['matcher.get_matches']['count'])
+
+  def test_format_prometheus(self):
+    self.registry.increment('frames.skipped', 4)
+    self.registry.observe('text.parse_text_lines', 2.5)
+    text = metrics.format_prometheus(self.registry.snapshot())
+    lines = text.splitlines()
+    self.assertIn('# TYPE mail_reader_frames_skipped_total counter', lines)
+    self.assertIn('mail_reader_frames_skipped_total 4', lines)
+    self.assertIn('mail_reader_text_parse_text_lines_ms_bucket{le="2"} 0',
+                  lines)
+    self.assertIn('mail_reader_text_parse_text_lines_ms_bucket{le="5"} 1',
+                  lines)
+    self.assertIn('mail_reader_text_parse_text_lines_ms_bucket{le="+Inf"} 1',
+                  lines)
+    self.assertIn('mail_reader_text_parse_text_lines_ms_count 1', lines)
+
+  def test_prometheus_sink_serves_metrics(self):
+    sink = metrics.PrometheusSink(port=0)
+    sink.start()
+    try:
+      self.registry.add_sink(sink)
+      self.registry.increment('frames.seen')
+      self.registry.flush()
+      url = 'http://127.0.0.1:' + str(sink.port) + '/metrics'
+      with urllib.request.urlopen(url) as response:
+        body = response.read().decode('utf-8')
+    finally:
+      sink.stop()
+    self.assertIn('mail_reader_frames_seen_total 1', body.splitlines())
+
+  def test_instrumented_code_records_default_registry(self):
+    metrics.default_registry.reset()
+    detector = frame_change.FrameChangeDetector(stable_frames=2)
+    frame = np.zeros((72, 128), dtype=np.uint8)
+    for _ in range(3):
+      detector.is_new_frame(frame)
+    text_analyzer.TextAnalyzer().parse_text_lines(['FOX MCCLOUD'])
+
+    snapshot = metrics.default_registry.snapshot()
+    self.assertEqual(3, snapshot['counters']['frames.seen'])
+    self.assertEqual(2, snapshot['counters']['frames.skipped'])
+    self.assertEqual(
+        1, snapshot['histograms']['text.parse_text_lines']['count'])
+
+  def tearDown(self):
+    metrics.default_registry.reset()
+
+if __name__ == '__main__':
+  unittest.main()
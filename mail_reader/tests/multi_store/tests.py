@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+import pandas
+import mail_reader.addressee_identification.mail_fields as mail_fields
+import mail_reader.data_access.database_updater as database_updater
+import mail_reader.data_access.multi_store as multi_store
+
+class TestMultiStore(unittest.TestCase):
+  def setUp(self):
+    self.database = multi_store.MultiStoreDatabase()
+    self.database.add_store('downtown', df=pandas.DataFrame({
+        'NAME': ['FOX MCCLOUD', 'FALCO LOMBARDI'],
+        'SUITE': [111, 5],
+        'ACTIVE': [1, 1]
+    }), zip_code='90210')
+    self.database.add_store('airport', df=pandas.DataFrame({
+        'NAME': ['FOX MCCLOUD', 'PEPPY HARE'],
+        'SUITE': [7, 111],
+        'ACTIVE': [1, 1]
+    }), zip_code='90045')
+    self.matcher = multi_store.MultiStoreMatcher(self.database)
+
+  def get_fields(self, names, zip_codes=()):
+    fields = mail_fields.MailFields()
+    fields.addressee_line['all_names'] = names
+    fields.city_line['zip_code'] = list(zip_codes)
+    return fields
+
+  def test_stores_are_loaded_lazily(self):
+    self.assertFalse(self.database.is_loaded('downtown'))
+    self.matcher.get_matches(self.get_fields(['FALCO'], ['90210']))
+    self.assertTrue(self.database.is_loaded('downtown'))
+    self.assertFalse(self.database.is_loaded('airport'))
+    self.matcher.unload_store('downtown')
+    self.assertFalse(self.database.is_loaded('downtown'))
+
+  def test_route_by_zip_code(self):
+    matches = self.matcher.get_matches(
+        self.get_fields(['FOX', 'MCCLOUD'], ['90045']))
+    self.assertEqual([('airport', 7)],
+                     [(match['store_id'], match['box_number'])
+                      for match in matches[:1]])
+    self.assertEqual(set(['airport']),
+                     set(match['store_id'] for match in matches))
+
+  def test_match_all_stores(self):
+    matches = self.matcher.get_matches(self.get_fields(['FOX', 'MCCLOUD']),
+                                       top_k=2)
+    self.assertEqual([('downtown', 111), ('airport', 7)],
+                     [(match['store_id'], match['box_number'])
+                      for match in matches])
+    self.assertEqual([('FOX MCCLOUD',)], matches[1]['all_names'])
+    # Unknown zip codes match every store
+    matches = self.matcher.get_matches(
+        self.get_fields(['PEPPY'], ['12345']), top_k=1)
+    self.assertEqual(('airport', 111),
+                     (matches[0]['store_id'], matches[0]['box_number']))
+
+  def test_store_ids(self):
+    matches = self.matcher.get_matches(self.get_fields(['FOX']),
+                                       store_ids=['airport'])
+    self.assertEqual(['airport'], [match['store_id'] for match in matches])
+
+  def test_updater_listener(self):
+    updater = database_updater.DatabaseUpdater(
+        self.database.get_connection('airport'))
+    updater.add_listener(self.matcher.get_matcher('airport'))
+    updater.add_entity('SLIPPY TOAD', 22)
+    matches = self.matcher.get_matches(self.get_fields(['SLIPPY', 'TOAD']),
+                                       top_k=1)
+    self.assertEqual(('airport', 22),
+                     (matches[0]['store_id'], matches[0]['box_number']))
+
+  def test_load_from_excel(self):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      path = os.path.join(tmp_dir, 'store.xlsx')
+      pandas.DataFrame({'NAME': ['KRYSTAL'], 'SUITE': [3],
+                        'ACTIVE': [1]}).to_excel(path, index=False)
+      self.database.add_store('harbor', path=path)
+      matches = self.matcher.get_matches(self.get_fields(['KRYSTAL']),
+                                         store_ids=['harbor'])
+      self.assertEqual(3, matches[0]['box_number'])
+
+  def test_store_errors(self):
+    with self.assertRaises(multi_store.StoreError):
+      self.database.add_store('downtown', df=pandas.DataFrame())
+    with self.assertRaises(multi_store.StoreError):
+      self.database.add_store('nowhere')
+    with self.assertRaises(multi_store.StoreError):
+      self.database.get_connection('nowhere')
+
+  def tearDown(self):
+    pass
+
+if __name__ == '__main__':
+  unittest.main()
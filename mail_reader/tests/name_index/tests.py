@@ -0,0 +1,104 @@
+import unittest
+import mail_reader.data_access.name_index as name_index
+
+class TestNGramNameIndex(unittest.TestCase):
+  def setUp(self):
+    self.index = name_index.NGramNameIndex(max_candidates=2)
+    self.index.add_name('MCCLOUD', 333)
+    self.index.add_name('MCCLOUD', 555)
+    self.index.add_name('MCDONALD', 20)
+    self.index.add_name('SMITH', 111)
+    self.index.add_name('FALCO', 4)
+
+  def test_get_ngrams(self):
+    answer = set(['$FO', 'FOX', 'OX$'])
+    self.assertEqual(answer, name_index._get_ngrams('FOX', 3))
+    self.assertEqual(set(['$A$']), name_index._get_ngrams('A', 3))
+
+  def test_exact_name_returns_all_boxes(self):
+    result = self.index.get_candidates('MCCLOUD')
+    self.assertTrue(['MCCLOUD', 333] in result)
+    self.assertTrue(['MCCLOUD', 555] in result)
+
+  def test_wrong_first_letter(self):
+    # OCR mistakes on the first letter should still find the name
+    result = self.index.get_candidates('5MITH')
+    self.assertTrue(['SMITH', 111] in result)
+
+  def test_shortlist_size(self):
+    result = self.index.get_candidates('MCCLOUD')
+    names = set([name for name, box in result])
+    self.assertEqual(set(['MCCLOUD', 'MCDONALD']), names)
+
+  def test_remove_name(self):
+    self.index.remove_name('MCCLOUD', 333)
+    self.assertEqual([['MCCLOUD', 555]],
+                     [c for c in self.index.get_candidates('MCCLOUD')
+                      if c[0] == 'MCCLOUD'])
+    self.index.remove_name('MCCLOUD', 555)
+    self.assertEqual(3, len(self.index))
+    self.assertEqual([], self.index.get_candidates('XYZ'))
+
+  def test_short_names(self):
+    # A single OCR error leaves no trigram in common with short names
+    self.index.add_name('FOX', 111)
+    self.index.add_name('LI', 7)
+    self.assertEqual(['FOX', 111], self.index.get_candidates('F0X')[0])
+    self.assertEqual(['LI', 7], self.index.get_candidates('L1')[0])
+    self.index.remove_name('LI', 7)
+    self.assertEqual([], self.index.get_candidates('L1'))
+
+  def tearDown(self):
+    pass
+
+class TestEditDistanceNameIndex(unittest.TestCase):
+  def setUp(self):
+    self.index = name_index.EditDistanceNameIndex(max_distance=2)
+    self.index.add_name('MCCLOUD', 333)
+    self.index.add_name('MCCLOUD', 555)
+    self.index.add_name('MCDONALD', 20)
+    self.index.add_name('SMITH', 111)
+    self.index.add_name('SMYTHE', 7)
+    self.index.add_name('FALCO', 4)
+
+  def test_get_deletes(self):
+    self.assertEqual(set(['FOX', 'OX', 'FX', 'FO']),
+                     name_index._get_deletes('FOX', 1))
+    self.assertEqual(set(['FOX', 'OX', 'FX', 'FO', 'X', 'O', 'F']),
+                     name_index._get_deletes('FOX', 2))
+
+  def test_edit_distance(self):
+    self.assertEqual(0, name_index._edit_distance('SMITH', 'SMITH', 2))
+    self.assertEqual(1, name_index._edit_distance('SM1TH', 'SMITH', 2))
+    self.assertEqual(2, name_index._edit_distance('SMITH', 'SMYTHE', 2))
+    self.assertEqual(3, name_index._edit_distance('MCCLOUD', 'MCDONALD', 2))
+    self.assertEqual(2, name_index._edit_distance('', 'AB', 2))
+
+  def test_ocr_typos(self):
+    self.assertEqual([(1, 'SMITH'), (2, 'SMYTHE')],
+                     self.index.get_names_within('SM1TH'))
+    self.assertEqual([['MCCLOUD', 333], ['MCCLOUD', 555]],
+                     self.index.get_candidates('MCCL0UD'))
+    # Wrong first letter
+    self.assertEqual([['SMITH', 111]], self.index.get_candidates('5MITH')[:1])
+
+  def test_max_distance(self):
+    self.assertEqual([(1, 'SMITH')],
+                     self.index.get_names_within('SM1TH', max_distance=1))
+    self.assertEqual([], self.index.get_candidates('XYZ'))
+
+  def test_remove_name(self):
+    self.index.remove_name('MCCLOUD', 333)
+    self.assertEqual([['MCCLOUD', 555]],
+                     self.index.get_candidates('MCCLOUD'))
+    self.index.remove_name('MCCLOUD', 555)
+    self.assertEqual(4, len(self.index))
+    self.assertEqual([], self.index.get_candidates('MCCLOUD'))
+    self.index.add_name('MCCLOUD', 1)
+    self.assertEqual([['MCCLOUD', 1]], self.index.get_candidates('MCCLOUD'))
+
+  def tearDown(self):
+    pass
+
+if __name__ == '__main__':
+  unittest.main()
@@ -4,6 +4,7 @@ import re
 import pandas
 import mail_reader.data_access.box_matching as box_matching
 import mail_reader.data_access.database_creator as database_creator
+import mail_reader.data_access.name_index as name_index
 import mail_reader.addressee_identification.mail_fields as mail_fields
 
 class TestQuickNameAccessor(unittest.TestCase):
@@ -191,5 +192,79 @@ class TestQuickNameAccessor(unittest.TestCase):
   def tearDownClass(self):
     pass
 
+class TestBoxMatcherTopK(unittest.TestCase):
+  def setUp(self):
+    df = pandas.DataFrame({
+        'NAME': ['FOX MCCLOUD', 'FOX', 'FOX', 'FOX', 'FALCO LOMBARDI',
+                 'FOXY'],
+        'SUITE': [111, 2, 3, 4, 5, 6],
+        'ACTIVE': [1, 1, 1, 1, 1, 1]
+    })
+    creator = database_creator.DatabaseCreator()
+    self.matcher = box_matching.BoxMatcher()
+    self.matcher.set_database_connection(
+        creator.create_database_from_dataframe(df))
+
+  def get_matches(self, names, **kwargs):
+    fields = mail_fields.MailFields()
+    fields.addressee_line['all_names'] = names
+    return self.matcher.get_matches(fields, **kwargs)
+
+  def test_combine_box_scores_top_k(self):
+    scores = [{111: 1.7, 20: 0.7, 4: 0.2}, {111: 1.6, 390: 1.9, 52: 0.8}]
+    self.assertEqual([[111, 3.3], [390, 1.9]],
+                     box_matching._combine_boxes_scores(scores, top_k=2))
+    # Boxes tied with the best score are all kept
+    scores = [{1: 1.0, 2: 1.0, 3: 1.0, 4: 0.5}]
+    self.assertEqual([[1, 1.0], [2, 1.0], [3, 1.0]],
+                     box_matching._combine_boxes_scores(scores, top_k=2))
+
+  def test_top_k_is_prefix_of_all_matches(self):
+    for names in [['FOX'], ['FOX', 'MCCLOUD'], ['FALCO', 'FOX'], ['FOXY']]:
+      matches = self.get_matches(names)
+      for top_k in [1, 2, 3]:
+        self.assertEqual(matches[:top_k],
+                         self.get_matches(names, top_k=top_k),
+                         'Failed names: ' + str(names))
+
+  def test_edit_distance_index(self):
+    creator = database_creator.DatabaseCreator()
+    df = pandas.DataFrame({'NAME': ['FOX MCCLOUD', 'FALCO LOMBARDI'],
+                           'SUITE': [111, 5], 'ACTIVE': [1, 1]})
+    matcher = box_matching.BoxMatcher(
+        index_class=name_index.EditDistanceNameIndex)
+    matcher.set_database_connection(
+        creator.create_database_from_dataframe(df))
+    fields = mail_fields.MailFields()
+    fields.addressee_line['all_names'] = ['F0X', 'MCCL0UD']
+    self.assertEqual(111, matcher.get_matches(fields)[0]['box_number'])
+
+  def test_short_names_with_ocr_errors(self):
+    creator = database_creator.DatabaseCreator()
+    df = pandas.DataFrame({'NAME': ['FOX MCCLOUD', 'LI WEI'],
+                           'SUITE': [111, 7], 'ACTIVE': [1, 1]})
+    self.matcher.set_database_connection(
+        creator.create_database_from_dataframe(df))
+    self.assertEqual(111, self.get_matches(['F0X'])[0]['box_number'])
+    self.assertEqual(7, self.get_matches(['L1'])[0]['box_number'])
+
+  def test_probable_box_string(self):
+    # Box numbers read from the envelope are strings, database boxes ints
+    fields = mail_fields.MailFields()
+    fields.addressee_line['all_names'] = ['FOX']
+    self.assertEqual(2, self.matcher.get_matches(fields)[0]['box_number'])
+    fields.probable_box = ['4', 'A']
+    matches = self.matcher.get_matches(fields)
+    self.assertEqual(4, matches[0]['box_number'])
+    self.assertTrue(matches[0]['score'] > matches[1]['score'])
+
+  def test_min_score(self):
+    matches = self.get_matches(['FOX', 'MCCLOUD'], min_score=1.5)
+    self.assertEqual([111], [match['box_number'] for match in matches])
+    self.assertEqual([], self.get_matches(['FOX'], min_score=100))
+
+  def tearDown(self):
+    pass
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+import mail_reader.data_access.name_scoring as name_scoring
+
+class TestBatchNameScorer(unittest.TestCase):
+  def setUp(self):
+    self.scorer = name_scoring.BatchNameScorer()
+    self.scorer.set_match_list(['FOX', 'FALCO', 'FROG', 'MCCLOUD', ''])
+
+  def test_edit_distances(self):
+    codes, lengths = name_scoring._encode_names(['KITTEN', 'SITTING', '', 'A'])
+    result = name_scoring._edit_distances('SITTING', codes, lengths)
+    self.assertEqual([3, 0, 7, 7], list(result))
+
+  def test_scores_in_decreasing_order(self):
+    self.scorer.set_name_to_match('FOX')
+    result = self.scorer.get_scores()
+    self.assertEqual([[1.0, 0], [0.5, 2], [0.2, 1], [0.142857, 3], [0.0, 4]],
+                     [[round(score, 6), idx] for score, idx in result])
+
+  def test_top_scores(self):
+    result = self.scorer.get_top_scores(2, 'MCC1OUD')
+    self.assertEqual([3, 0], [idx for score, idx in result])
+
+  def test_top_scores_for_names(self):
+    result = self.scorer.get_top_scores_for_names(['FR0G', 'FALC0'], 1)
+    self.assertEqual([[2], [1]], [[idx for _, idx in r] for r in result])
+
+  def tearDown(self):
+    pass
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import mail_reader.data_access.name_index as name_index
+import mail_reader.data_access.name_scoring as name_scoring
+import mail_reader.data_access.quick_name_accessor as quick_name_accessor
+
+class TestQuickNameAccess(unittest.TestCase):
+  def setUp(self):
+    self.access = quick_name_accessor.QuickNameAccess()
+    entries = [('FOX', 111), ('MCCLOUD', 111), ('FOX', 222), ('FALCO', 222),
+               ('FOXX', 222), ('MCCLOUD', 333), ('FOXY', '4A')]
+    for name, box in entries:
+      self.access.add_entry(name[0], quick_name_accessor.QuickAccessEntry(
+          name, box))
+
+  def test_find_matches_by_names(self):
+    result = self.access.find_matches_by_names(['FOX', 'MCCLOUD'])
+    self.assertEqual([111, 2.0], result[0])
+    self.assertEqual([[222, 1.0], [333, 1.0]], result[1:3])
+    self.assertEqual('4A', result[3][0])
+
+  def test_unknown_letter(self):
+    result = self.access.find_matches_by_names(['ZED', 'MCCLOUD'])
+    self.assertEqual([[111, 1.0], [333, 1.0]], result)
+
+  def test_filter_boxes_by_highest_score(self):
+    box_ids = [0, 1, 0, 2]
+    name_scores = [[0.9, 2], [0.8, 1], [0.5, 3], [0.95, 0]]
+    self.assertEqual({0: 0.95, 1: 0.8, 2: 0.5},
+                     self.access._filter_boxes_by_highest_score(box_ids,
+                                                                name_scores))
+
+  def test_get_entries_by_letter(self):
+    entries = self.access._get_entries_by_letter('M')
+    self.assertEqual([('MCCLOUD', 111), ('MCCLOUD', 333)],
+                     [(entry.name, entry.box_num) for entry in entries])
+
+  def test_batch_scorer_sees_added_entries(self):
+    access = quick_name_accessor.QuickNameAccess(
+        name_scoring.BatchNameScorer())
+    access.add_entry('F', quick_name_accessor.QuickAccessEntry('FOX', 1))
+    self.assertEqual([[1, 1.0]], access.find_matches_by_names(['FOX']))
+    access.add_entry('F', quick_name_accessor.QuickAccessEntry('FALCO', 2))
+    result = access.find_matches_by_names(['FALCO'])
+    self.assertEqual([2, 1], [box for box, score in result])
+    self.assertEqual(1.0, result[0][1])
+
+  def test_name_index_candidates(self):
+    access = quick_name_accessor.QuickNameAccess(
+        name_index=name_index.EditDistanceNameIndex(max_distance=1))
+    for name, box in [('SMITH', 1), ('SMITH', 2), ('MCCLOUD', 2)]:
+      access.add_entry(name[0], quick_name_accessor.QuickAccessEntry(name,
+                                                                     box))
+    # Wrong first letter still finds the names
+    result = access.find_matches_by_names(['5MITH', 'NCCLOUD'])
+    self.assertEqual(2, result[0][0])
+    self.assertEqual([2, 1], [box for box, score in result])
+
+  def tearDown(self):
+    pass
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,90 @@
+import time
+import unittest
+import mail_reader.addressee_identification.mail_fields as mail_fields
+import mail_reader.reader_pipeline as reader_pipeline
+
+class FakeCamera(object):
+  # Returns increasing frame numbers at roughly 100 fps
+  def __init__(self):
+    self.count = 0
+
+  def get_frame(self):
+    time.sleep(0.01)
+    self.count += 1
+    return self.count
+
+class FakeProcessor(object):
+  def get_line_images(self, image):
+    return ['line_' + str(image)]
+
+class FakeOcrProcessor(object):
+  # Slower than the camera so frames have to be dropped
+  def get_text_lines(self, images):
+    time.sleep(0.05)
+    return [image.upper() for image in images]
+
+class FakeAnalyzer(object):
+  def parse_text_lines(self, text_lines):
+    fields = mail_fields.MailFields()
+    fields.addressee_line['all_names'] = ['CURRENT'] + text_lines
+    return fields
+
+class FakeMatcher(object):
+  def get_matches(self, fields, top_k=None):
+    return [{'box_number': 1, 'score': 1.0,
+             'all_names': fields.addressee_line['all_names']}]
+
+class FakeChangeDetector(object):
+  # Only accepts frames with even numbers
+  def is_new_frame(self, frame):
+    return frame % 2 == 0
+
+class TestReaderPipeline(unittest.TestCase):
+  def setUp(self):
+    self.camera = FakeCamera()
+    self.pipeline = reader_pipeline.ReaderPipeline(
+        self.camera, FakeProcessor, FakeOcrProcessor(), FakeAnalyzer(),
+        FakeMatcher(), ocr_workers=1, ignored_names=['CURRENT'])
+
+  def test_put_dropping_oldest(self):
+    queue = reader_pipeline.queue.Queue(maxsize=2)
+    self.assertEqual(0, reader_pipeline._put_dropping_oldest(queue, 1))
+    self.assertEqual(0, reader_pipeline._put_dropping_oldest(queue, 2))
+    self.assertEqual(1, reader_pipeline._put_dropping_oldest(queue, 3))
+    self.assertEqual([2, 3], [queue.get_nowait(), queue.get_nowait()])
+
+  def test_results_and_dropped_frames(self):
+    self.pipeline.start()
+    time.sleep(0.5)
+    self.pipeline.stop()
+    results = self.pipeline.get_results()
+
+    self.assertTrue(len(results) > 0)
+    for result in results:
+      self.assertEqual(['LINE_' + str(result.frame_id + 1)],
+                       result.matches[0]['all_names'])
+    # Camera runs faster than OCR so some frames must have been dropped
+    self.assertTrue(self.pipeline.frames_dropped > 0)
+    self.assertTrue(self.pipeline.frames_captured > len(results))
+
+  def test_change_detector_skips_frames(self):
+    self.pipeline = reader_pipeline.ReaderPipeline(
+        self.camera, FakeProcessor, FakeOcrProcessor(), FakeAnalyzer(),
+        FakeMatcher(), ocr_workers=1, ignored_names=['CURRENT'],
+        change_detector=FakeChangeDetector())
+    self.pipeline.start()
+    time.sleep(0.5)
+    self.pipeline.stop()
+    results = self.pipeline.get_results()
+
+    self.assertTrue(len(results) > 0)
+    for result in results:
+      frame_number = int(result.matches[0]['all_names'][0][len('LINE_'):])
+      self.assertEqual(0, frame_number % 2)
+    self.assertTrue(self.pipeline.frames_skipped > 0)
+
+  def tearDown(self):
+    self.pipeline.stop()
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import numpy as np
+import mail_reader.addressee_identification.addressee_reader as addressee_reader
+import mail_reader.vision.processing.frame_change as frame_change
+
+def make_frame(value, noise_seed=None):
+  # 720p BGR frame with a bright "envelope" whose brightness is value
+  frame = np.full((720, 1280, 3), 40, dtype=np.uint8)
+  frame[200:500, 300:900] = value
+  if noise_seed is not None:
+    rng = np.random.RandomState(noise_seed)
+    noise = rng.randint(-5, 6, size=frame.shape)
+    frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+  return frame
+
+class FakeProcessor(object):
+  def __init__(self):
+    self.calls = 0
+
+  def get_text_lines(self, image):
+    self.calls += 1
+    return ['LINE ' + str(self.calls)]
+
+class FakeAnalyzer(object):
+  def parse_text_lines(self, text_lines):
+    return text_lines
+
+class TestFrameChangeDetector(unittest.TestCase):
+  def setUp(self):
+    self.detector = frame_change.FrameChangeDetector(stable_frames=3)
+
+  def test_accepts_once_stable(self):
+    results = [self.detector.is_new_frame(make_frame(200, seed))
+               for seed in range(6)]
+    # Noisy frames of the same scene are accepted once, after 3 still frames
+    self.assertEqual([False, False, True, False, False, False], results)
+    self.assertEqual(6, self.detector.frames_seen)
+    self.assertEqual(5, self.detector.frames_skipped)
+
+  def test_new_envelope_after_motion(self):
+    for seed in range(3):
+      self.detector.is_new_frame(make_frame(200, seed))
+    # Envelope swapped: a moving frame, then a different still scene
+    self.assertFalse(self.detector.is_new_frame(make_frame(120)))
+    results = [self.detector.is_new_frame(make_frame(255, seed))
+               for seed in range(4)]
+    self.assertEqual([False, False, True, False], results)
+
+  def test_same_envelope_after_motion(self):
+    for seed in range(3):
+      self.detector.is_new_frame(make_frame(200, seed))
+    # Hand passes over but the same envelope is left under the camera
+    self.assertFalse(self.detector.is_new_frame(make_frame(90)))
+    results = [self.detector.is_new_frame(make_frame(200, seed))
+               for seed in range(4)]
+    self.assertEqual([False] * 4, results)
+
+  def test_reset(self):
+    for seed in range(3):
+      self.detector.is_new_frame(make_frame(200, seed))
+    self.detector.reset()
+    results = [self.detector.is_new_frame(make_frame(200, seed))
+               for seed in range(3)]
+    self.assertEqual([False, False, True], results)
+
+  def test_addressee_reader_caches_fields(self):
+    processor = FakeProcessor()
+    reader = addressee_reader.AddresseeReader(processor, FakeAnalyzer(),
+                                              self.detector)
+    results = [reader.get_mail_fields(make_frame(200, seed))
+               for seed in range(5)]
+    self.assertEqual([None, None, ['LINE 1'], ['LINE 1'], ['LINE 1']],
+                     results)
+    self.assertEqual(1, processor.calls)
+    self.assertEqual(4, reader.get_frames_skipped())
+
+  def tearDown(self):
+    pass
+
+if __name__ == '__main__':
+  unittest.main()
@@ -2,6 +2,8 @@ import unittest
 import mail_reader.vision.processing.image_process as image_processor
 import mail_reader.vision.processing.ocr_processor as ocr_processor
 import cv2
+import numpy as np
+import threading
 
 class TestImageProcessing(unittest.TestCase):
   # Tests preprocessing steps before OCR as well as OCR results. Many 
@@ -96,4 +98,167 @@ class TestImageProcessing(unittest.TestCase):
       print(text)
 
   def tearDown(self):
-    pass
\ No newline at end of file
+    pass
+
+class TestPreprocessBuffers(unittest.TestCase):
+  def test_close_kernel_cached(self):
+    config = image_processor.PreprocessConfig((5, 5), (50, 3))
+    kernel = config.get_close_kernel()
+    self.assertEqual((3, 50), kernel.shape)
+    self.assertIs(kernel, config.get_close_kernel())
+    # Kernel is recreated when the closing size changes
+    config.morph_close_size = (20, 2)
+    self.assertEqual((2, 20), config.get_close_kernel().shape)
+
+  def test_buffer_pool_reuses_buffers(self):
+    buffers = image_processor._BufferPool()
+    buf = buffers.get('gray', (720, 1280))
+    self.assertIs(buf, buffers.get('gray', (720, 1280)))
+    self.assertIsNot(buf, buffers.get('edges', (720, 1280)))
+    # Buffers are reallocated when the frame size changes
+    self.assertEqual((480, 640), buffers.get('gray', (480, 640)).shape)
+
+  def test_buffers_match_allocating(self):
+    img = np.zeros((120, 200), dtype=np.uint8)
+    img[40:80, 30:170] = 255
+    buffers = image_processor._BufferPool()
+    cleaned = image_processor._find_edges_and_remove_noise(img, (5, 5),
+                                                           buffers)
+    self.assertIs(cleaned, buffers.get('blurred', img.shape))
+    np.testing.assert_array_equal(
+        image_processor._find_edges_and_remove_noise(img, (5, 5)), cleaned)
+
+class TestDownscaledRoi(unittest.TestCase):
+  def test_downscale_config(self):
+    config = image_processor.PreprocessConfig((5, 5), (50, 3))
+    scaled = image_processor._downscale_config(config, 4)
+    self.assertEqual((1, 1), scaled.blur_size)
+    self.assertEqual((12, 1), scaled.morph_close_size)
+
+  def test_rotate_and_crop_matches_full_rotation(self):
+    img = np.random.RandomState(0).randint(0, 256, (180, 320)).astype(np.uint8)
+    angle = 5.5
+    bounds = (40, 120, 60, 250)
+    M = image_processor._get_rotation_matrix(img.shape, angle)
+    rotated = cv2.warpAffine(img, M, (320, 180))
+    expected = rotated[40:120, 60:250]
+    # warpAffine's fixed point interpolation can round differently by 1
+    np.testing.assert_allclose(
+        expected.astype(np.int16),
+        image_processor._rotate_and_crop(img, angle, bounds), atol=1)
+
+class TestContourTable(unittest.TestCase):
+  def setUp(self):
+    rng = np.random.RandomState(0)
+    self.contours = [cv2.convexHull(rng.randint(0, 200, (8, 1, 2)).astype(
+        np.int32)) for _ in range(20)]
+    # Small rectangle and a contour with no area
+    self.contours.append(np.array([[[5, 5]], [[5, 12]], [[30, 12]], [[30, 5]]],
+                                  dtype=np.int32))
+    self.contours.append(np.array([[[1, 1]], [[9, 9]]], dtype=np.int32))
+
+  def test_geometry_matches_opencv(self):
+    table = image_processor._ContourTable(self.contours)
+    for idx, contour in enumerate(self.contours):
+      x, y, w, h = cv2.boundingRect(contour)
+      self.assertEqual((x, x + w - 1), (table.x_min[idx], table.x_max[idx]))
+      self.assertEqual((y, y + h - 1), (table.y_min[idx], table.y_max[idx]))
+      self.assertAlmostEqual(cv2.contourArea(contour), table.areas[idx])
+      moments = cv2.moments(contour)
+      if moments['m00'] != 0:
+        self.assertAlmostEqual(moments['m10']/moments['m00'],
+                               table.centroids[idx, 0])
+        self.assertAlmostEqual(moments['m01']/moments['m00'],
+                               table.centroids[idx, 1])
+    self.assertEqual([0, 0], list(table.centroids[-1]))
+
+  def test_sorted_by_area(self):
+    table = image_processor._ContourTable(self.contours).sorted_by_area()
+    expected = sorted(self.contours, key=cv2.contourArea, reverse=True)
+    self.assertEqual(len(expected), len(table))
+    for contour, table_contour in zip(expected, table):
+      self.assertIs(contour, table_contour)
+
+  def test_remove_small_contours(self):
+    filtered = image_processor._remove_small_contours(self.contours)
+    # Removes the 25x7 rectangle and the 8x8 line, keeps the order
+    expected = [c for c in self.contours[:20]
+                if np.ptp(c[:, 0, 0]) >= 15 and np.ptp(c[:, 0, 1]) >= 15]
+    self.assertEqual(len(expected), len(filtered))
+    for contour, filtered_contour in zip(expected, filtered):
+      self.assertIs(contour, filtered_contour)
+
+  def test_reorder_contours_by_position(self):
+    ordered = image_processor._reorder_contours_by_position(self.contours)
+    heights = [(c[:, 0, 1].min() + c[:, 0, 1].max()) / 2 for c in ordered]
+    self.assertEqual(sorted(heights), heights)
+
+  def test_empty_table(self):
+    table = image_processor._ContourTable([])
+    self.assertEqual(0, len(table))
+    self.assertEqual(0, len(image_processor._remove_small_contours(table)))
+
+  def test_find_best_contour(self):
+    # Large contour in the corner loses to a slightly smaller centered one
+    corner = np.array([[[0, 0]], [[0, 60]], [[100, 60]], [[100, 0]]],
+                      dtype=np.int32)
+    centered = np.array([[[60, 70]], [[60, 125]], [[160, 125]], [[160, 70]]],
+                        dtype=np.int32)
+    contours = [corner, centered]
+    best = image_processor._find_best_contour(contours, (100, 100))
+    self.assertIs(centered, best)
+
+class TestGetLineImages(unittest.TestCase):
+  def setUp(self):
+    # White label with 3 lines of text on a gray background
+    self.frame = np.full((720, 1280, 3), 90, dtype=np.uint8)
+    cv2.rectangle(self.frame, (400, 220), (880, 500), (255, 255, 255), -1)
+    lines = ['FOX MCCLOUD', '1234 MAIN ST STE 111', 'CORNERIA CA 90210']
+    for idx, line in enumerate(lines):
+      cv2.putText(self.frame, line, (430, 290 + idx * 70),
+                  cv2.FONT_HERSHEY_SIMPLEX, 1.1, (0, 0, 0), 2)
+
+  def test_synthetic_frame(self):
+    for roi_scale in [1, 4]:
+      processor = image_processor.ImageProcessor(None)
+      processor.roi_scale = roi_scale
+      line_images = processor.get_line_images(self.frame)
+      self.assertEqual(3, len(line_images), 'Failed scale ' + str(roi_scale))
+      # Longest line is the middle one
+      widths = [img.shape[1] for img in line_images]
+      self.assertEqual(1, widths.index(max(widths)))
+
+  def tearDown(self):
+    pass
+
+class SlowOcrProcessor(ocr_processor.OcrProcessor):
+  # Returns the image as text once all workers are in get_text at once, to
+  # simulate slow Tesseract calls. Records the most calls running at once.
+  def __init__(self, workers):
+    self.barrier = threading.Barrier(workers, timeout=5)
+    self.lock = threading.Lock()
+    self.running = 0
+    self.max_running = 0
+
+  def get_text(self, image):
+    with self.lock:
+      self.running += 1
+      self.max_running = max(self.max_running, self.running)
+    try:
+      self.barrier.wait()
+    finally:
+      with self.lock:
+        self.running -= 1
+    return image
+
+class TestParallelOcr(unittest.TestCase):
+  def test_parallel_ocr_keeps_line_order(self):
+    ocr = SlowOcrProcessor(4)
+    processor = image_processor.ImageProcessor(ocr, ocr_workers=4)
+    processor.preprocessed_images = ['line 0', 'line 1', 'line 2', 'line 3']
+    text = processor._perform_ocr()
+    processor.close()
+
+    self.assertEqual(['line 0', 'line 1', 'line 2', 'line 3'], text)
+    # All 4 lines should be OCR'd at the same time instead of one by one
+    self.assertEqual(4, ocr.max_running)
@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+import pyocr.builders
+import mail_reader.vision.processing.ocr_processor as ocr_processor
+
+class TestStitchedOcr(unittest.TestCase):
+  def setUp(self):
+    # Inverted line images (white text on black) like ImageProcessor creates
+    self.images = [np.zeros((20, 100), dtype=np.uint8),
+                   np.zeros((30, 60), dtype=np.uint8)]
+    self.images[0][5:15, 10:90] = 255
+    self.images[1][5:25, 10:50] = 255
+
+  def test_stitch_line_images(self):
+    canvas, spans = ocr_processor._stitch_line_images(self.images, 10)
+    self.assertEqual((10 + 20 + 10 + 30 + 10, 120), canvas.shape)
+    self.assertEqual([(10, 30), (40, 70)], spans)
+    # Text is flipped to black on a white background
+    self.assertEqual(255, canvas[0, 0])
+    self.assertEqual(0, canvas[20, 50])
+    self.assertEqual(255, canvas[40, 10])
+
+  def test_map_line_boxes(self):
+    spans = [(10, 30), (40, 70), (80, 100)]
+    def line_box(words, position):
+      word_boxes = [pyocr.builders.Box(word, position) for word in words]
+      return pyocr.builders.LineBox(word_boxes, position)
+
+    # Boxes are out of order and the 2nd line was split in two
+    line_boxes = [
+        line_box(['MCCLOUD'], ((60, 42), (90, 68))),
+        line_box(['BOX', '102'], ((12, 11), (50, 29))),
+        line_box(['FOX'], ((10, 45), (50, 66))),
+    ]
+
+    result = ocr_processor._map_line_boxes(line_boxes, spans)
+    self.assertEqual(['BOX 102', 'FOX MCCLOUD', ''], result)
+
+  def tearDown(self):
+    pass
+
+class TestLibTesseractProcessor(unittest.TestCase):
+  def test_unavailable_raises(self):
+    if ocr_processor.LibTesseractProcessor.is_available():
+      self.skipTest('libtesseract is installed')
+    with self.assertRaises(ocr_processor.OcrToolError):
+      ocr_processor.LibTesseractProcessor()
+
+  @unittest.skipUnless(ocr_processor.LibTesseractProcessor.is_available(),
+                       'libtesseract is not installed')
+  def test_engines_are_reused(self):
+    processor = ocr_processor.LibTesseractProcessor(engines=2)
+    image = np.full((40, 200), 255, dtype=np.uint8)
+    try:
+      # Blank images give no text, and engines go back into the pool after use
+      for _ in range(5):
+        self.assertEqual('', processor.get_text(image))
+      self.assertEqual(['', ''], processor.get_text_lines([image, image]))
+    finally:
+      processor.close()
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+import mail_reader.metrics as metrics
+
+def _thumbnail(image, size):
+  """Returns image as a small float32 grayscale thumbnail.
+
+  Area interpolation averages each block of pixels, so sensor noise mostly
+  cancels out and the comparison only reacts to real changes in the scene.
+
+  Args:
+    image: BGR or grayscale image.
+    size: (width, height) of the thumbnail.
+
+  Returns:
+    2D float32 array of shape (height, width).
+  """
+  if len(image.shape) == 3:
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+  thumb = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+  return thumb.astype(np.float32)
+
+def _thumbnail_difference(thumb_a, thumb_b):
+  """Returns mean absolute pixel difference (0 - 255) between thumbnails."""
+  return float(np.mean(np.abs(thumb_a - thumb_b)))
+
+class FrameChangeDetector(object):
+  """Decides which camera frames are worth running the full reader on.
+
+  Each frame is reduced to a small grayscale thumbnail and compared to the
+  previous frame. A frame is accepted once the scene has been still for
+  stable_frames frames in a row (ie: the envelope has been put down and the
+  hand moved away) and it differs from the last accepted frame. While the
+  same envelope stays under the camera every frame is rejected, so the rest of
+  the reader does no work between pieces of mail.
+
+  Attributes:
+    thumbnail_size: (width, height) frames are reduced to before comparing.
+    motion_threshold: Mean difference between consecutive frames above which
+                      the scene is considered to be moving.
+    change_threshold: Mean difference from the last accepted frame above
+                      which a still scene is considered a new envelope.
+    stable_frames: Number of consecutive still frames required before a frame
+                   is accepted.
+    frames_seen: Number of frames passed to is_new_frame().
+    frames_skipped: Number of frames rejected by is_new_frame().
+  """
+  def __init__(self, thumbnail_size=(32, 24), motion_threshold=4.0,
+               change_threshold=8.0, stable_frames=3):
+    self.thumbnail_size = thumbnail_size
+    self.motion_threshold = motion_threshold
+    self.change_threshold = change_threshold
+    self.stable_frames = stable_frames
+    self.frames_seen = 0
+    self.frames_skipped = 0
+    self.__previous_thumb = None
+    self.__accepted_thumb = None
+    self.__still_count = 0
+
+  def is_new_frame(self, image):
+    """Returns True if image shows a new, stable scene that should be read.
+
+    Args:
+      image: Camera frame, BGR or grayscale.
+
+    Returns:
+      True the first time a new scene has been still for stable_frames
+      frames, False otherwise.
+    """
+    self.frames_seen += 1
+    metrics.increment('frames.seen')
+    thumb = _thumbnail(image, self.thumbnail_size)
+
+    if self.__previous_thumb is not None and _thumbnail_difference(
+        thumb, self.__previous_thumb) <= self.motion_threshold:
+      self.__still_count += 1
+    else:
+      self.__still_count = 1
+    self.__previous_thumb = thumb
+
+    is_new = (self.__still_count >= self.stable_frames and
+              (self.__accepted_thumb is None or _thumbnail_difference(
+                  thumb, self.__accepted_thumb) > self.change_threshold))
+    if is_new:
+      self.__accepted_thumb = thumb
+    else:
+      self.frames_skipped += 1
+      metrics.increment('frames.skipped')
+
+    return is_new
+
+  def reset(self):
+    """Forgets the last accepted frame so the next stable frame is accepted."""
+    self.__previous_thumb = None
+    self.__accepted_thumb = None
+    self.__still_count = 0
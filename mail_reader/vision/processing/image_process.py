@@ -1,12 +1,16 @@
+import concurrent.futures
 import cv2
 import numpy as np
+import mail_reader.metrics as metrics
 
-def _fix_image_rotation(img, config):
+def _fix_image_rotation(img, config, buffers=None):
   """Returns rotated image to horizontal and angle in degrees.
 
   Args:
     img: Image that contains rotation to be corrected.
     config: PreprocessConfig object containing rotation parameters.
+    buffers: Optional _BufferPool to write intermediate and rotated images 
+             into instead of allocating new ones.
 
   Returns:
     rotated_img: Image with rotation applied. Image is rotated about the 
@@ -14,8 +18,27 @@ def _fix_image_rotation(img, config):
     angle: Angle that the image was rotated. Positive angle means the image
            was rotated counter-clockwise to get to its new position.
   """
-  contours = _identify_contours(img, config)
+  contours = _identify_contours(img, config, buffers)
+  angle = _get_rotation_angle(contours)
 
+  # Correct the image using center of image as rotation point. Anything that
+  # falls outside the original image size due to rotation is cropped.
+  rows, cols = img.shape
+  M = _get_rotation_matrix(img.shape, angle)
+  rotated_img = cv2.warpAffine(img, M, (cols, rows),
+                               dst=_get_buffer(buffers, 'rotated', img.shape))
+
+  return rotated_img, angle
+
+def _get_rotation_angle(contours):
+  """Returns angle in degrees to rotate the largest contour to horizontal.
+
+  Args:
+    contours: Contours in decreasing size order.
+
+  Raises:
+    NoContoursError: contours is empty.
+  """
   # Throw exception if we can't find any contours
   if len(contours) == 0:
     raise NoContoursError
@@ -27,15 +50,110 @@ def _fix_image_rotation(img, config):
   if angle < -45:
     angle += 90
 
-  # Correct the image using center of image as rotation point. Anything that
-  # falls outside the original image size due to rotation is cropped.
-  rows, cols = img.shape
-  M = cv2.getRotationMatrix2D((int(cols/2), int(rows/2)), angle, 1)
-  rotated_img = cv2.warpAffine(img, M, (cols, rows))
+  return angle
 
-  return rotated_img, angle
+def _find_rotation_and_roi(img, rotation_cfg, roi_cfg, buffers=None):
+  """Finds rotation angle and region of interest from one edge map.
+
+  The edge map is computed once and closed with each config's closing size.
+  Rotation is found from the rotation_cfg contours. Instead of rotating the 
+  image and finding contours again, the roi_cfg contours found on the 
+  unrotated image are rotated with the same matrix the image would be.
+
+  Args:
+    img: Unrotated grayscale image.
+    rotation_cfg: PreprocessConfig used to find rotation.
+    roi_cfg: PreprocessConfig used to find the region of interest. The edge
+             map is only recomputed if its blur_size differs from 
+             rotation_cfg's.
+    buffers: Optional _BufferPool to write intermediate images into.
+
+  Returns:
+    angle: Angle that img needs to be rotated counter-clockwise about its 
+           center to be horizontal.
+    roi_contour: Best region of interest contour, in rotated image 
+                 coordinates.
+
+  Raises:
+    NoContoursError: No contours were found.
+  """
+  cleaned = _find_edges_and_remove_noise(img, rotation_cfg.blur_size, buffers)
+  contours = _isolate_text_regions(cleaned, rotation_cfg.morph_close_size,
+                                   rotation_cfg.get_close_kernel(), buffers)
+  angle = _get_rotation_angle(contours)
+
+  if roi_cfg.blur_size != rotation_cfg.blur_size:
+    cleaned = _find_edges_and_remove_noise(img, roi_cfg.blur_size, buffers)
+  contours = _isolate_text_regions(cleaned, roi_cfg.morph_close_size,
+                                   roi_cfg.get_close_kernel(), buffers)
+  if len(contours) == 0:
+    raise NoContoursError
+
+  # Rotate every contour's points at once. Areas don't change with rotation,
+  # so contours stay in decreasing size order.
+  M = _get_rotation_matrix(img.shape, angle)
+  points = cv2.transform(contours.points.astype(np.float32), M)
+  points = np.rint(points).astype(np.int32)
+  split_idx = np.cumsum(contours.lengths)[:-1]
+  rotated_contours = _ContourTable(np.split(points, split_idx))
+
+  img_center = (img.shape[0]/2, img.shape[1]/2)
+  roi_contour = _find_best_contour(rotated_contours, img_center)
+
+  return angle, roi_contour
+
+def _get_rotation_matrix(shape, angle):
+  """Returns affine matrix rotating an image of shape about its center."""
+  rows, cols = shape
+
+  return cv2.getRotationMatrix2D((int(cols/2), int(rows/2)), angle, 1)
 
-def _find_edges_and_remove_noise(img, blur_size):
+def _rotate_and_crop(img, angle, bounds):
+  """Returns the region bounds of img as it would be after rotation.
+
+  Same result as rotating img with _fix_image_rotation's matrix and then 
+  cropping to bounds, but only the cropped region is ever computed.
+
+  Args:
+    img: Unrotated image.
+    angle: Angle in degrees to rotate img counter-clockwise about its center.
+    bounds: (bot, top, left, right) of the region in the rotated image, ie: 
+            from _get_crop_bounds.
+
+  Returns:
+    Rotated region of img, of size (top - bot, right - left).
+  """
+  bot, top, left, right = bounds
+  M = _get_rotation_matrix(img.shape, angle)
+  # Shift the output so the top left of the region lands on (0, 0)
+  M[0, 2] -= left
+  M[1, 2] -= bot
+
+  return cv2.warpAffine(img, M, (right - left, top - bot))
+
+def _downscale_config(config, scale):
+  """Returns copy of PreprocessConfig with sizes divided by scale.
+
+  Used to find the same features on an image downscaled by scale. Sizes 
+  never go below 1 pixel.
+  """
+  def downscale(size):
+    return tuple(max(1, int(round(px / scale))) for px in size)
+
+  return PreprocessConfig(downscale(config.blur_size),
+                          downscale(config.morph_close_size))
+
+def _get_buffer(buffers, name, shape):
+  """Returns buffer name from buffers, or None if not using a _BufferPool.
+
+  None lets OpenCV functions allocate their own output when passed as dst.
+  """
+  if buffers is None:
+    return None
+
+  return buffers.get(name, shape)
+
+def _find_edges_and_remove_noise(img, blur_size, buffers=None):
   """Returns an image with noise removed.
 
   Accepts a grayscale image, identifies regions of interest, and removes any
@@ -44,6 +162,7 @@ def _find_edges_and_remove_noise(img, blur_size):
   Args:
     img: image to process in grayscale
     blur_size: tuple containing (width, height) parameters for blur size
+    buffers: Optional _BufferPool to write results into.
 
   Returns:
     image containing regions of interest with noise removed
@@ -51,12 +170,15 @@ def _find_edges_and_remove_noise(img, blur_size):
 
   # Find the edges in the image, using 1st order sobel operator in both
   # directions 
-  edges = cv2.Sobel(img, ddepth=-1, dx=1, dy=1)
+  edges = cv2.Sobel(img, ddepth=-1, dx=1, dy=1,
+                    dst=_get_buffer(buffers, 'edges', img.shape))
 
-  # Remove noise from image
-  blurred = cv2.blur(edges, ksize=blur_size)
+  # Remove noise from image. Threshold is done in place on the blurred image.
+  blurred = cv2.blur(edges, ksize=blur_size,
+                     dst=_get_buffer(buffers, 'blurred', img.shape))
   _, cleaned = cv2.threshold(blurred, thresh=0, maxval=255,
-                             type=cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                             type=cv2.THRESH_BINARY + cv2.THRESH_OTSU,
+                             dst=blurred)
 
   return cleaned
 
@@ -67,9 +189,14 @@ def _find_best_contour(contours, center):
   scanning, region of interest will be heavily biased by position. Center of
   the image is set for heavy weighting of ROI.
 
+  Args:
+    contours: Contours in decreasing size order, as a list or _ContourTable.
+    center: (rows/2, cols/2) center of the image.
+
   Returns:
     Points of smallest bounding box encompassing region of interest
   """
+  table = _as_contour_table(contours)
 
   # rows, cols = image.shape
   # center = [int(rows/2), int(cols/2)]
@@ -79,31 +206,27 @@ def _find_best_contour(contours, center):
   # Only use the 5 largest contours. If any more, our image probably
   # has too much going on in it
   max_contours = 5
-  max_contour_area = cv2.contourArea(contours[0])
+  max_contour_area = table.areas[0]
 
-  # Calculate and add the score values for each contour
-  scores = []
-  for c in contours[:5]:
+  # Score each contour. Centroids are truncated to whole pixels, and contours
+  # with no area have a centroid of (0, 0).
+  areas = table.areas[:max_contours]
+  cent_row = np.trunc(table.centroids[:max_contours, 0])
+  cent_col = np.trunc(table.centroids[:max_contours, 1])
+  dist = np.sqrt((cent_row - center[0])**2 + (cent_col - center[1])**2)
 
-    moments = cv2.moments(c)
+  norm_dist = 1 - dist/max_dist
+  if max_contour_area > 0:
+    norm_area = areas/max_contour_area
+  else:
+    norm_area = np.zeros(len(areas))
 
-    if moments['m00'] == 0:
-      moments['m00'] = 1
-    cent_row = int(moments['m10']/moments['m00'])
-    cent_col = int(moments['m01']/moments['m00'])
-    dist = np.sqrt((cent_row - center[0])**2 + 
-                   (cent_col - center[1])**2)
-
-    norm_dist = 1 - dist/max_dist
-    norm_area = cv2.contourArea(c)/max_contour_area
-
-    score = norm_dist * norm_area
-    scores.append(score)
+  scores = norm_dist * norm_area
 
   # We only use the largest value, which will normally be idx 0
   max_score_idx = np.argmax(scores)
 
-  return contours[max_score_idx]
+  return table[max_score_idx]
 
 def _get_box_from_contour(contour):
   """Returns the minimum box containing the contour (4 corner pts)
@@ -117,14 +240,14 @@ def _get_box_from_contour(contour):
     of (height, width) of center
   """
   rect = cv2.minAreaRect(contour)
-  box = np.int0(cv2.boxPoints(rect))
+  box = np.intp(cv2.boxPoints(rect))
 
   center_height = np.mean(box[:, 1])
   center_width = np.mean(box[:, 0])
 
   return box, (center_height, center_width)
 
-def _isolate_text_regions(img, closing_size):
+def _isolate_text_regions(img, closing_size, close_elem=None, buffers=None):
   """Returns a list of contours that contain potential text regions
 
   Uses a thresholded image with edges defined to find text regions. Input image
@@ -134,26 +257,31 @@ def _isolate_text_regions(img, closing_size):
   Args:
     img: thresholded image to find text regions
     closing_size: tuple containing (width, height) of closing element
+    close_elem: Optional precomputed closing element of closing_size, ie: 
+                from PreprocessConfig.get_close_kernel().
+    buffers: Optional _BufferPool to write the closed image into.
 
   Returns:
-    List of contours in sorted order by contour area
+    _ContourTable of contours in sorted order by contour area
   """
 
   # Morph closing to fill in the text areas. Use a large rectangle b/c we want
   # text regions to be physically connected
-  close_elem = cv2.getStructuringElement(cv2.MORPH_RECT, ksize=closing_size)
-  closed_img = cv2.morphologyEx(img, cv2.MORPH_CLOSE, close_elem)
-
-  # Find and sort the contours by area
-  # TODO(searow): maybe don't need closed_img.copy() since we're creating 
-  #               a new copy in closed_img anyways and not modifying img?
-  _, cont, _ = cv2.findContours(closed_img.copy(), cv2.RETR_EXTERNAL,
-                                cv2.CHAIN_APPROX_SIMPLE)
-  contours = sorted(cont, key=cv2.contourArea, reverse=True)
+  if close_elem is None:
+    close_elem = cv2.getStructuringElement(cv2.MORPH_RECT, ksize=closing_size)
+  closed_img = cv2.morphologyEx(img, cv2.MORPH_CLOSE, close_elem,
+                                dst=_get_buffer(buffers, 'closed', img.shape))
+
+  # Find and sort the contours by area. closed_img isn't used afterwards, so
+  # it doesn't need to be copied even if findContours modifies it. OpenCV 3
+  # returns 3 values and later versions 2, contours are always second last.
+  cont = cv2.findContours(closed_img, cv2.RETR_EXTERNAL,
+                          cv2.CHAIN_APPROX_SIMPLE)[-2]
+  contours = _ContourTable(cont).sorted_by_area()
 
   return contours
 
-def _identify_contours(img, config):
+def _identify_contours(img, config, buffers=None):
   """Finds and returns contours in decreasing size order.
 
   Finds contours in 2 steps: 1) finds edges and removes noise 2) performs
@@ -166,12 +294,14 @@ def _identify_contours(img, config):
   Args:
     img: image to search
     config: PreprocessConfig object for configuration options
+    buffers: Optional _BufferPool to write intermediate images into.
 
   Returns:
-    Contours in decreasing order by pixel area
+    _ContourTable of contours in decreasing order by pixel area
   """
-  cleaned = _find_edges_and_remove_noise(img, config.blur_size)
-  contours = _isolate_text_regions(cleaned, config.morph_close_size)
+  cleaned = _find_edges_and_remove_noise(img, config.blur_size, buffers)
+  contours = _isolate_text_regions(cleaned, config.morph_close_size,
+                                   config.get_close_kernel(), buffers)
 
   return contours
 
@@ -185,8 +315,24 @@ def _crop_image_to_contour(img, contour):
   Returns:
     New cropped image only containing contour area
   """
+  bot, top, left, right = _get_crop_bounds(contour, img.shape)
+  cropped_img = img[bot:top, left:right]
+
+  return cropped_img
+
+def _get_crop_bounds(contour, shape):
+  """Returns (bot, top, left, right) bounds of contour for cropping.
+
+  Args:
+    contour: contour on the image that designates the bounds to be cropped
+    shape: (rows, cols) of the image to be cropped
+
+  Returns:
+    Row and column slice bounds of the smallest box around contour, plus a 1 
+    pixel border, limited to the image.
+  """
   roi_box, center = _get_box_from_contour(contour)
-  rows, cols = img.shape
+  rows, cols = shape
 
   # Isolate ROI
   # Min values are 0 for bot/left, max are width or height for top/right
@@ -202,23 +348,22 @@ def _crop_image_to_contour(img, contour):
   right = max(roi_box[:,0] + 1)
   right = cols if right >= cols else right
 
-  cropped_img = img[bot:top, left:right]
-
-  return cropped_img
+  return bot, top, left, right
 
 def _reorder_contours_by_position(contours):
   """Sorts contours by height position, closest to top = first.
 
   Args:
-    contours: Contours to be sorted.
+    contours: Contours to be sorted, as a list or _ContourTable.
 
   Returns:
-    Contours in sorted order by height position
+    _ContourTable of contours in sorted order by height position
   """
-  # We sort here by the 2nd return value of _get_box_from_contour, which is
-  # the height position of the center of the contour.
-  in_order = sorted(contours, 
-                    key=lambda item: _get_box_from_contour(item)[1][0])
+  # We sort here by the height position of the center of each contour's 
+  # bounding box. Ties keep their original order.
+  table = _as_contour_table(contours)
+  center_heights = (table.y_min + table.y_max) / 2
+  in_order = table.take(np.argsort(center_heights, kind='stable'))
 
   return in_order
 
@@ -226,30 +371,148 @@ def _remove_small_contours(contours):
   """Removes any contours that are too small to be valuable.
 
   Args:
-    contours: List of contours to examine.
+    contours: List or _ContourTable of contours to examine.
 
   Returns:
-    Same list of contours, but with any tiny contours removed.
+    _ContourTable of the same contours, but with any tiny contours removed.
   """
   # We remove contours based on the height and width of the contour, found 
   # from max - min in each direction.
   # TODO(searow): currently setting to 15 pixels, should find the best value 
   #               to use here.
   min_px = 15
-  remove_idx = []
-  for idx, contour in enumerate(contours):
-    heights = sorted(contour[:, :, 0])
-    height = heights[-1] - heights[0]
-    widths = sorted(contour[:, :, 1])
-    width = widths[-1] - widths[0]
-
-    if height < min_px or width < min_px:
-      remove_idx.append(idx)
+  table = _as_contour_table(contours)
+  keep = (((table.x_max - table.x_min) >= min_px) &
+          ((table.y_max - table.y_min) >= min_px))
 
   # Filter out small contours 
-  filtered = [c for idx, c in enumerate(contours) if idx not in remove_idx]
+  filtered = table.take(np.flatnonzero(keep))
   return filtered
 
+def _as_contour_table(contours):
+  """Returns contours as a _ContourTable, only building one if needed."""
+  if isinstance(contours, _ContourTable):
+    return contours
+
+  return _ContourTable(contours)
+
+class _ContourTable(object):
+  """Geometry of a frame's contours, stored as parallel NumPy arrays.
+
+  Bounding boxes, areas and centroids of every contour are computed once, 
+  over all contour points at the same time, instead of with OpenCV calls for 
+  each contour every time they're filtered, scored or sorted. Row i of each 
+  array describes contours[i].
+
+  Acts as a read only list of contours, so it can be used anywhere a list of
+  contours is expected.
+
+  Attributes:
+    contours: List of contours, each an (n, 1, 2) int32 array of points.
+    lengths: Number of points in each contour.
+    points: All contour points concatenated in order, shape (total, 1, 2).
+    x_min, x_max, y_min, y_max: Bounding box extents of each contour.
+    areas: Area of each contour, the same as cv2.contourArea.
+    centroids: (n, 2) array of (x, y) centroids, the same as from cv2.moments,
+               or (0, 0) for contours with no area.
+  """
+
+  def __init__(self, contours):
+    """Inits table, computing geometry for every contour in contours."""
+    self.contours = list(contours)
+    self.lengths = np.array([len(c) for c in self.contours], dtype=np.intp)
+    if len(self.contours) == 0:
+      self.points = np.zeros((0, 1, 2), dtype=np.int32)
+      self.x_min = self.x_max = np.zeros(0, dtype=np.int32)
+      self.y_min = self.y_max = np.zeros(0, dtype=np.int32)
+      self.areas = np.zeros(0)
+      self.centroids = np.zeros((0, 2))
+      return
+
+    self.points = np.concatenate(self.contours)
+    starts = np.concatenate(([0], np.cumsum(self.lengths)[:-1]))
+    x = self.points[:, 0, 0]
+    y = self.points[:, 0, 1]
+    self.x_min = np.minimum.reduceat(x, starts)
+    self.x_max = np.maximum.reduceat(x, starts)
+    self.y_min = np.minimum.reduceat(y, starts)
+    self.y_max = np.maximum.reduceat(y, starts)
+
+    # Shoelace formula for each closed polygon. Each point is paired with the
+    # next point in its own contour, wrapping around to the contour's start.
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    next_idx = np.arange(1, len(x) + 1)
+    next_idx[starts + self.lengths - 1] = starts
+    x_next = x[next_idx]
+    y_next = y[next_idx]
+    cross = x * y_next - x_next * y
+    signed_areas = np.add.reduceat(cross, starts) / 2
+    self.areas = np.abs(signed_areas)
+
+    # Polygon centroids, which are the m10/m00 and m01/m00 moment ratios
+    has_area = self.areas > np.finfo(np.float32).eps
+    divisor = np.where(has_area, 6 * signed_areas, 1)
+    self.centroids = np.zeros((len(self.contours), 2))
+    self.centroids[:, 0] = np.add.reduceat((x + x_next) * cross, starts)
+    self.centroids[:, 1] = np.add.reduceat((y + y_next) * cross, starts)
+    self.centroids /= divisor[:, np.newaxis]
+    self.centroids[~has_area] = 0
+
+  def take(self, idx):
+    """Returns new _ContourTable of the contours at indexes idx, in order."""
+    table = _ContourTable.__new__(_ContourTable)
+    table.contours = [self.contours[i] for i in idx]
+    table.lengths = self.lengths[idx]
+    if len(table.contours) > 0:
+      table.points = np.concatenate(table.contours)
+    else:
+      table.points = np.zeros((0, 1, 2), dtype=np.int32)
+    table.x_min = self.x_min[idx]
+    table.x_max = self.x_max[idx]
+    table.y_min = self.y_min[idx]
+    table.y_max = self.y_max[idx]
+    table.areas = self.areas[idx]
+    table.centroids = self.centroids[idx]
+
+    return table
+
+  def sorted_by_area(self):
+    """Returns new _ContourTable in decreasing area order, ties kept in order.
+    """
+    return self.take(np.argsort(-self.areas, kind='stable'))
+
+  def __len__(self):
+    return len(self.contours)
+
+  def __getitem__(self, idx):
+    return self.contours[idx]
+
+  def __iter__(self):
+    return iter(self.contours)
+
+class _BufferPool(object):
+  """Named image buffers that are reused from frame to frame.
+
+  Passed as dst to OpenCV functions so that processing a frame of the same 
+  size as the last one doesn't allocate new full size images. A buffer is 
+  only reallocated when the requested shape changes.
+
+  Images returned from functions using a _BufferPool are overwritten by the
+  next frame, so anything kept past that must be copied.
+  """
+
+  def __init__(self):
+    self.__buffers = {}
+
+  def get(self, name, shape, dtype=np.uint8):
+    """Returns buffer name with the given shape, allocating it if needed."""
+    buf = self.__buffers.get(name)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+      buf = np.empty(shape, dtype=dtype)
+      self.__buffers[name] = buf
+
+    return buf
 
 class PreprocessConfig(object):
   """Holds preprocessing configuration values for different operations."""
@@ -263,6 +526,20 @@ class PreprocessConfig(object):
     """
     self.blur_size = blur_size
     self.morph_close_size = morph_close_size
+    self.__close_kernel = None
+    self.__close_kernel_size = None
+
+  def get_close_kernel(self):
+    """Returns rectangular closing element of size morph_close_size.
+
+    The element is cached, and only recreated if morph_close_size changes.
+    """
+    if self.__close_kernel_size != self.morph_close_size:
+      self.__close_kernel = cv2.getStructuringElement(
+          cv2.MORPH_RECT, ksize=self.morph_close_size)
+      self.__close_kernel_size = self.morph_close_size
+
+    return self.__close_kernel
 
 class ImageProcessor(object):
   """Prepares images for OCR processing.
@@ -278,9 +555,22 @@ class ImageProcessor(object):
 
   Attributes:
     ocr_processor: OcrProcessor object responsible for actual OCR processing.
+    ocr_workers: Number of line images to OCR at the same time.
     original_image: Unaltered image to be processed.
     working_image: Working image workspace, constantly changing.
     preprocessed_images: Set of preprocessed images, ready for OCR.
+    roi_scale: Factor to downscale frames by before finding the rotation and
+               the region of interest (ie: 4 finds them on a 320x180 image
+               for a 720p frame). Only the region of interest is processed 
+               at full resolution. Rotation and region of interest are 
+               found at full resolution if 1.
+    reuse_buffers: Write full frame intermediate images into buffers kept
+                   between frames instead of allocating new ones. 
+                   working_image is overwritten by the next frame when set.
+    __ocr_pool: Thread pool used when ocr_workers > 1, created on first use.
+    __buffers: _BufferPool used when reuse_buffers is set.
+    __scaled_cfgs: Dict of roi_scale to (rotation_cfg, main_contour_cfg) 
+                   downscaled by roi_scale.
   """
   # TODO(searow): these sizes are based on 720p camera set to 1280 x 720 
   #               resolution. they should probably be based on % of pixels
@@ -290,10 +580,33 @@ class ImageProcessor(object):
   # line_contour_cfg.morph_close_size currently being overriden in _preprocess
   line_contour_cfg = PreprocessConfig((5, 5), (50, 3))
   rotation_cfg = PreprocessConfig((5, 5), (40, 40))
+  roi_scale = 1
+  reuse_buffers = True
 
-  def __init__(self, ocr_processor):
-    """Inits with an OcrProcessor to specify OCR engine"""
+  def __init__(self, ocr_processor, ocr_workers=1):
+    """Inits with an OcrProcessor to specify OCR engine.
+
+    Args:
+      ocr_processor: OcrProcessor object used to read each line image.
+      ocr_workers: Number of line images to OCR in parallel. Lines are OCR'd
+                   one at a time if 1. The ocr_processor must be safe to call
+                   from multiple threads if greater than 1.
+    """
     self.ocr_processor = ocr_processor
+    self.ocr_workers = ocr_workers
+    self.__ocr_pool = None
+    self.__buffers = _BufferPool()
+    self.__scaled_cfgs = {}
+    # Each processor gets its own line config since _preprocess changes its
+    # closing size for every image
+    self.line_contour_cfg = PreprocessConfig(
+        self.line_contour_cfg.blur_size, self.line_contour_cfg.morph_close_size)
+
+  def close(self):
+    """Shuts down the OCR thread pool, if one was created."""
+    if self.__ocr_pool is not None:
+      self.__ocr_pool.shutdown()
+      self.__ocr_pool = None
 
   def get_text_lines(self, image):
     """Finds and returns addressee text lines.
@@ -308,23 +621,44 @@ class ImageProcessor(object):
     Returns:
       Array of strings representing each line that was read.
     """
+    with metrics.timed('image.get_text_lines'):
+      self.get_line_images(image)
+      ocr_results = self._perform_ocr()
+
+    return ocr_results
+
+  def get_line_images(self, image):
+    """Preprocesses image and returns the addressee line images for OCR.
 
+    Allows preprocessing and OCR to be run separately, ie: in different
+    threads of a ReaderPipeline.
+
+    Args:
+      image: Image of the mail item that is to be processed.
 
+    Returns:
+      List of thresholded line images in top to bottom order, also saved as
+      preprocessed_images. Empty if no contours were found.
+    """
     # Original image used for color reproduction and overlays if needed
     # working_image used for all forwards processes (things that won't need
     # to be reversed)
     self.original_image = image
-    self.working_image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    buffers = self.__get_buffers()
+    self.working_image = cv2.cvtColor(
+        image, cv2.COLOR_RGB2GRAY,
+        dst=_get_buffer(buffers, 'gray', image.shape[:2]))
 
     # Preprocess is ALL image manipulation before OCR, but not including OCR
     try:
-      self._preprocess()
-      ocr_results = self._perform_ocr()
+      with metrics.timed('image.preprocess'):
+        self._preprocess()
     except NoContoursError:
-      # Return an empty set if we don't have contours at any point in time.
-      return []
-    
-    return ocr_results
+      # Use an empty set if we don't have contours at any point in time.
+      metrics.increment('image.no_contours')
+      self.preprocessed_images = []
+
+    return self.preprocessed_images
 
   def _preprocess(self):
     """Preprocesses input image to prepare for OCR.
@@ -336,21 +670,9 @@ class ImageProcessor(object):
       None
     """
     # TODO(searow): refactor here to isolate each general step
-    # Rotation correction
-    rotated_img, angle = _fix_image_rotation(self.working_image, 
-                                             self.rotation_cfg)
-    # rotation = _calculate_rotation(self.working_image)
-    # rotated_img = _rotate_image_ccwise(self.working_image, rotation)
-
-    # Threshold to binary to allow morphological operations
-    _, thresh_img = cv2.threshold(rotated_img, thresh=0, maxval=255,
-                                  type=cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-
-    # Identify the region of interest (ROI), which should be addressee label
-    contours = _identify_contours(rotated_img, self.main_contour_cfg)
-    img_center = (rotated_img.shape[0]/2, rotated_img.shape[1]/2)
-    best_contour = _find_best_contour(contours, img_center)
-    cropped_img = _crop_image_to_contour(rotated_img, best_contour)
+    # Rotation correction and region of interest (ROI), which should be the
+    # addressee label. Only the ROI is rotated.
+    cropped_img = self.__find_roi()
 
     # Identify lines within ROI
     # TODO(searow): using width/2 for now, but consider putting this elsewhere
@@ -374,17 +696,76 @@ class ImageProcessor(object):
 
     self.preprocessed_images = img_set
 
+  def __find_roi(self):
+    """Returns rotated region of interest of working_image.
+
+    Rotation and the region of interest are found on working_image,
+    downscaled by roi_scale if it's greater than 1 with configs scaled to
+    match. The region's contour is then scaled back up, and only that region
+    of working_image is rotated at full resolution.
+
+    Returns:
+      Full resolution, rotated image of the region of interest.
+    """
+    scale = self.roi_scale
+    buffers = self.__get_buffers()
+    if scale > 1:
+      if scale not in self.__scaled_cfgs:
+        self.__scaled_cfgs[scale] = (
+            _downscale_config(self.rotation_cfg, scale),
+            _downscale_config(self.main_contour_cfg, scale))
+      rotation_cfg, main_contour_cfg = self.__scaled_cfgs[scale]
+
+      # Area interpolation averages pixels, which also removes sensor noise
+      rows, cols = self.working_image.shape
+      small_shape = (int(rows/scale), int(cols/scale))
+      img = cv2.resize(self.working_image, (small_shape[1], small_shape[0]),
+                       dst=_get_buffer(buffers, 'small', small_shape),
+                       interpolation=cv2.INTER_AREA)
+    else:
+      rotation_cfg, main_contour_cfg = self.rotation_cfg, self.main_contour_cfg
+      img = self.working_image
+
+    angle, roi_contour = _find_rotation_and_roi(img, rotation_cfg,
+                                                main_contour_cfg, buffers)
+
+    # Each downscaled pixel covers scale x scale full size pixels, so map 
+    # contour points to the middle of that block
+    if scale > 1:
+      roi_contour = roi_contour * scale + scale // 2
+    bounds = _get_crop_bounds(roi_contour, self.working_image.shape)
+
+    return _rotate_and_crop(self.working_image, angle, bounds)
+
+  def __get_buffers(self):
+    """Returns _BufferPool to use, or None if reuse_buffers isn't set."""
+    if not self.reuse_buffers:
+      return None
+
+    return self.__buffers
+
   def _perform_ocr(self):
     """Performs OCR on image using ocr_processor.
 
+    Lines are OCR'd in parallel with get_text when ocr_workers > 1, otherwise
+    they are passed to get_text_lines together. Threads are enough here
+    since Tesseract runs outside of the Python interpreter, so the GIL isn't 
+    held while waiting on it.
+
     Returns:
       Array of strings representing individual lines on document
     """
-    text_lines = []
-    for im in self.preprocessed_images:
-      text_lines.append(self.ocr_processor.get_text(im))
-
-    return text_lines
+    if self.ocr_workers > 1 and len(self.preprocessed_images) > 1:
+      if self.__ocr_pool is None:
+        self.__ocr_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.ocr_workers)
+      # map returns results in the same order as preprocessed_images
+      return list(self.__ocr_pool.map(self.ocr_processor.get_text,
+                                      self.preprocessed_images))
+
+    # Let the OcrProcessor read all lines together, which may be done in a
+    # single pass (ie: TesseractStitchedProcessor)
+    return self.ocr_processor.get_text_lines(self.preprocessed_images)
 
 class Error(Exception):
   pass
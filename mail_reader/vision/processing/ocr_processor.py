@@ -1,6 +1,68 @@
 import abc
+import os
+import queue
+import numpy as np
 import pyocr
+import pyocr.builders
+import pyocr.libtesseract.tesseract_raw as tesseract_raw
 from PIL import Image
+import mail_reader.metrics as metrics
+
+def _stitch_line_images(images, gap):
+  """Stacks line images vertically onto a single white canvas.
+
+  Images are converted to dark text on a white background (line images from
+  ImageProcessor are inverted) and left aligned, with gap pixels of white
+  between each line.
+
+  Args:
+    images: List of 2D grayscale line images.
+    gap: Number of pixels of white space above, below and between lines.
+
+  Returns:
+    canvas: Single 2D uint8 image containing every line.
+    spans: List of (top, bottom) rows of each image on the canvas.
+  """
+  height = gap + sum(im.shape[0] + gap for im in images)
+  width = max(im.shape[1] for im in images) + 2 * gap
+  canvas = np.full((height, width), 255, dtype=np.uint8)
+
+  spans = []
+  top = gap
+  for im in images:
+    # Mostly dark images are white text on black, so flip them
+    if np.mean(im) < 128:
+      im = 255 - im
+    bottom = top + im.shape[0]
+    canvas[top:bottom, gap:gap + im.shape[1]] = im
+    spans.append((top, bottom))
+    top = bottom + gap
+
+  return canvas, spans
+
+def _map_line_boxes(line_boxes, spans):
+  """Assigns OCR'd line boxes back to the line images they came from.
+
+  Each line box goes to the span whose vertical center is closest to the box's
+  vertical center. Multiple boxes in the same span are joined left to right.
+
+  Args:
+    line_boxes: List of pyocr.builders.LineBox results for the canvas.
+    spans: List of (top, bottom) rows from _stitch_line_images.
+
+  Returns:
+    List of text strings, one per span, '' for spans with no text.
+  """
+  span_centers = np.array([(top + bottom) / 2 for top, bottom in spans])
+  span_boxes = [[] for _ in spans]
+  for line_box in line_boxes:
+    ((left, top), (right, bottom)) = line_box.position
+    center = (top + bottom) / 2
+    idx = int(np.argmin(np.abs(span_centers - center)))
+    span_boxes[idx].append((left, line_box.content))
+
+  return [' '.join(content for _, content in sorted(boxes))
+          for boxes in span_boxes]
 
 class OcrProcessor(metaclass=abc.ABCMeta):
   """Generic OCR processing object."""
@@ -12,6 +74,15 @@ class OcrProcessor(metaclass=abc.ABCMeta):
     """Performs OCR on desired image, returns result string"""
     pass
 
+  def get_text_lines(self, images):
+    """Performs OCR on a list of line images, returns list of result strings.
+
+    Default implementation OCRs each image separately. Subclasses can override
+    this to read all of the lines at once.
+    """
+    with metrics.timed('ocr.get_text_lines'):
+      return [self.get_text(image) for image in images]
+
 class TesseractProcessor(OcrProcessor):
   """OCR processing using Tesseract.
 
@@ -26,7 +97,112 @@ class TesseractProcessor(OcrProcessor):
 
   def get_text(self, image):
     """Performs OCR on image, returns result string"""
-    txt = self.tool.image_to_string(Image.fromarray(image),
-                                    builder=pyocr.builders.TextBuilder())
+    with metrics.timed('ocr.get_text'):
+      txt = self.tool.image_to_string(Image.fromarray(image),
+                                      builder=pyocr.builders.TextBuilder())
     
     return txt
+
+class TesseractStitchedProcessor(TesseractProcessor):
+  """Tesseract processing that reads every line image in one Tesseract call.
+
+  Line images are stacked onto one canvas and read with a line box builder,
+  and the resulting lines are mapped back to the original images by position.
+  Saves the per call startup cost of Tesseract, which dominates when each
+  envelope has several short lines.
+
+  Attributes:
+    line_gap: Pixels of white space placed between lines on the canvas.
+  """
+  line_gap = 10
+
+  def get_text_lines(self, images):
+    """Performs OCR on all line images at once, returns list of strings."""
+    if len(images) == 0:
+      return []
+
+    canvas, spans = _stitch_line_images(images, self.line_gap)
+    # Layout 6 treats the canvas as a single uniform block of text lines
+    with metrics.timed('ocr.get_text_lines'):
+      line_boxes = self.tool.image_to_string(
+          Image.fromarray(canvas),
+          builder=pyocr.builders.LineBoxBuilder(tesseract_layout=6))
+
+    return _map_line_boxes(line_boxes, spans)
+
+class LibTesseractProcessor(OcrProcessor):
+  """OCR processing using warm libtesseract engines.
+
+  TesseractProcessor starts a new tesseract process and writes temporary
+  files for every image. This instead keeps a pool of initialized libtesseract
+  engines with their language models loaded, and passes images to them in
+  memory, so each call only pays for the recognition itself.
+
+  Each engine is used by one thread at a time. Calls from more threads than
+  there are engines wait for a free engine, so the pool size should match the
+  number of threads doing OCR (ie: ImageProcessor.ocr_workers).
+
+  Attributes:
+    __engines: Queue of idle libtesseract handles.
+    __all_engines: List of every handle, used for cleanup.
+  """
+  def __init__(self, engines=1, lang='eng', tesseract_layout=3):
+    """Inits and warms up the libtesseract engines.
+
+    Args:
+      engines: Number of engines to keep loaded.
+      lang: Tesseract language to load.
+      tesseract_layout: Tesseract page segmentation mode. Defaults to the 
+                        same mode TesseractProcessor uses.
+
+    Raises:
+      OcrToolError: libtesseract isn't installed or lang isn't available.
+    """
+    super().__init__()
+    if not LibTesseractProcessor.is_available():
+      raise OcrToolError('libtesseract is not available')
+
+    self.__engines = queue.Queue()
+    self.__all_engines = []
+    for _ in range(engines):
+      handle = tesseract_raw.init(lang=lang)
+      self.__all_engines.append(handle)
+      if lang not in tesseract_raw.get_available_languages(handle):
+        self.close()
+        raise OcrToolError('Tesseract language ' + lang + ' is not available')
+      tesseract_raw.set_page_seg_mode(handle, tesseract_layout)
+      tesseract_raw.set_debug_file(handle, os.devnull)
+      self.__engines.put(handle)
+
+  @staticmethod
+  def is_available():
+    """Returns True if libtesseract can be loaded."""
+    return tesseract_raw.is_available()
+
+  def get_text(self, image):
+    """Performs OCR on image with the next free engine, returns result string"""
+    handle = self.__engines.get()
+    try:
+      with metrics.timed('ocr.get_text'):
+        tesseract_raw.set_image(handle, Image.fromarray(image))
+        tesseract_raw.recognize(handle)
+        txt = tesseract_raw.get_utf8_text(handle)
+    finally:
+      self.__engines.put(handle)
+
+    return txt.strip()
+
+  def close(self):
+    """Releases every engine. The processor can't be used afterwards."""
+    for handle in self.__all_engines:
+      tesseract_raw.cleanup(handle)
+    self.__all_engines = []
+    self.__engines = queue.Queue()
+
+class Error(Exception):
+  pass
+
+class OcrToolError(Error):
+  """Occurs when the requested OCR tool can't be used."""
+  def __init__(self, message):
+    self.message = message
@@ -1,38 +1,92 @@
 import cv2
+import os
 import time
 import mail_reader.vision.hardware.access_webcam as access_webcam
 import mail_reader.data_access.database_creator as database_creator
 import mail_reader.data_access.box_matching as box_matching
+import mail_reader.data_access.database_updater as database_updater
 import mail_reader.vision.processing.image_process as image_process
 import mail_reader.vision.processing.ocr_processor as ocr_process
+import mail_reader.vision.processing.frame_change as frame_change
+import mail_reader.addressee_identification.store_address as store_address
 import mail_reader.addressee_identification.text_analyzer as text_analyzer
-import mail_reader.addressee_identification.addressee_reader as addressee_reader
+import mail_reader.reader_pipeline as reader_pipeline
+import mail_reader.metrics as metrics
 
-# Create database from file
+# Load compiled database, only recreating it if the file has changed
 dbpath = './20161209.xlsx'
-print('Creating database from file: ' + dbpath)
+print('Loading database for file: ' + dbpath)
 creator = database_creator.BapDatabaseCreator()
-db_conn = creator.create_database_from_excel(dbpath)
+db_conn = creator.load_or_create_database(dbpath)
 
 # Set box matcher onto database connection
 matcher = box_matching.BoxMatcher()
 matcher.set_database_connection(db_conn)
 
-print('Creating analyzers')
-# Create and set image processor
-processor = image_process.ImageProcessor(ocr_process.TesseractProcessor())
+# Customer changes saved to updates_path are applied between envelopes. See
+# DatabaseUpdater.apply_diff for the file format. Applied files are renamed
+# to .applied, and files that can't be applied are renamed to .failed.
+updates_path = './customer_updates.csv'
+updater = database_updater.DatabaseUpdater(db_conn)
+updater.add_listener(matcher)
 
-# Create and set text analyzer
-analyzer = text_analyzer.TextAnalyzer()
+print('Creating analyzers')
+# Image processors are created per preprocessing worker since they keep state
+# for the image being processed. The OCR processor is shared, and uses warm
+# libtesseract engines (one per OCR worker) if they're available.
+ocr_workers = 2
+if ocr_process.LibTesseractProcessor.is_available():
+  ocr_processor = ocr_process.LibTesseractProcessor(engines=ocr_workers)
+else:
+  ocr_processor = ocr_process.TesseractProcessor()
+def create_processor():
+  # roi_scale is left at 1 (full resolution) until OCR accuracy with
+  # downscaled rotation and region of interest has been checked on the test
+  # images
+  return image_process.ImageProcessor(ocr_processor)
 
-# Create and set addressee reader
-reader = addressee_reader.AddresseeReader(processor, analyzer)
+# Create and set text analyzer. The store's own street and city lines are
+# recognized without usaddress if the store's address is saved to
+# store_address_path, see store_address.load_store_profile for the format.
+store_address_path = './store_address.json'
+store_profile = None
+if os.path.isfile(store_address_path):
+  store_profile = store_address.load_store_profile(store_address_path)
+analyzer = text_analyzer.TextAnalyzer(store_profile=store_profile)
 
 print('Opening webcam')
 # Initialize webcam
 cam = access_webcam.LogitechC270()
 cam.open_webcam_id(1)
 
+# Capture, preprocessing, OCR and matching all run in background threads so
+# the camera and display never wait on OCR. Frames are only read once a new
+# envelope has been put down and is holding still. Only the top 3 matches are
+# shown, so names are only looked up for those boxes.
+pipeline = reader_pipeline.ReaderPipeline(
+    cam, create_processor, ocr_processor, analyzer, matcher,
+    preprocess_workers=1, ocr_workers=ocr_workers,
+    ignored_names=['Or', 'Current', 'Resident'],
+    change_detector=frame_change.FrameChangeDetector(), top_k=3)
+
+# Stage latencies and counters are written to metrics_path every
+# metrics_interval seconds. Set prometheus_port to also serve them for
+# Prometheus on http://127.0.0.1:<prometheus_port>/metrics.
+metrics_path = './reader_metrics.json'
+metrics_interval = 10
+prometheus_port = None
+prometheus_sink = None
+if prometheus_port is not None:
+  prometheus_sink = metrics.PrometheusSink(port=prometheus_port)
+  try:
+    prometheus_sink.start()
+    metrics.default_registry.add_sink(prometheus_sink)
+  except OSError as e:
+    print('Warning: not serving Prometheus metrics on port ' +
+          str(prometheus_port) + ': ' + str(e))
+    prometheus_sink = None
+metrics.default_registry.add_sink(metrics.JsonFileSink(metrics_path))
+
 print('Initializing main loop')
 
 def print_matches(match):
@@ -42,50 +96,62 @@ def print_matches(match):
   for name in match['all_names']:
     print(name)
 
-while True:
-  print('loop')
-  image = cam.get_frame()
-  cv2.imshow('img', image)
-  # Exit if ESC pressed
-  k = cv2.waitKey(10)
-  if k == 27:  # ESC
-    break
-  read_fields = reader.get_mail_fields(image)
-
-  n = read_fields.addressee_line['all_names'] 
-  a = []
-  for idx, item in enumerate(n):
-    if item not in ['Or','Current','Resident']:
-      a.append(item)
-  read_fields.addressee_line['all_names'] = a
+def print_result(result):
+  read_fields = result.fields
+  matches = result.matches
   if not read_fields.is_populated():
     print('skipped')
-    time.sleep(1)
-  matches = matcher.get_matches(read_fields)
+    return
   if len(matches) == 0:
     print('no matches available')
-    continue
-
+    return
 
   print('----------------------- Matches ----------------------')
   print('Names: ' + str(read_fields.addressee_line['all_names']))
-  print('Score0: ' + '{:01.2f}'.format(matches[0]['score']) + 
-        ' Box: ' + '{:03d}'.format(matches[0]['box_number']))
-  print('Score1: ' + '{:01.2f}'.format(matches[1]['score']) +
-        ' Box: ' + '{:03d}'.format(matches[1]['box_number']))
-  print('Score2: ' + '{:01.2f}'.format(matches[2]['score']) +
-        ' Box: ' + '{:03d}'.format(matches[2]['box_number']))  
+  for idx, match in enumerate(matches[:3]):
+    print('Score' + str(idx) + ': ' + '{:01.2f}'.format(match['score']) +
+          ' Box: ' + '{:03d}'.format(match['box_number']))
   print('-------------')
   print('Best box: ' + '{:03d}'.format(matches[0]['box_number'],))
   print('-------------')
   print('-- Match 0 --')
   print_matches(matches[0])
-  if matches[0]['score'] - matches[1]['score'] < 1.0:
+  if len(matches) > 1 and matches[0]['score'] - matches[1]['score'] < 1.0:
     print('-- Match 1 --')
     print_matches(matches[1])
-  # print(matches[0])
 
-  time.sleep(1)
+pipeline.start()
+last_metrics_flush = time.monotonic()
+while True:
+  if time.monotonic() - last_metrics_flush > metrics_interval:
+    metrics.default_registry.flush()
+    last_metrics_flush = time.monotonic()
+  if os.path.exists(updates_path):
+    print('Applying customer updates: ' + updates_path)
+    try:
+      with pipeline.matcher_lock:
+        updater.apply_diff_file(updates_path)
+      os.replace(updates_path, updates_path + '.applied')
+    except (database_updater.Error, ValueError) as e:
+      # Invalid rows raise UpdateError and unreadable files a pandas
+      # ValueError. Nothing is applied, so move them aside to not retry them
+      print('Failed to apply customer updates: ' +
+            getattr(e, 'message', str(e)))
+      os.replace(updates_path, updates_path + '.failed')
+  image = pipeline.get_latest_frame()
+  if image is not None:
+    cv2.imshow('img', image)
+  # Exit if ESC pressed
+  k = cv2.waitKey(10)
+  if k == 27:  # ESC
+    break
+  for result in pipeline.get_results():
+    print_result(result)
 
+pipeline.stop()
+metrics.default_registry.flush()
+if prometheus_sink is not None:
+  prometheus_sink.stop()
+if isinstance(ocr_processor, ocr_process.LibTesseractProcessor):
+  ocr_processor.close()
 cam.close_camera()
-